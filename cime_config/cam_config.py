@@ -9,8 +9,16 @@ CIME case.
 #----------------------------------------
 # Import generic python libraries/modules
 #----------------------------------------
+import os
 import re
+import sys
+import copy
+import json
+import hashlib
+import weakref
 import argparse
+from collections import namedtuple, OrderedDict
+import xml.etree.ElementTree as ET
 
 # Determine regular rexpression type  (for later usage in Config_string)
 REGEX_TYPE = type(re.compile(r" "))
@@ -490,17 +498,1080 @@ class ConfigString(ConfigGen):
         # If ok, then set object's value to one provided
         self.__value = val
 
+###############################################################################
+# CAM grid catalog
+###############################################################################
+
+# Default location of the CAM grid catalog
+GRID_CATALOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "cam_grid_catalog.xml")
+
+# Information about one CAM horizontal grid (see GridCatalog)
+GridInfo = namedtuple('GridInfo', ['name', 'dycore', 'ncols', 'nlat', 'nlon',
+                                   'pg', 'nlev'])
+
+class GridCatalog:
+
+    """
+    Catalog of CAM horizontal grids, read from an XML file
+    (see cam_grid_catalog.xml).
+
+    Inputs to initalize class are:
+    catalog_file (optional) -> Name of the catalog file (default is
+                               GRID_CATALOG_FILE)
+
+    Doctests:
+
+    1.  Check that a grid is found by its alias:
+
+    >>> GridCatalog().lookup("ne30pg3")
+    GridInfo(name='ne30np4.pg3', dycore='se', ncols=48600, nlat=None, nlon=None, pg='pg3', nlev=30)
+
+    2.  Check the regular expression fallback for grids not in the catalog:
+
+    >>> GridCatalog().lookup("ne8np4.pg2")
+    GridInfo(name='ne8np4.pg2', dycore='se', ncols=1536, nlat=None, nlon=None, pg='pg2', nlev=30)
+
+    >>> GridCatalog().lookup("2.5x3.33").ncols is None
+    True
+
+    >>> GridCatalog().lookup("C96.mg17")
+    GridInfo(name='C96.mg17', dycore='fv3', ncols=None, nlat=None, nlon=None, pg=None, nlev=30)
+
+    3.  Check that an unknown grid is not found:
+
+    >>> GridCatalog().lookup("not_a_grid") is None
+    True
+
+    """
+
+    def __init__(self, catalog_file=GRID_CATALOG_FILE):
+
+        # Grid information by grid name and alias
+        self.__grids = dict()
+
+        # Dycore grid name regular expressions, in search order
+        self.__patterns = list()
+
+        root = ET.parse(catalog_file).getroot()
+        self.__default_nlev = int(root.get("nlev", "30"))
+        for dycore in root.findall("dycore"):
+            dyn = dycore.get("name")
+            self.__patterns.append((dyn, re.compile(dycore.get("pattern"))))
+            for grid in dycore.findall("grid"):
+                nlat = GridCatalog.__int_attr(grid, "nlat")
+                nlon = GridCatalog.__int_attr(grid, "nlon")
+                ncols = GridCatalog.__int_attr(grid, "ncols")
+                if (ncols is None) and (nlat is not None) and (nlon is not None):
+                    ncols = nlat * nlon
+                # End if
+                nlev = GridCatalog.__int_attr(grid, "nlev")
+                if nlev is None:
+                    nlev = self.__default_nlev
+                # End if
+                info = GridInfo(grid.get("name"), dyn, ncols, nlat, nlon,
+                                grid.get("pg"), nlev)
+                for name in [info.name] + grid.get("alias", "").split():
+                    self.__grids[name] = info
+                # End for
+            # End for
+        # End for
+
+    #++++++++++++++++++++++++
+
+    @staticmethod
+    def __int_attr(node, name):
+        """Return attribute <name> of <node> as an integer (or None)"""
+        value = node.get(name)
+        if value is None:
+            return None
+        # End if
+        return int(value)
+
+    #++++++++++++++++++++++++
+
+    @staticmethod
+    def __fallback_columns(dycore, grid_name):
+        """
+        Return the number of physics columns and the physics grid variant
+        of <grid_name>, a grid for <dycore> which is not in the catalog.
+        The number of columns is None if it cannot be derived from the name
+        (e.g., the name has a suffix after the grid size).
+        """
+        ncols = None
+        pgrid = None
+        if dycore == "se":
+            match = re.match(r"ne([0-9]+)np([1-8])(?:[.]?(pg[1-9]))?$",
+                             grid_name)
+            if match is not None:
+                nelem = int(match.group(1))
+                if match.group(3):
+                    # Physics grid, <n> x <n> columns per element
+                    pgrid = match.group(3)
+                    ncols = 6 * nelem * nelem * int(pgrid[2:])**2
+                else:
+                    # Unique GLL points
+                    npts = int(match.group(2)) - 1
+                    ncols = (6 * nelem * nelem * npts * npts) + 2
+                # End if
+            # End if
+        elif dycore == "fv3":
+            match = re.match(r"C([0-9]+)$", grid_name)
+            if match is not None:
+                ncells = int(match.group(1))
+                ncols = 6 * ncells * ncells
+            # End if
+        # End if (other grid names do not fix the number of columns)
+        return ncols, pgrid
+
+    #++++++++++++++++++++++++
+
+    def lookup(self, grid_name):
+
+        """
+        Return the GridInfo for <grid_name> (a grid name or alias).
+        Grids which are not in the catalog are matched against each
+        dycore's grid name pattern. Return None if no pattern matches.
+        """
+
+        if grid_name in self.__grids:
+            return self.__grids[grid_name]
+        # End if
+        for dycore, pattern in self.__patterns:
+            if pattern.match(grid_name) is not None:
+                ncols, pgrid = GridCatalog.__fallback_columns(dycore,
+                                                              grid_name)
+                return GridInfo(grid_name, dycore, ncols, None, None, pgrid,
+                                self.__default_nlev)
+            # End if
+        # End for
+        return None
+
+    #++++++++++++++++++++++++
+
+    def pattern(self, dycore):
+
+        """
+        Return the grid name regular expression for <dycore>.
+        """
+
+        for dyn, pattern in self.__patterns:
+            if dyn == dycore:
+                return pattern
+            # End if
+        # End for
+        raise CamConfigValError("ERROR:  No grid pattern for dycore, '{}'".format(dycore))
+
+# Grid catalogs, keyed by catalog file
+_GRID_CATALOGS = dict()
+
+def grid_catalog(catalog_file=GRID_CATALOG_FILE):
+
+    """
+    Return the GridCatalog for <catalog_file>, which is only read once.
+    """
+
+    if catalog_file not in _GRID_CATALOGS:
+        _GRID_CATALOGS[catalog_file] = GridCatalog(catalog_file)
+    # End if
+    return _GRID_CATALOGS[catalog_file]
+
+###############################################################################
+# Physics decomposition (pcols) planning
+###############################################################################
+
+# Candidate values of pcols considered by the planner
+PCOLS_CANDIDATES = (4, 8, 12, 16, 24, 32, 48, 64, 96, 128, 192, 256)
+
+# Default number of (8-byte) column fields touched by a physics
+# parameterization, used to estimate the per-thread working set
+PCOLS_PLAN_FIELDS = 40
+
+# Default per-thread cache size (bytes) that a chunk should fit into
+PCOLS_PLAN_CACHE_BYTES = 1024 * 1024
+
+# Planner metrics for one candidate value of pcols
+PcolsCandidate = namedtuple('PcolsCandidate',
+                            ['pcols', 'chunks_per_task', 'chunks_per_thread',
+                             'load_imbalance', 'working_set', 'fits_cache'])
+
+def pcols_candidate(pcols, ncols, ntasks, nthreads, nlev,
+                    nfields=PCOLS_PLAN_FIELDS,
+                    cache_bytes=PCOLS_PLAN_CACHE_BYTES):
+
+    """
+    Return the planner metrics (a PcolsCandidate) for a physics
+    decomposition of <ncols> columns with <nlev> levels over <ntasks>
+    MPI tasks, each with <nthreads> OpenMP threads, into chunks of at
+    most <pcols> columns.
+
+    chunks_per_task:   The number of chunks on the busiest task
+    chunks_per_thread: The number of chunks on the busiest thread
+    load_imbalance:    The columns on the busiest thread divided by the
+                       mean columns per thread, minus one
+    working_set:       The bytes of <nfields> column fields for one chunk
+    fits_cache:        True if <working_set> fits in <cache_bytes>
+
+    Doctests:
+
+    1.  A decomposition which divides evenly:
+
+    >>> pcols_candidate(16, 1024, 4, 2, 32)
+    PcolsCandidate(pcols=16, chunks_per_task=16, chunks_per_thread=8, load_imbalance=0.0, working_set=163840, fits_cache=True)
+
+    2.  Too few chunks to keep every thread busy:
+
+    >>> pcols_candidate(256, 1024, 4, 2, 32).load_imbalance
+    1.0
+    """
+
+    # Columns and chunks on the busiest task
+    cols_per_task = -(-ncols // ntasks)
+    chunks_per_task = -(-cols_per_task // pcols)
+
+    # Chunks are shared among threads, all but the last chunk are full
+    chunks_per_thread = -(-chunks_per_task // nthreads)
+    max_thread_cols = min(cols_per_task, chunks_per_thread * pcols)
+    mean_thread_cols = float(ncols) / float(ntasks * nthreads)
+    load_imbalance = round((max_thread_cols / mean_thread_cols) - 1.0, 6)
+
+    # Per-thread working set
+    working_set = pcols * int(nlev) * nfields * 8
+
+    return PcolsCandidate(pcols, chunks_per_task, chunks_per_thread,
+                          load_imbalance, working_set,
+                          working_set <= cache_bytes)
+
+def recommend_pcols(candidates, nthreads, imbalance_tol=0.05):
+
+    """
+    Return the best of <candidates> (a list of PcolsCandidate objects).
+
+    Candidates which fit in the cache and give every one of the
+    <nthreads> threads a chunk are preferred. Of those, the largest
+    pcols whose load imbalance is within <imbalance_tol> of the
+    smallest imbalance is chosen (fewer chunks have less overhead).
+
+    Doctests:
+
+    >>> recommend_pcols([pcols_candidate(x, 1024, 4, 2, 32) for x in (16, 32, 256)], 2).pcols
+    32
+    """
+
+    # Prefer candidates which fit in cache and keep every thread busy
+    busy = [x for x in candidates if x.chunks_per_task >= nthreads]
+    preferred = [x for x in busy if x.fits_cache]
+    if not preferred:
+        preferred = busy or list(candidates)
+    # End if
+
+    best_imbalance = min([x.load_imbalance for x in preferred])
+    return max([x for x in preferred
+                if x.load_imbalance <= best_imbalance + imbalance_tol],
+               key=lambda x: x.pcols)
+
+###############################################################################
+# CIME case variable access
+###############################################################################
+
+# Case variables read by ConfigCAM
+CASE_VARIABLES = ("ATM_GRID", "CAM_CONFIG_OPTS", "ATM_NX", "ATM_NY",
+                  "COMP_OCN")
+
+# Format version of case variable snapshot files (see CamCaseReader)
+CASE_SNAPSHOT_VERSION = 1
+
+def _native_strings(value):
+
+    """
+    Return <value> (decoded JSON) with every unicode string converted to
+    a native string (the json module returns unicode strings on Python 2).
+
+    >>> _native_strings({u"ocn" : [u"docn", 1]}) == {"ocn" : ["docn", 1]}
+    True
+    >>> isinstance(list(_native_strings({u"ocn" : u"docn"}).keys())[0], str)
+    True
+    """
+
+    if isinstance(value, dict):
+        return dict((_native_strings(key), _native_strings(val))
+                    for key, val in value.items())
+    # End if
+    if isinstance(value, list):
+        return [_native_strings(x) for x in value]
+    # End if
+    if isinstance(value, type(u"")) and not isinstance(value, str):
+        return value.encode("utf-8")
+    # End if
+    return value
+
+def _load_json(jfile):
+
+    """
+    Return the JSON document read from open file <jfile> with native
+    strings (see _native_strings).
+    """
+
+    return _native_strings(json.load(jfile))
+
+
+class CamCaseReader:
+
+    """
+    Memoizing, read-only view of the variables of a CIME case.
+
+    Inputs to initalize class are:
+    case                     -> CIME case (or None if all variables come
+                                from <snapshot_file>)
+    keys (optional)          -> Case variables to read when the reader is
+                                created (default is CASE_VARIABLES)
+    snapshot_file (optional) -> Case variable snapshot (see save_snapshot)
+                                used to seed the reader
+
+    Each of <keys> which is not in the snapshot is read from <case>, in
+    one pass, when the reader is created. Other variables are read from
+    <case> on first use. Every value is then kept until it is
+    invalidated (see invalidate), <case> is not asked for the same
+    variable twice in between.
+
+    Doctests:
+
+    1.  Check that values are read from the case:
+
+    >>> CamCaseReader(FCASE).get_value("ATM_NX")
+    180
+
+    2.  Check that a reader without a case only knows its snapshot values:
+
+    >>> CamCaseReader(None).get_value("ATM_NX") #doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    CamConfigValError: ERROR:  Case variable, 'ATM_NX', is not in the case snapshot
+
+    """
+
+    def __init__(self, case, keys=CASE_VARIABLES, snapshot_file=None):
+
+        self.__case = case
+        self.__values = dict()
+        self.__num_reads = 0
+
+        # Seed values from the snapshot (if any)
+        if snapshot_file is not None:
+            self.__values.update(CamCaseReader.load_snapshot(snapshot_file))
+        # End if
+
+        # Read all remaining variables needed by ConfigCAM at once
+        if case is not None:
+            for key in keys:
+                if key not in self.__values:
+                    self.__read(key)
+                # End if
+            # End for
+        # End if
+
+    #++++++++++++++++++++++++
+
+    def __read(self, key):
+        """Read <key> from the case and remember its value"""
+        self.__num_reads += 1
+        self.__values[key] = self.__case.get_value(key)
+        return self.__values[key]
+
+    #++++++++++++++++++++++++
+
+    def get_value(self, key):
+
+        """
+        Return the value of case variable, <key>.
+        """
+
+        if key in self.__values:
+            return self.__values[key]
+        # End if
+        if self.__case is None:
+            emsg = "ERROR:  Case variable, '{}', is not in the case snapshot"
+            raise CamConfigValError(emsg.format(key))
+        # End if
+        return self.__read(key)
+
+    #++++++++++++++++++++++++
+
+    def invalidate(self, keys=None):
+
+        """
+        Forget the values of <keys> (default is every variable), so that
+        they are read from the case again on next use (e.g., after the
+        case has been changed).
+        """
+
+        if self.__case is None:
+            emsg = "ERROR:  Cannot invalidate a case reader without a case"
+            raise CamConfigValError(emsg)
+        # End if
+        if keys is None:
+            self.__values.clear()
+        else:
+            for key in keys:
+                self.__values.pop(key, None)
+            # End for
+        # End if
+
+    #++++++++++++++++++++++++
+
+    @property
+    def values(self):
+        """Return a dictionary of the case variables read so far"""
+        return dict(self.__values)
+
+    @property
+    def num_reads(self):
+        """Return the number of variables read from the case"""
+        return self.__num_reads
+
+    #++++++++++++++++++++++++
+
+    def save_snapshot(self, snapshot_file):
+
+        """
+        Write the case variables read so far to <snapshot_file> (JSON).
+        """
+
+        with open(snapshot_file, "w") as sfile:
+            json.dump({"version" : CASE_SNAPSHOT_VERSION,
+                       "values" : self.__values}, sfile, indent=2,
+                      sort_keys=True)
+            sfile.write("\n")
+        # End with
+
+    #++++++++++++++++++++++++
+
+    @staticmethod
+    def load_snapshot(snapshot_file):
+
+        """
+        Return the dictionary of case variables in <snapshot_file>.
+        """
+
+        with open(snapshot_file, "r") as sfile:
+            snapshot = _load_json(sfile)
+        # End with
+        if snapshot.get("version") != CASE_SNAPSHOT_VERSION:
+            emsg = "ERROR:  Case variable snapshot, '{}', has version {}, "
+            emsg += "expected version {}"
+            raise CamConfigValError(emsg.format(snapshot_file,
+                                                snapshot.get("version"),
+                                                CASE_SNAPSHOT_VERSION))
+        # End if
+        return snapshot["values"]
+
+# One case reader per case object (see case_reader)
+_CASE_READERS = weakref.WeakKeyDictionary()
+
+def case_reader(case):
+
+    """
+    Return the CamCaseReader for <case>, creating it on first use.
+    Configurations created from this reader (e.g., ConfigCAM(case_reader(case),
+    logger)) share the case values as they were when first read, call
+    its invalidate method after changing the case.
+    <case> may itself be a CamCaseReader.
+    """
+
+    if isinstance(case, CamCaseReader):
+        return case
+    # End if
+    try:
+        reader = _CASE_READERS.get(case)
+        if reader is None:
+            reader = CamCaseReader(case)
+            _CASE_READERS[case] = reader
+        # End if
+    except TypeError:
+        # <case> cannot be weakly referenced, do not share its reader
+        reader = CamCaseReader(case)
+    # End try
+    return reader
+
+###############################################################################
+# ConfigCAM snapshots
+###############################################################################
+
+# Format version of ConfigCAM snapshot files (see ConfigCAM.save_snapshot)
+CONFIG_SNAPSHOT_VERSION = 2
+
+def config_input_fingerprint(case_values, catalog_file=GRID_CATALOG_FILE):
+
+    """
+    Return the fingerprint (a SHA-256 hex digest) of the inputs to
+    ConfigCAM: <case_values>, a dictionary of the CASE_VARIABLES values,
+    the contents of the grid catalog, <catalog_file>, and the contents
+    of this file (so that code changes also invalidate snapshots).
+
+    Doctests:
+
+    >>> config_input_fingerprint({"ATM_NX" : 1}) == config_input_fingerprint({"ATM_NX" : 1})
+    True
+
+    >>> config_input_fingerprint({"ATM_NX" : 1}) == config_input_fingerprint({"ATM_NX" : 2})
+    False
+
+    """
+
+    hasher = hashlib.sha256()
+    hasher.update(str(CONFIG_SNAPSHOT_VERSION).encode("utf-8"))
+    hasher.update(json.dumps(case_values, sort_keys=True).encode("utf-8"))
+    with open(catalog_file, "rb") as cfile:
+        hasher.update(cfile.read())
+    # End with
+    with open(os.path.abspath(__file__), "rb") as sfile:
+        hasher.update(sfile.read())
+    # End with
+    return hasher.hexdigest()
+
+def case_input_fingerprint(case):
+
+    """
+    Return the input fingerprint (see config_input_fingerprint) of
+    <case> (a CIME case or CamCaseReader), reading exactly the
+    CASE_VARIABLES, without creating a ConfigCAM object.
+    """
+
+    return config_input_fingerprint({key : case.get_value(key)
+                                     for key in CASE_VARIABLES})
+
+def _encode_valid_vals(valid_vals):
+
+    """
+    Return a JSON-compatible version of <valid_vals> (see ConfigInteger
+    and ConfigString).
+
+    Doctests:
+
+    >>> _encode_valid_vals((1, None))
+    {'range': [1, None]}
+
+    >>> _decode_valid_vals(_encode_valid_vals(re.compile(r"T[0-9]+"))).pattern
+    'T[0-9]+'
+
+    """
+
+    if valid_vals is None:
+        return None
+    # End if
+    if isinstance(valid_vals, tuple):
+        return {"range" : list(valid_vals)}
+    # End if
+    if isinstance(valid_vals, REGEX_TYPE):
+        return {"regex" : valid_vals.pattern}
+    # End if
+    return {"list" : list(valid_vals)}
+
+def _decode_valid_vals(encoded):
+
+    """
+    Return the valid values encoded by <encoded> (see _encode_valid_vals).
+    """
+
+    if encoded is None:
+        return None
+    # End if
+    if "range" in encoded:
+        return tuple(encoded["range"])
+    # End if
+    if "regex" in encoded:
+        return re.compile(encoded["regex"])
+    # End if
+    return list(encoded["list"])
+
+###############################################################################
+# ConfigCAM fingerprints
+###############################################################################
+
+# Configure options which change generated code or compilation
+# (every integer option is also compiled in, see ConfigCAM.write_constants)
+BUILD_CONFIG_VARS = ("dyn", "hgrid", "nlev", "pcols", "psubcols",
+                     "physics_suites")
+
+# Build stages, in the order they are run
+BUILD_STAGES = ("registry", "compile", "namelist")
+
+# Build stages invalidated by a change to each ConfigCAM fingerprint
+FINGERPRINT_STAGES = {"build" : ("registry", "compile", "namelist"),
+                      "namelist" : ("namelist",)}
+
+def config_fingerprint(values):
+
+    """
+    Return the fingerprint (a SHA-256 hex digest) of <values>, a
+    dictionary of configure option values.
+
+    Doctests:
+
+    >>> config_fingerprint({"nlev" : 30, "dyn" : "se"}) == config_fingerprint({"dyn" : "se", "nlev" : 30})
+    True
+
+    >>> config_fingerprint({"nlev" : 30}) == config_fingerprint({"nlev" : 32})
+    False
+
+    """
+
+    return hashlib.sha256(json.dumps(values,
+                                     sort_keys=True).encode("utf-8")).hexdigest()
+
+def stages_invalidated(old_fingerprints, new_fingerprints):
+
+    """
+    Return the build stages (in BUILD_STAGES order) invalidated by
+    the changes from <old_fingerprints> to <new_fingerprints>,
+    dictionaries keyed by fingerprint kind (see FINGERPRINT_STAGES).
+    A kind missing from <old_fingerprints> (or <old_fingerprints> of None)
+    counts as a change.
+
+    Doctests:
+
+    >>> stages_invalidated({"build" : "a", "namelist" : "b"}, {"build" : "a", "namelist" : "c"})
+    ['namelist']
+
+    >>> stages_invalidated({"build" : "a", "namelist" : "b"}, {"build" : "d", "namelist" : "b"})
+    ['registry', 'compile', 'namelist']
+
+    >>> stages_invalidated({"build" : "a", "namelist" : "b"}, {"build" : "a", "namelist" : "b"})
+    []
+
+    >>> stages_invalidated(None, {"build" : "a", "namelist" : "b"})
+    ['registry', 'compile', 'namelist']
+
+    """
+
+    if old_fingerprints is None:
+        old_fingerprints = dict()
+    # End if
+    invalid = set()
+    for kind, fingerprint in new_fingerprints.items():
+        if old_fingerprints.get(kind) != fingerprint:
+            invalid.update(FINGERPRINT_STAGES[kind])
+        # End if
+    # End for
+    return [stage for stage in BUILD_STAGES if stage in invalid]
+
+###############################################################################
+# Physics suites
+###############################################################################
+
+# Information about one physics suite definition file (SDF)
+# groups: ((<group name>, (<scheme>, ...)), ...) in SDF order
+# schemes: Every scheme in the suite, in SDF order without duplicates
+# nml_groups: The namelist groups used by the suite's schemes
+SuiteInfo = namedtuple('SuiteInfo', ['name', 'sdf_file', 'sdf_hash',
+                                     'groups', 'schemes', 'nml_groups'])
+
+# Parsed SDFs and scheme namelist groups, keyed by file content hash
+_SUITE_DEFINITIONS = dict()
+_SCHEME_NML_GROUPS = dict()
+
+# Scheme namelist file paths, keyed by scheme directories (see scheme_nml_index)
+_SCHEME_NML_INDEX = dict()
+
+def _file_sha256(filename):
+
+    """
+    Return the SHA-256 hex digest of the contents of <filename>.
+    """
+
+    with open(filename, "rb") as infile:
+        return hashlib.sha256(infile.read()).hexdigest()
+    # End with
+
+def find_suite_file(suite_name, suite_dirs):
+
+    """
+    Return the physics suite definition file for <suite_name>
+    ("suite_<suite_name>.xml" or "<suite_name>.xml") in <suite_dirs>.
+    """
+
+    for sdir in suite_dirs:
+        for fname in ("suite_{}.xml".format(suite_name),
+                      "{}.xml".format(suite_name)):
+            sdf_file = os.path.join(sdir, fname)
+            if os.path.isfile(sdf_file):
+                return sdf_file
+            # End if
+        # End for
+    # End for
+    emsg = "ERROR:  No suite definition file for physics suite, '{}', in {}"
+    raise CamConfigValError(emsg.format(suite_name, ", ".join(suite_dirs)))
+
+def suite_definition(sdf_file):
+
+    """
+    Return the suite name and groups of <sdf_file> (see SuiteInfo),
+    which is only parsed again if its contents change.
+    """
+
+    sdf_hash = _file_sha256(sdf_file)
+    if sdf_hash not in _SUITE_DEFINITIONS:
+        root = ET.parse(sdf_file).getroot()
+        if root.tag != "suite":
+            emsg = "ERROR:  '{}' is not a suite definition file"
+            raise CamConfigValError(emsg.format(sdf_file))
+        # End if
+        groups = tuple((group.get("name"),
+                        tuple(x.text.strip() for x in group.iter("scheme")))
+                       for group in root.findall("group"))
+        _SUITE_DEFINITIONS[sdf_hash] = (root.get("name"), groups)
+    # End if
+    return sdf_hash, _SUITE_DEFINITIONS[sdf_hash]
+
+def scheme_nml_index(scheme_dirs):
+
+    """
+    Return a dictionary of the path of every "*_namelist.xml" file in
+    (or below) <scheme_dirs>, keyed by file name. If a file name occurs
+    more than once, the first one found is kept (directories are
+    searched in <scheme_dirs> order, then in sorted order below each one).
+    The index is built once per process for each <scheme_dirs>.
+    """
+
+    key = tuple(os.path.abspath(x) for x in scheme_dirs)
+    if key not in _SCHEME_NML_INDEX:
+        index = dict()
+        for sdir in key:
+            for dirpath, dirnames, filenames in os.walk(sdir):
+                dirnames.sort()
+                for fname in sorted(filenames):
+                    if fname.endswith("_namelist.xml") and (fname not in index):
+                        index[fname] = os.path.join(dirpath, fname)
+                    # End if
+                # End for
+            # End for
+        # End for
+        _SCHEME_NML_INDEX[key] = index
+    # End if
+    return _SCHEME_NML_INDEX[key]
+
+def scheme_nml_groups(scheme, scheme_dirs):
+
+    """
+    Return the namelist groups used by <scheme>, the groups of the
+    entries in its "<scheme>_namelist.xml" file in (or below)
+    <scheme_dirs> (see scheme_nml_index).
+    A scheme without a namelist file uses no groups.
+    """
+
+    nml_file = scheme_nml_index(scheme_dirs).get(
+        "{}_namelist.xml".format(scheme))
+    if nml_file is None:
+        return tuple()
+    # End if
+    nml_hash = _file_sha256(nml_file)
+    if nml_hash not in _SCHEME_NML_GROUPS:
+        root = ET.parse(nml_file).getroot()
+        groups = list()
+        for group in root.iter("group"):
+            if group.text.strip() not in groups:
+                groups.append(group.text.strip())
+            # End if
+        # End for
+        _SCHEME_NML_GROUPS[nml_hash] = tuple(groups)
+    # End if
+    return _SCHEME_NML_GROUPS[nml_hash]
+
+def resolve_suite(suite_name, suite_dirs, scheme_dirs=None):
+
+    """
+    Return the SuiteInfo for physics suite <suite_name>, whose suite
+    definition file is in <suite_dirs> and whose schemes' namelist files
+    are in <scheme_dirs> (default is <suite_dirs>).
+    """
+
+    if scheme_dirs is None:
+        scheme_dirs = suite_dirs
+    # End if
+    sdf_file = find_suite_file(suite_name, suite_dirs)
+    sdf_hash, (name, groups) = suite_definition(sdf_file)
+    schemes = list()
+    nml_groups = list()
+    for _, gschemes in groups:
+        for scheme in gschemes:
+            if scheme in schemes:
+                continue
+            # End if
+            schemes.append(scheme)
+            for group in scheme_nml_groups(scheme, scheme_dirs):
+                if group not in nml_groups:
+                    nml_groups.append(group)
+                # End if
+            # End for
+        # End for
+    # End for
+    return SuiteInfo(name, sdf_file, sdf_hash, groups, tuple(schemes),
+                     tuple(nml_groups))
+
+###############################################################################
+# Namelist defaults
+###############################################################################
+
+class NamelistDefaults:
+
+    """
+    Index of the default values of CAM namelist variables, read from a
+    namelist defaults file in the CIME entry_id format:
+
+    <entry id="<variable>">
+      <group><namelist group></group>
+      <values>
+        <value><default value></value>
+        <value <attribute>="<attribute value>" ...><value></value>
+      </values>
+    </entry>
+
+    A value matches a set of attributes (e.g., the namelist attribute
+    values of a ConfigCAM object, see ConfigCAM.nml_attributes) when
+    every one of its attributes is in the set with the same value.
+    The default for a variable is its matching value with the most
+    attributes (the first one in the file if there is a tie).
+
+    Rather than checking every value of a variable, the values are
+    indexed by their attribute names (in order of decreasing attribute
+    count) and then by their attribute values so that each attribute
+    name set needs only one dictionary lookup.
+
+    Inputs to initalize class are:
+    defaults_file -> Name of the namelist defaults file
+    """
+
+    def __init__(self, defaults_file):
+
+        # Namelist group and value index by variable name
+        self.__entries = OrderedDict()
+
+        # Variable names by namelist group
+        self.__groups = OrderedDict()
+
+        root = ET.parse(defaults_file).getroot()
+        for entry in root.iter("entry"):
+            name = entry.get("id")
+            group = entry.findtext("group")
+            if name in self.__entries:
+                emsg = "ERROR:  Duplicate namelist variable, '{}', in '{}'"
+                raise CamConfigValError(emsg.format(name, defaults_file))
+            # End if
+            # attribute names -> {attribute values -> (position, value)}
+            index = dict()
+            for position, value in enumerate(entry.iter("value")):
+                attr_names = tuple(sorted(value.attrib))
+                attr_vals = tuple(value.get(x) for x in attr_names)
+                by_vals = index.setdefault(attr_names, dict())
+                if attr_vals not in by_vals:
+                    by_vals[attr_vals] = (position, (value.text or "").strip())
+                # End if
+            # End for
+            # Most specific attribute name sets first
+            ordered = sorted(index.items(), key=lambda x: -len(x[0]))
+            self.__entries[name] = (group, ordered)
+            self.__groups.setdefault(group, list()).append(name)
+        # End for
+
+    #++++++++++++++++++++++++
+
+    def groups(self):
+
+        """
+        Return the namelist groups which have variables in this file.
+        """
+
+        return list(self.__groups)
+
+    #++++++++++++++++++++++++
+
+    def variables(self, group):
+
+        """
+        Return the names of the variables in namelist <group>.
+        """
+
+        return list(self.__groups.get(group, list()))
+
+    #++++++++++++++++++++++++
+
+    def get_value(self, name, attributes):
+
+        """
+        Return the default value of namelist variable <name> given
+        <attributes>, a dictionary of attribute values (as strings).
+        Return None if <name> is not in this file or has no value that
+        matches <attributes>.
+        """
+
+        if name not in self.__entries:
+            return None
+        # End if
+        best = None
+        best_len = -1
+        for attr_names, by_vals in self.__entries[name][1]:
+            if len(attr_names) < best_len:
+                # A less specific value cannot be a better match
+                break
+            # End if
+            try:
+                key = tuple(attributes[x] for x in attr_names)
+            except KeyError:
+                continue
+            # End try
+            match = by_vals.get(key)
+            if (match is not None) and ((best is None) or (match[0] < best[0])):
+                best = match
+                best_len = len(attr_names)
+            # End if
+        # End for
+        if best is None:
+            return None
+        # End if
+        return best[1]
+
+    #++++++++++++++++++++++++
+
+    def group_values(self, groups, attributes):
+
+        """
+        Return the default values of the variables in each of <groups>
+        given <attributes> (see get_value), as an OrderedDict of
+        OrderedDicts keyed by group and then by variable name.
+        Variables without a matching value are not included.
+        """
+
+        values = OrderedDict()
+        for group in groups:
+            values[group] = OrderedDict()
+            for name in self.__groups.get(group, list()):
+                value = self.get_value(name, attributes)
+                if value is not None:
+                    values[group][name] = value
+                # End if
+            # End for
+        # End for
+        return values
+
+# Namelist defaults, keyed by defaults file
+_NAMELIST_DEFAULTS = dict()
+
+def namelist_defaults(defaults_file):
+
+    """
+    Return the NamelistDefaults for <defaults_file>, which is only read once.
+    """
+
+    if defaults_file not in _NAMELIST_DEFAULTS:
+        _NAMELIST_DEFAULTS[defaults_file] = NamelistDefaults(defaults_file)
+    # End if
+    return _NAMELIST_DEFAULTS[defaults_file]
+
+###############################################################################
+# Compile-time constants
+###############################################################################
+
+# Default name of the generated Fortran constants module (and CPP header)
+CONSTANTS_MODULE_NAME = "cam_config_constants"
+
+# CPP macro names used by CAM source code for configure options
+# (other options use CAM_CONFIG_<upper-case name>, see cpp_macro_name)
+CPP_MACRO_NAMES = {"nlat" : "PLAT", "nlon" : "PLON", "nlev" : "PLEV",
+                   "pcols" : "PCOLS", "psubcols" : "PSUBCOLS",
+                   "trm" : "PTRM", "trn" : "PTRN", "trk" : "PTRK"}
+
+def cpp_macro_name(name):
+
+    """
+    Return the CPP macro name for configure option <name>.
+
+    Doctests:
+
+    >>> cpp_macro_name("nlat")
+    'PLAT'
+
+    >>> cpp_macro_name("test_int")
+    'CAM_CONFIG_TEST_INT'
+
+    """
+
+    return CPP_MACRO_NAMES.get(name, "CAM_CONFIG_{}".format(name.upper()))
+
+def write_if_changed(filename, contents):
+
+    """
+    Write <contents> to <filename> unless the file already holds
+    <contents>, so that its modification time (and anything built
+    from it) only changes with its contents.
+    Return True if the file was written.
+    """
+
+    if os.path.isfile(filename):
+        with open(filename, "r") as infile:
+            if infile.read() == contents:
+                return False
+            # End if
+        # End with
+    # End if
+    with open(filename, "w") as outfile:
+        outfile.write(contents)
+    # End with
+    return True
+
+###############################################################################
+# Registry generation
+###############################################################################
+
+# Configure options which fix the size of a registry dimension
+# (see _DIMENSION_ALIASES in generate_registry_data.py)
+REGISTRY_DIMENSION_OPTIONS = ("pcols", "nlev")
+
+# Location of the registry generator (generate_registry_data.py)
+REGISTRY_GEN_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src", "data")
+
+def _registry_generator():
+
+    """
+    Return the registry generator module (generate_registry_data),
+    which is only imported when a registry is generated.
+    """
+
+    if REGISTRY_GEN_DIR not in sys.path:
+        sys.path.append(REGISTRY_GEN_DIR)
+    # End if
+    # pylint: disable=import-outside-toplevel
+    import generate_registry_data
+    # pylint: enable=import-outside-toplevel
+    return generate_registry_data
+
+# Shared registry caches, keyed by registry generator directory
+_REGISTRY_CACHES = dict()
+
+def registry_cache():
+
+    """
+    Return the RegistryCache shared by every registry generated in this
+    process (see ConfigCAM.generate_registry), so that an unchanged
+    registry is only parsed and rendered once.
+    """
+
+    if REGISTRY_GEN_DIR not in _REGISTRY_CACHES:
+        _REGISTRY_CACHES[REGISTRY_GEN_DIR] = \
+            _registry_generator().RegistryCache()
+    # End if
+    return _REGISTRY_CACHES[REGISTRY_GEN_DIR]
+
 ###############################################################################
 # MAIN CAM CONFIGURE OBJECT
 ###############################################################################
 
-class ConfigCAM:
+class ConfigCAM(object):
 
     """
     Main CAM configuration object.
 
     Inputs to initalize class are:
-    case                   -> CIME case that uses CAM
+    case                   -> CIME case that uses CAM (or a CamCaseReader)
     logger                 -> Python logger object (ususally the CIME log)
 
     Doctests:
@@ -539,21 +1610,18 @@ class ConfigCAM:
         and associated dictionary.
         """
 
-        # Read in needed case variables
+        # Read in needed case variables (all at once, see CamCaseReader).
+        # A plain case is read fresh, pass a CamCaseReader (e.g., from
+        # case_reader) to share case values between configurations.
+        if not isinstance(case, CamCaseReader):
+            case = CamCaseReader(case)
+        # End if
         atm_grid = case.get_value("ATM_GRID")               # Atmosphere (CAM) grid
         cam_config_opts = case.get_value("CAM_CONFIG_OPTS") # CAM configuration options
         case_nx = case.get_value("ATM_NX")                  # Number of x-dimension grid-points (longitudes)
         case_ny = case.get_value("ATM_NY")                  # Number of y-dimension grid-points (latitudes)
         comp_ocn = case.get_value("COMP_OCN")               # CESM ocean component
 
-        # The following translation is hard-wired for backwards compatibility
-        # to support the differences between how the config_grids specifies the
-        # atmosphere grid and how it is specified internally
-
-        if atm_grid == 'ne30pg3':
-            atm_grid = 'ne30np4.pg3'
-        # End if
-
         # Level information for CAM is part of the atm grid name
         #    and must be stripped out
         case_nlev = ''
@@ -563,6 +1631,13 @@ class ConfigCAM:
             case_nlev = match.groups()[1]
         # End if
 
+        # Look up the grid in the CAM grid catalog, this also translates
+        # config_grids names (e.g., ne30pg3) to the internal CAM names
+        self.__grid = grid_catalog().lookup(atm_grid)
+        if self.__grid is not None:
+            atm_grid = self.__grid.name
+        # End if
+
         # Save user options as list
         user_config_opts = ConfigCAM.parse_config_opts(cam_config_opts)
 
@@ -574,6 +1649,7 @@ class ConfigCAM:
         if user_dyn_opt == "none":
             # If so, then set the atmospheric grid to "null"
             atm_grid = "null"
+            self.__grid = None
             case_nlev = "null"
             case_nx = "null"
             case_ny = "null"
@@ -587,12 +1663,15 @@ class ConfigCAM:
         #-----------------------------------------------
 
         # Create empty dictonary
-        self.__config_dict = dict()
+        self.__config_dict = OrderedDict()
 
         # Create namelist group list, starting with default namelist groups
         self.__nml_groups = ['cam_initfiles_nl', 'cam_logfile_nl',
                              'phys_ctl_nl', 'qneg_nl']
 
+        # Resolved physics suites (see resolve_physics_suites)
+        self.__suites = None
+
         #----------------------------------------
         # Set CAM grid variables (nlat,nlon,nlev)
         #----------------------------------------
@@ -601,6 +1680,9 @@ class ConfigCAM:
         if case_nlev:
             # Save variable for CPPDEFs
             nlev = case_nlev
+        elif self.__grid is not None:
+            # Save variable for CPPDEFs (grid default)
+            nlev = self.__grid.nlev
         else:
             # Save variable for CPPDEFs
             nlev = 30
@@ -644,67 +1726,30 @@ class ConfigCAM:
         # Cam horizontal grid meta-data
         hgrid_desc = "Horizontal grid specifier."
 
-        # Create regex expressions to search for the different dynamics grids
-        eul_grid_re = re.compile(r"T[0-9]+")                      # Eulerian dycore
-        fv_grid_re = re.compile(r"[0-9][0-9.]*x[0-9][0-9.]*")     # FV dycore
-        se_grid_re = re.compile(r"ne[0-9]+np[1-8](.*)(pg[1-9])?") # SE dycore
-        fv3_grid_re = re.compile(r"C[0-9]+")                      # FV3 dycore
-        mpas_grid_re = re.compile(r"mpasa[0-9]+")                 # MPAS dycore (not totally sure about this pattern)
-
-        # Check if specified grid matches any of the pre-defined grid options.
-        #   If so, then add both the horizontal grid and dynamical core
-        #   to the configure object
-        if fv_grid_re.match(atm_grid) is not None:
-            # Dynamical core
-            self.create_config("dyn", dyn_desc, "fv",
-                               dyn_valid_vals, is_nml_attr=True)
-            # Horizontal grid
-            self.create_config("hgrid", hgrid_desc, atm_grid,
-                               fv_grid_re, is_nml_attr=True)
-
-        elif se_grid_re.match(atm_grid) is not None:
-            # Dynamical core
-            self.create_config("dyn", dyn_desc, "se",
-                               dyn_valid_vals, is_nml_attr=True)
-            # Horizontal grid
-            self.create_config("hgrid", hgrid_desc, atm_grid,
-                               se_grid_re, is_nml_attr=True)
-
-        elif fv3_grid_re.match(atm_grid) is not None:
-            # Dynamical core
-            self.create_config("dyn", dyn_desc, "fv3",
-                               dyn_valid_vals, is_nml_attr=True)
-            # Horizontal grid
-            self.create_config("hgrid", hgrid_desc, atm_grid,
-                               fv3_grid_re, is_nml_attr=True)
-
-        elif mpas_grid_re.match(atm_grid) is not None:
+        # Check if specified grid matches any of the grids in the grid
+        #   catalog (see GridCatalog).  If so, then add both the horizontal
+        #   grid and dynamical core to the configure object
+        if self.__grid is not None:
             # Dynamical core
-            self.create_config("dyn", dyn_desc, "mpas",
+            self.create_config("dyn", dyn_desc, self.__grid.dycore,
                                dyn_valid_vals, is_nml_attr=True)
             # Horizontal grid
             self.create_config("hgrid", hgrid_desc, atm_grid,
-                               mpas_grid_re, is_nml_attr=True)
+                               grid_catalog().pattern(self.__grid.dycore),
+                               is_nml_attr=True)
 
-        elif eul_grid_re.match(atm_grid) is not None:
-            # Dynamical core
-            self.create_config("dyn", dyn_desc, "eul",
-                               dyn_valid_vals, is_nml_attr=True)
-            # Horizontal grid
-            self.create_config("hgrid", hgrid_desc, atm_grid,
-                               eul_grid_re, is_nml_attr=True)
+            if self.__grid.dycore == "eul":
+                # If using the Eulerian dycore, then add wavenumber variables
 
-            # If using the Eulerian dycore, then add wavenumber variables
+                # Wavenumber variable descriptions
+                trm_desc = "Maximum Fourier wavenumber."
+                trn_desc = "Highest degree of the Legendre polynomials for m=0."
+                trk_desc = "Highest degree of the associated Legendre polynomials."
 
-            # Wavenumber variable descriptions
-            trm_desc = "Maximum Fourier wavenumber."
-            trn_desc = "Highest degree of the Legendre polynomials for m=0."
-            trk_desc = "Highest degree of the associated Legendre polynomials."
-
-            # Add variables to configure object
-            self.create_config("trm", trm_desc, 1, (1, None))
-            self.create_config("trn", trn_desc, 1, (1, None))
-            self.create_config("trk", trk_desc, 1, (1, None))
+                # Add variables to configure object
+                self.create_config("trm", trm_desc, 1, (1, None))
+                self.create_config("trn", trn_desc, 1, (1, None))
+                self.create_config("trk", trk_desc, 1, (1, None))
 
         elif atm_grid == "null":
             # Dynamical core
@@ -761,6 +1806,9 @@ class ConfigCAM:
 
         self.print_all(case_log)
 
+        # Fingerprint of the inputs, used to check snapshots
+        self.__input_fingerprint = case_input_fingerprint(case)
+
     #+++++++++++++++++++++++
     # config_cam properties
     #+++++++++++++++++++++++
@@ -777,6 +1825,25 @@ class ConfigCAM:
         """Return the namelist groups list of this object"""
         return self.__nml_groups
 
+    @property
+    def input_fingerprint(self):
+        """Return the fingerprint of the inputs (case variables and grid
+        catalog) this object was created from"""
+        return self.__input_fingerprint
+
+    @property
+    def grid(self):
+        """Return the grid catalog information (a GridInfo) for this
+        object's horizontal grid (None for the null grid)"""
+        return self.__grid
+
+    @property
+    def suites(self):
+        """Return the resolved physics suites (an OrderedDict of SuiteInfo
+        by suite name) or None if they have not been resolved
+        (see resolve_physics_suites)"""
+        return self.__suites
+
 
     #++++++++++++++++++++++
     # ConfigCAM functions
@@ -910,6 +1977,604 @@ class ConfigCAM:
         # If it does, then return the object's value
         return obj.value
 
+    #++++++++++++++++++++++++
+
+    def save_snapshot(self, snapshot_file):
+
+        """
+        Write this configuration (every configure object, the namelist
+        groups, the grid information, and the input fingerprint) to
+        <snapshot_file> (JSON), see load_snapshot.
+        """
+
+        configs = list()
+        for obj in self.config_dict.values():
+            configs.append({"name" : obj.name, "desc" : obj.desc,
+                            "value" : obj.value,
+                            "valid_vals" : _encode_valid_vals(obj.valid_vals),
+                            "is_nml_attr" : obj.is_nml_attr})
+        # End for
+        if self.__grid is None:
+            grid = None
+        else:
+            grid = self.__grid._asdict()
+        # End if
+        if self.__suites is None:
+            suites = None
+        else:
+            suites = [x._asdict() for x in self.__suites.values()]
+        # End if
+        snapshot = {"version" : CONFIG_SNAPSHOT_VERSION,
+                    "input_fingerprint" : self.__input_fingerprint,
+                    "config" : configs,
+                    "nml_groups" : self.__nml_groups,
+                    "grid" : grid,
+                    "suites" : suites}
+        with open(snapshot_file, "w") as sfile:
+            json.dump(snapshot, sfile, indent=2)
+            sfile.write("\n")
+        # End with
+
+    #++++++++++++++++++++++++
+
+    @classmethod
+    def load_snapshot_for_case(cls, case, snapshot_file):
+
+        """
+        Return the ConfigCAM object saved in <snapshot_file> if it was
+        created from the current inputs of <case> (see
+        case_input_fingerprint), otherwise return None.
+        """
+
+        return cls.load_snapshot(snapshot_file, case_input_fingerprint(case))
+
+    #++++++++++++++++++++++++
+
+    @classmethod
+    def load_snapshot(cls, snapshot_file, input_fingerprint):
+
+        """
+        Return the ConfigCAM object saved in <snapshot_file> (see
+        save_snapshot) without reading the case.
+        Return None if <snapshot_file> does not exist, was written by a
+        different snapshot version, or was created from inputs with a
+        different fingerprint than <input_fingerprint> (see
+        config_input_fingerprint and load_snapshot_for_case).
+        """
+
+        if not os.path.exists(snapshot_file):
+            return None
+        # End if
+        try:
+            with open(snapshot_file, "r") as sfile:
+                snapshot = _load_json(sfile)
+            # End with
+        except ValueError:
+            return None
+        # End try
+        if snapshot.get("version") != CONFIG_SNAPSHOT_VERSION:
+            return None
+        # End if
+        if snapshot["input_fingerprint"] != input_fingerprint:
+            return None
+        # End if
+
+        # Rebuild the configuration without running __init__
+        config = cls.__new__(cls)
+        config.__config_dict = OrderedDict()
+        config.__nml_groups = list(snapshot["nml_groups"])
+        config.__input_fingerprint = snapshot["input_fingerprint"]
+        if snapshot["grid"] is None:
+            config.__grid = None
+        else:
+            config.__grid = GridInfo(**snapshot["grid"])
+        # End if
+        if snapshot["suites"] is None:
+            config.__suites = None
+        else:
+            config.__suites = OrderedDict()
+            for suite in snapshot["suites"]:
+                groups = tuple((x[0], tuple(x[1])) for x in suite["groups"])
+                config.__suites[suite["name"]] = SuiteInfo(
+                    suite["name"], suite["sdf_file"], suite["sdf_hash"],
+                    groups, tuple(suite["schemes"]),
+                    tuple(suite["nml_groups"]))
+            # End for
+        # End if
+        for item in snapshot["config"]:
+            config.create_config(item["name"], item["desc"], item["value"],
+                                 _decode_valid_vals(item["valid_vals"]),
+                                 is_nml_attr=item["is_nml_attr"])
+        # End for
+        return config
+
+    #++++++++++++++++++++++++
+
+    def derive(self, overrides):
+
+        """
+        Return a new ConfigCAM object which is a copy of this one with
+        the configure option values in <overrides> (a dictionary).
+        Only the overridden values are checked (see ConfigInteger and
+        ConfigString), everything else is copied from this object.
+        The grid (dyn and hgrid) cannot be overridden, nor can
+        physics_suites once this object's suites have been resolved
+        (see resolve_physics_suites).
+
+        Doctests:
+
+        >>> FCONFIG.derive({"pcols" : 32}).get_value("pcols")
+        32
+
+        >>> FCONFIG.get_value("pcols")
+        16
+
+        >>> FCONFIG.derive({"dyn" : "se"}) #doctest: +IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+        CamConfigValError: ERROR:  Configuration variable, 'dyn', cannot be overridden, it depends on the case grid
+
+        """
+
+        for name in overrides:
+            if name in ("dyn", "hgrid"):
+                emsg = "ERROR:  Configuration variable, '{}', cannot be "
+                emsg += "overridden, it depends on the case grid"
+                raise CamConfigValError(emsg.format(name))
+            # End if
+            if (name == "physics_suites") and (self.__suites is not None):
+                emsg = "ERROR:  Configuration variable, '{}', cannot be "
+                emsg += "overridden after the physics suites are resolved"
+                raise CamConfigValError(emsg.format(name))
+            # End if
+        # End for
+
+        config = copy.copy(self)
+        config.__config_dict = OrderedDict()
+        for name, obj in self.config_dict.items():
+            config.__config_dict[name] = copy.copy(obj)
+        # End for
+        config.__nml_groups = list(self.nml_groups)
+        if self.__suites is not None:
+            config.__suites = OrderedDict(self.__suites)
+        # End if
+        for name, val in overrides.items():
+            config.set_value(name, val)
+        # End for
+        config.__input_fingerprint = config_fingerprint(
+            {"base" : self.__input_fingerprint,
+             "overrides" : dict(overrides)})
+        return config
+
+    #++++++++++++++++++++++++
+
+    def build_fingerprint(self):
+
+        """
+        Return the fingerprint of the configure options which change
+        generated code or compilation (see BUILD_CONFIG_VARS), and of the
+        integer options compiled in by write_constants (see
+        integer_constants).
+        """
+
+        values = {name : self.get_value(name) for name in BUILD_CONFIG_VARS}
+        for name, value, _ in self.integer_constants():
+            values[name] = value
+        # End for
+        return config_fingerprint(values)
+
+    #++++++++++++++++++++++++
+
+    def namelist_fingerprint(self):
+
+        """
+        Return the fingerprint of the configuration which only changes
+        namelists (the namelist attributes not in BUILD_CONFIG_VARS and
+        the namelist groups).
+        """
+
+        values = {obj.name : obj.value for obj in self.config_dict.values()
+                  if obj.is_nml_attr and obj.name not in BUILD_CONFIG_VARS}
+        values["nml_groups"] = self.nml_groups
+        return config_fingerprint(values)
+
+    #++++++++++++++++++++++++
+
+    def fingerprints(self):
+
+        """
+        Return a dictionary of this configuration's fingerprints,
+        keyed by kind (see FINGERPRINT_STAGES).
+        """
+
+        return {"build" : self.build_fingerprint(),
+                "namelist" : self.namelist_fingerprint()}
+
+    #++++++++++++++++++++++++
+
+    def invalidated_stages(self, old_fingerprints):
+
+        """
+        Return the build stages (see BUILD_STAGES) which must be run
+        again for this configuration given <old_fingerprints>, the
+        fingerprints (see the fingerprints method) from the last build
+        (None if there was no last build).
+        """
+
+        return stages_invalidated(old_fingerprints, self.fingerprints())
+
+    #++++++++++++++++++++++++
+
+    def resolve_physics_suites(self, suite_dirs, scheme_dirs=None):
+
+        """
+        Find and parse the suite definition file of each suite in the
+        "physics_suites" configure option (see resolve_suite), and add
+        the namelist groups used by their schemes to this object's
+        namelist groups.
+        Suite definition and scheme namelist files are only parsed again
+        if their contents change, so other configurations in this process
+        share the parsed files.
+        Return the suites (see the suites property).
+        """
+
+        suites = OrderedDict()
+        for suite_name in self.get_value("physics_suites").split(","):
+            suite_name = suite_name.strip()
+            if suite_name and (suite_name not in suites):
+                suites[suite_name] = resolve_suite(suite_name, suite_dirs,
+                                                   scheme_dirs=scheme_dirs)
+            # End if
+        # End for
+        for suite in suites.values():
+            for group in suite.nml_groups:
+                if group not in self.__nml_groups:
+                    self.__nml_groups.append(group)
+                # End if
+            # End for
+        # End for
+        self.__suites = suites
+        return suites
+
+    #++++++++++++++++++++++++
+
+    def nml_attributes(self):
+
+        """
+        Return a dictionary of the values (as strings) of the configure
+        options which are namelist attributes, used to find namelist
+        default values.
+
+        Doctests:
+
+        >>> sorted(FCONFIG.nml_attributes().items())
+        [('dyn', 'none'), ('hgrid', 'null'), ('nlev', 'null'), ('ocn', 'socn'), ('pcols', '16'), ('physics_suites', 'adiabatic'), ('psubcols', '1')]
+
+        """
+
+        return {obj.name : str(obj.value) for obj in self.config_dict.values()
+                if obj.is_nml_attr}
+
+    #++++++++++++++++++++++++
+
+    def namelist_defaults(self, defaults_file):
+
+        """
+        Return the default values of the variables in each of this
+        configuration's namelist groups (see NamelistDefaults.group_values)
+        found in <defaults_file>, a namelist defaults file.
+        """
+
+        return namelist_defaults(defaults_file).group_values(
+            self.nml_groups, self.nml_attributes())
+
+    #++++++++++++++++++++++++
+
+    def registry_config(self, fixed_dimensions=False):
+
+        """
+        Return a dictionary of configure option values to pass to the
+        registry generator (numeric strings, e.g. an "nlev" taken from
+        the grid name, are converted to integers).
+        The options which fix registry dimension sizes (see
+        REGISTRY_DIMENSION_OPTIONS) are only included if
+        <fixed_dimensions> is True.
+
+        Doctests:
+
+        >>> FCONFIG.registry_config()["dyn"]
+        'none'
+
+        >>> "pcols" in FCONFIG.registry_config()
+        False
+
+        >>> FCONFIG.registry_config(fixed_dimensions=True)["pcols"]
+        16
+
+        """
+
+        config = dict()
+        for obj in self.config_dict.values():
+            if ((not fixed_dimensions) and
+                    (obj.name in REGISTRY_DIMENSION_OPTIONS)):
+                continue
+            # End if
+            value = obj.value
+            if isinstance(value, str) and value.isdigit():
+                value = int(value)
+            # End if
+            config[obj.name] = value
+        # End for
+        return config
+
+    #++++++++++++++++++++++++
+
+    def generate_registry(self, registry_file, outdir, indent, case_log,
+                          cache=None, fixed_dimensions=False, **kwargs):
+
+        """
+        Generate the source code and metadata for <registry_file> in
+        <outdir> (see gen_registry in generate_registry_data.py) using
+        this configuration's dycore and configure options.
+        This runs the registry generator in this process, reusing
+        <cache> (default is the shared registry_cache()) so that
+        repeated calls for an unchanged registry and configuration do
+        not parse or render it again.
+        Set <fixed_dimensions> to True to fix the sizes of the horizontal
+        and vertical dimensions to pcols and nlev (see registry_config).
+        <kwargs> are passed to gen_registry.
+        """
+
+        gen_reg = _registry_generator()
+        if cache is None:
+            cache = registry_cache()
+        # End if
+        config = self.registry_config(fixed_dimensions=fixed_dimensions)
+        retcode = gen_reg.gen_registry(registry_file, self.get_value("dyn"),
+                                       config, outdir, indent,
+                                       logger=case_log, cache=cache,
+                                       **kwargs)
+        if retcode != 0:
+            emsg = "ERROR:  Unable to generate CAM registry files from '{}'"
+            raise CamConfigValError(emsg.format(registry_file))
+        # End if
+
+    #++++++++++++++++++++++++
+
+    def integer_constants(self):
+
+        """
+        Return a list of (name, value, description) for each configure
+        option with an integer value (see registry_config), in the order
+        the options were created. The description is the first line of
+        the option's description.
+
+        Doctests:
+
+        >>> [x[0:2] for x in FCONFIG.integer_constants() if x[0].startswith("p")]
+        [('pcols', 16), ('psubcols', 1)]
+
+        """
+
+        constants = list()
+        config = self.registry_config(fixed_dimensions=True)
+        for name in self.config_dict:
+            value = config.get(name)
+            if isinstance(value, int) and not isinstance(value, bool):
+                lines = [x.strip() for x in
+                         self.config_dict[name].desc.splitlines() if x.strip()]
+                desc = lines[0] if lines else name
+                constants.append((name, value, desc))
+            # End if
+        # End for
+        return constants
+
+    #++++++++++++++++++++++++
+
+    def write_constants(self, outdir, module_name=CONSTANTS_MODULE_NAME):
+
+        """
+        Write a Fortran module, <outdir>/<module_name>.F90, with a named
+        parameter, config_<name>, for each integer configure option (see
+        integer_constants), and a CPP header, <outdir>/<module_name>.h,
+        with a matching macro (see cpp_macro_name) for each option.
+        A file is only rewritten if its contents change, so an unchanged
+        configuration does not cause a rebuild.
+        Return the list of files that were written.
+        """
+
+        constants = self.integer_constants()
+        width = max([len(x[0]) for x in constants] + [1])
+
+        # Fortran constants module
+        lines = ["! Generated by ConfigCAM (cam_config.py), do not edit",
+                 "module {}".format(module_name), "",
+                 "   implicit none", "   private", ""]
+        for name, value, desc in constants:
+            lines.append("   ! {}".format(desc))
+            lines.append("   integer, public, parameter :: config_{} = {}".format(
+                name.ljust(width), value))
+        # End for
+        lines.extend(["", "end module {}".format(module_name)])
+        f90_contents = "\n".join(lines) + "\n"
+
+        # CPP header
+        guard = "{}_H".format(module_name.upper())
+        lines = ["/* Generated by ConfigCAM (cam_config.py), do not edit */",
+                 "#ifndef {}".format(guard), "#define {}".format(guard), ""]
+        for name, value, desc in constants:
+            macro = cpp_macro_name(name)
+            lines.append("/* {} */".format(desc))
+            lines.append("#define {} {}".format(macro, value))
+        # End for
+        lines.extend(["", "#endif /* {} */".format(guard)])
+        h_contents = "\n".join(lines) + "\n"
+
+        written = list()
+        for suffix, contents in ((".F90", f90_contents), (".h", h_contents)):
+            filename = os.path.join(outdir, module_name + suffix)
+            if write_if_changed(filename, contents):
+                written.append(filename)
+            # End if
+        # End for
+        return written
+
+    #++++++++++++++++++++++++
+
+    def num_columns(self):
+
+        """
+        Return the total number of horizontal (physics) columns in the
+        CAM grid from the grid catalog or, if the catalog does not know,
+        nlat * nlon (nlat is one for unstructured grids).
+        """
+
+        if (self.__grid is not None) and (self.__grid.ncols is not None):
+            return self.__grid.ncols
+        # End if
+        nlat = self.get_value("nlat")
+        nlon = self.get_value("nlon")
+        if not (isinstance(nlat, int) and isinstance(nlon, int)):
+            emsg = "ERROR:  The number of columns is not known for grid, '{}'"
+            raise CamConfigValError(emsg.format(self.get_value("hgrid")))
+        # End if
+        return nlat * nlon
+
+    #++++++++++++++++++++++++
+
+    def plan_pcols(self, ntasks, nthreads, ncols=None, candidates=None,
+                   nfields=PCOLS_PLAN_FIELDS,
+                   cache_bytes=PCOLS_PLAN_CACHE_BYTES):
+
+        """
+        Return a list of planner metrics (PcolsCandidate objects, see
+        pcols_candidate) for each of <candidates> (default is
+        PCOLS_CANDIDATES) as the value of pcols for this configuration
+        run with <ntasks> MPI tasks of <nthreads> OpenMP threads each.
+        <ncols> is the number of horizontal columns (default is
+        num_columns()).
+        Candidates larger than the number of columns on a task are
+        skipped (unless none are left).
+        """
+
+        if (ntasks < 1) or (nthreads < 1):
+            emsg = "ERROR:  The number of tasks ({}) and threads ({}) "
+            emsg += "must be positive"
+            raise CamConfigValError(emsg.format(ntasks, nthreads))
+        # End if
+        if ncols is None:
+            ncols = self.num_columns()
+        # End if
+        nlev = self.get_value("nlev")
+        if not str(nlev).isdigit():
+            emsg = "ERROR:  The number of levels is not known, nlev = '{}'"
+            raise CamConfigValError(emsg.format(nlev))
+        # End if
+        if candidates is None:
+            candidates = PCOLS_CANDIDATES
+        # End if
+
+        # Skip chunks larger than the columns on a task
+        cols_per_task = -(-ncols // ntasks)
+        pcols_list = [x for x in candidates if x <= cols_per_task]
+        if not pcols_list:
+            pcols_list = [min(candidates)]
+        # End if
+
+        return [pcols_candidate(x, ncols, ntasks, nthreads, int(nlev),
+                                nfields=nfields, cache_bytes=cache_bytes)
+                for x in sorted(pcols_list)]
+
+    #++++++++++++++++++++++++
+
+    def set_pcols(self, ntasks, nthreads, imbalance_tol=0.05, **kwargs):
+
+        """
+        Set pcols to the value recommended (see recommend_pcols) from
+        plan_pcols(<ntasks>, <nthreads>, **<kwargs>).
+        Return the chosen PcolsCandidate.
+        """
+
+        best = recommend_pcols(self.plan_pcols(ntasks, nthreads, **kwargs),
+                               nthreads, imbalance_tol=imbalance_tol)
+        self.set_value("pcols", best.pcols)
+        return best
+
+###############################################################################
+# CAM ENSEMBLE CONFIGURATION
+###############################################################################
+
+class ConfigEnsemble:
+
+    """
+    Configurations for the members of an ensemble which differ from a
+    base configuration in only a few configure option values.
+    The base configuration is created once, each member is derived
+    from it (see ConfigCAM.derive).
+
+    Inputs to initalize class are:
+    base_config -> The ConfigCAM object for the base case
+
+    Doctests:
+
+    >>> ENS = ConfigEnsemble(FCONFIG)
+    >>> _ = ENS.add_member("mem001", {"ocn" : "docn"})
+    >>> _ = ENS.add_member("mem002", {"pcols" : 32})
+    >>> _ = ENS.add_member("mem003", {"ocn" : "aquaplanet"})
+    >>> list(ENS.build_groups().values())
+    [['mem001', 'mem003'], ['mem002']]
+
+    """
+
+    def __init__(self, base_config):
+
+        self.__base = base_config
+        self.__members = OrderedDict()
+
+    #++++++++++++++++++++++++
+
+    @property
+    def base(self):
+        """Return the base configuration"""
+        return self.__base
+
+    @property
+    def members(self):
+        """Return the member configurations (an OrderedDict of ConfigCAM
+        objects by member name)"""
+        return self.__members
+
+    #++++++++++++++++++++++++
+
+    def add_member(self, name, overrides):
+
+        """
+        Add member <name>, the base configuration with the configure
+        option values in <overrides>, and return its configuration.
+        """
+
+        if name in self.__members:
+            emsg = "ERROR:  Ensemble member, '{}', already exists"
+            raise CamConfigValError(emsg.format(name))
+        # End if
+        self.__members[name] = self.__base.derive(overrides)
+        return self.__members[name]
+
+    #++++++++++++++++++++++++
+
+    def build_groups(self):
+
+        """
+        Return the ensemble members grouped by build fingerprint (see
+        ConfigCAM.build_fingerprint), an OrderedDict of member name lists
+        keyed by fingerprint. Each group needs to be built only once.
+        """
+
+        groups = OrderedDict()
+        for name, config in self.__members.items():
+            groups.setdefault(config.build_fingerprint(), list()).append(name)
+        # End for
+        return groups
+
 ###############################################################################
 #IGNORE EVERYTHING BELOW HERE UNLESS RUNNING TESTS ON CAM_CONFIG!
 ###############################################################################
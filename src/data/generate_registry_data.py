@@ -12,9 +12,13 @@ import xml.etree.ElementTree as ET # pylint: disable=unused-import
 import os
 import os.path
 import re
+import hashlib
+import json
 import argparse
 import sys
+import locale
 import logging
+import tempfile
 from collections import OrderedDict
 
 # Find and include the ccpp-framework scripts directory
@@ -26,13 +30,30 @@ if __SPINSCRIPTS not in sys.path:
     sys.path.append(__SPINSCRIPTS)
 # end if
 
+###############################################################################
+class _DeferredImport(object):
+###############################################################################
+    """A module which is imported when one of its attributes is first used.
+    The ccpp-framework modules are only needed once a registry is read,
+    validated, or written so a no-op run (see main) or --help does not
+    pay for importing them.
+
+    >>> _DeferredImport('os').path is os.path
+    True
+    """
+
+    def __init__(self, name):
+        """Initialize a deferred import of module, <name>"""
+        self.__name = name
+
+    def __getattr__(self, attr):
+        """Import the module and return its attribute, <attr>"""
+        module = __import__(self.__name)
+        return getattr(module, attr)
+
 # CCPP framework imports
-# pylint: disable=wrong-import-position
-from parse_tools import validate_xml_file, read_xml_file
-from parse_tools import find_schema_file, find_schema_version
-from parse_tools import init_log, CCPPError, ParseInternalError
-from fortran_tools import FortranWriter
-# pylint: enable=wrong-import-position
+parse_tools = _DeferredImport('parse_tools')
+fortran_tools = _DeferredImport('fortran_tools')
 
 ###############################################################################
 def convert_to_long_name(standard_name):
@@ -50,14 +71,569 @@ def write_ccpp_table_header(name, outfile):
     outfile.write(r"!> \section arg_table_{}  Argument Table".format(name), 0)
     outfile.write(r"!! \htmlinclude {}.html".format(name), 0)
 
+# Format version of the JSON sidecar written with each metadata file
+METADATA_SIDECAR_VERSION = 1
+
+###############################################################################
+def file_sha256(filename):
+###############################################################################
+    """Return the SHA-256 hex digest of the contents of <filename>"""
+    with open(filename, "rb") as infile:
+        return hashlib.sha256(infile.read()).hexdigest()
+    # end with
+
+###############################################################################
+def load_metadata_sidecar(meta_filename):
+###############################################################################
+    """Return the list of argument tables from the JSON sidecar for
+    metadata file, <meta_filename>.
+    Each table is a dictionary with name, type, and variables entries.
+    Return None if there is no sidecar, if it has a different format
+    version, or if <meta_filename> has changed since the sidecar was
+    written (its hash does not match); the caller should then parse
+    <meta_filename> itself."""
+    sidecar_name = meta_filename + '.json'
+    if not (os.path.exists(sidecar_name) and os.path.exists(meta_filename)):
+        return None
+    # end if
+    try:
+        with open(sidecar_name, "r") as infile:
+            sidecar = json.load(infile, object_pairs_hook=OrderedDict)
+        # end with
+    except ValueError:
+        return None
+    # end try
+    if sidecar.get('version') != METADATA_SIDECAR_VERSION:
+        return None
+    # end if
+    if sidecar.get('sha256') != file_sha256(meta_filename):
+        return None
+    # end if
+    return sidecar.get('tables')
+
+###############################################################################
+class DirectorySink(object):
+###############################################################################
+    """Destination for the files written by the registry File writers
+    (e.g., File.write_source). A DirectorySink writes each file to the
+    directory, <outdir>.
+    The writers open <sink>.target(<filename>) with open() or
+    FortranWriter so that every sink shares the same rendering code.
+    >>> DirectorySink('/tmp').path('foo.F90')
+    '/tmp/foo.F90'
+    """
+
+    def __init__(self, outdir):
+        """Initialize a sink for <outdir>"""
+        self.__outdir = outdir
+
+    def create(self):
+        """Make sure this sink's output directory exists"""
+        if not os.path.exists(self.__outdir):
+            os.makedirs(self.__outdir)
+        # end if
+
+    def path(self, basename):
+        """Return the name of the generated file, <basename>"""
+        return os.path.join(self.__outdir, basename)
+
+    def target(self, filename):
+        """Return the argument to open() or FortranWriter which writes
+        <filename> (as returned by <path>)"""
+        return filename
+
+    def read(self, filename):
+        """Return the contents of <filename> (as bytes)"""
+        with open(filename, "rb") as infile:
+            return infile.read()
+        # end with
+
+    def write(self, basename, data):
+        """Write <data> (bytes) to generated file, <basename>.
+        Return the name of the file."""
+        filename = self.path(basename)
+        with open(self.target(filename), "wb") as outfile:
+            outfile.write(data)
+        # end with
+        return filename
+
+    def __str__(self):
+        """Return the output directory"""
+        return self.__outdir
+
+###############################################################################
+class MemorySink(DirectorySink):
+###############################################################################
+    """Registry output sink which keeps every generated file in memory
+    instead of writing it to a directory. File names are basenames.
+    Each target is a file descriptor of an anonymous, memory-backed file
+    so that open() and FortranWriter write to it unchanged. Where there
+    are no anonymous memory files (or open() does not take a file
+    descriptor), each target is the path of a temporary file instead.
+    >>> with MemorySink() as sink:
+    ...     with open(sink.target(sink.path('foo.txt')), "w") as outfile:
+    ...         _ = outfile.write('bar')
+    ...     list(sink.files().items()) == [('foo.txt', 'bar')]
+    True
+    """
+
+    def __init__(self):
+        """Initialize an empty sink"""
+        super(MemorySink, self).__init__('<memory>')
+        self.__fds = OrderedDict() # filename -> file descriptor
+        self.__paths = dict()      # filename -> temporary file path
+
+    def create(self):
+        """There is no directory to create"""
+        return
+
+    def path(self, basename):
+        """Return the name of the generated file, <basename>"""
+        return basename
+
+    def target(self, filename):
+        """Return a new file descriptor to write <filename> to.
+        Any previous contents of <filename> are discarded."""
+        self.__discard(filename)
+        if hasattr(os, 'memfd_create'):
+            fdesc = os.memfd_create(filename)
+            self.__fds[filename] = fdesc
+            # The writer closes its own descriptor, keep ours for reading
+            return os.dup(fdesc)
+        # end if
+        # No anonymous memory files, use a temporary file
+        fdesc, tpath = tempfile.mkstemp(suffix='_' + filename)
+        self.__fds[filename] = fdesc
+        self.__paths[filename] = tpath
+        return tpath
+
+    def read(self, filename):
+        """Return the contents of <filename> (as bytes)"""
+        if filename not in self.__fds:
+            emsg = "No generated file named '{}'"
+            raise parse_tools.CCPPError(emsg.format(filename))
+        # end if
+        fdesc = self.__fds[filename]
+        os.lseek(fdesc, 0, os.SEEK_SET)
+        chunks = list()
+        chunk = os.read(fdesc, 65536)
+        while chunk:
+            chunks.append(chunk)
+            chunk = os.read(fdesc, 65536)
+        # end while
+        return b''.join(chunks)
+
+    def files(self, binary=False):
+        """Return an OrderedDict of the contents of each generated file,
+        in the order the files were written, keyed by file name.
+        Contents are str unless <binary> is True."""
+        contents = OrderedDict()
+        encoding = locale.getpreferredencoding(False)
+        for filename in self.__fds:
+            data = self.read(filename)
+            if binary:
+                contents[filename] = data
+            else:
+                contents[filename] = data.decode(encoding)
+            # end if
+        # end for
+        return contents
+
+    def close(self):
+        """Release the memory held by every generated file"""
+        for filename in list(self.__fds):
+            self.__discard(filename)
+        # end for
+
+    def __discard(self, filename):
+        """Release the memory held by <filename> (if any)"""
+        fdesc = self.__fds.pop(filename, None)
+        if fdesc is not None:
+            os.close(fdesc)
+        # end if
+        tpath = self.__paths.pop(filename, None)
+        if tpath is not None:
+            os.remove(tpath)
+        # end if
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+###############################################################################
+def output_sink(outdir):
+###############################################################################
+    """Return <outdir> if it is an output sink (e.g., a MemorySink),
+    otherwise return a DirectorySink for the directory, <outdir>"""
+    if isinstance(outdir, DirectorySink):
+        return outdir
+    # end if
+    return DirectorySink(outdir)
+
+# Python reader written alongside each Fortran snapshot module
+# (see File.write_snapshot_source for a description of the file format)
+_SNAPSHOT_READER_TEMPLATE = '''"""
+Zero-copy reader for {module} state snapshots.
+Snapshot files are written by {routine}
+in {snapmod}.F90
+
+This file was generated by generate_registry_data.py, do not edit.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+MAGIC = b"CAMSNAP1"
+
+# Numpy type character for each snapshot type code
+# (Fortran logicals are mapped to integers of the same size)
+_NUMPY_TYPES = dict(r="f", i="i", l="i", c="c")
+
+# Registry fields in snapshot order:
+# (standard_name, Fortran reference, type code, kind, dimensions)
+FIELDS = [
+{fields}]
+
+def _read_ints(buf, dtype, count, offset):
+    """Return a list of <count> <dtype> integers from <buf> at <offset>
+    and the offset of the next header item"""
+    vals = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+    return [int(x) for x in vals], offset + vals.nbytes
+
+def read_snapshot(filename):
+    """Map snapshot file, <filename>, and return an OrderedDict of
+    zero-copy arrays keyed by standard name"""
+    buf = np.memmap(filename, dtype=np.uint8, mode="r")
+    if bytes(buf[0:len(MAGIC)]) != MAGIC:
+        raise ValueError("%s is not a CAM state snapshot" % filename)
+    # end if
+    offset = len(MAGIC)
+    # The byte-order marker was written as a native int32 with value 1
+    if np.frombuffer(buf, dtype="<i4", count=1, offset=offset)[0] == 1:
+        endian = "<"
+    else:
+        endian = ">"
+    # end if
+    int32 = np.dtype(endian + "i4")
+    int64 = np.dtype(endian + "i8")
+    (nfields,), offset = _read_ints(buf, int32, 1, offset + 4)
+    if nfields != len(FIELDS):
+        emsg = "%s has %d fields, expected %d"
+        raise ValueError(emsg % (filename, nfields, len(FIELDS)))
+    # end if
+    layout = list()
+    for std_name, _, tcode, _, dims in FIELDS:
+        (nlen,), offset = _read_ints(buf, int32, 1, offset)
+        name = bytes(buf[offset:offset + nlen]).decode("ascii")
+        ftype = bytes(buf[offset + nlen:offset + nlen + 1]).decode("ascii")
+        (itemsize, rank), offset = _read_ints(buf, int32, 2,
+                                              offset + nlen + 1)
+        shape, offset = _read_ints(buf, int64, rank, offset)
+        if (name, ftype, rank) != (std_name, tcode, len(dims)):
+            emsg = "%s: field %s (%s, rank %d) does not match registry"
+            raise ValueError(emsg % (filename, name, ftype, rank))
+        # end if
+        dtype = np.dtype("%s%s%d" % (endian, _NUMPY_TYPES[tcode], itemsize))
+        layout.append((std_name, dtype, tuple(shape)))
+    # end for
+    fields = OrderedDict()
+    for std_name, dtype, shape in layout:
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes > 0:
+            fields[std_name] = np.ndarray(shape, dtype=dtype, buffer=buf,
+                                          offset=offset, order="F")
+        else:
+            # Field was not allocated when the snapshot was written
+            fields[std_name] = np.zeros(shape, dtype=dtype)
+        # end if
+        offset += nbytes
+    # end for
+    return fields
+'''
+
+# Python ctypes module written alongside each Fortran C binding module
+# (see File.write_c_binding_source)
+_CTYPES_MODULE_TEMPLATE = '''"""
+ctypes mirrors and zero-copy field views for {module}.
+The views call the bind(C) accessor functions in {bindmod}.F90
+
+This file was generated by generate_registry_data.py, do not edit.
+"""
+
+from collections import OrderedDict
+import ctypes
+import numpy as np
+
+{structs}# Fields with C-addressable storage:
+# standard_name: (C symbol, Fortran reference, ctypes type, kind, dimensions)
+FIELDS = OrderedDict([
+{fields}])
+
+def field_view(library, standard_name):
+    """Return a zero-copy view of the storage for <standard_name>.
+    <library> is a ctypes.CDLL which contains {bindmod}.
+    Arrays are returned as Fortran-ordered numpy arrays, scalars as
+    zero-dimensional arrays, and bind(C) DDTs as ctypes Structures.
+    Return None if the field is not currently allocated."""
+    symbol, _, ctype, _, dims = FIELDS[standard_name]
+    func = getattr(library, symbol)
+    func.restype = ctypes.c_void_p
+    if dims:
+        shape = (ctypes.c_int64 * len(dims))()
+        func.argtypes = [ctypes.POINTER(ctypes.c_int64)]
+        address = func(shape)
+    else:
+        func.argtypes = []
+        address = func()
+    # end if
+    if not address:
+        return None
+    # end if
+    if issubclass(ctype, ctypes.Structure):
+        return ctype.from_address(address)
+    # end if
+    if dims:
+        shape = tuple(shape)
+    else:
+        shape = ()
+    # end if
+    size = int(np.prod(shape))
+    view = np.ctypeslib.as_array((ctype * size).from_address(address))
+    return view.reshape(shape, order="F")
+'''
+
+# C and ctypes type names for interoperable intrinsic (type, kind) pairs
+_C_TYPES = {('integer', '') : ('int', 'c_int'),
+            ('integer', 'int32') : ('int32_t', 'c_int32'),
+            ('integer', 'int64') : ('int64_t', 'c_int64'),
+            ('real', '') : ('float', 'c_float'),
+            ('real', 'r4') : ('float', 'c_float'),
+            ('real', 'r8') : ('double', 'c_double')}
+
+# Kinds whose C type depends on the build, and the kinds they may be
+# set to with a config item of the same name (e.g., kind_phys=r8)
+_CONFIG_KINDS = {'kind_phys' : ('r4', 'r8')}
+
+###############################################################################
+def c_type_key(var, config):
+###############################################################################
+    """Return the (type, kind) key in _C_TYPES for registry variable, <var>.
+    A build-dependent kind (e.g., kind_phys) is replaced by its value in
+    <config>. Raise CCPPError if <config> does not give a valid value.
+
+    >>> c_type_key(Variable(ET.fromstring('<variable kind="kind_phys" local_name="u" standard_name="east_wind" type="real" units="m s-1"></variable>'), TypeRegistry(), VarDict("foo", "module", None), None), "kind_phys=r4")
+    ('real', 'r4')
+    >>> c_type_key(Variable(ET.fromstring('<variable kind="kind_phys" local_name="u" standard_name="east_wind" type="real" units="m s-1"></variable>'), TypeRegistry(), VarDict("foo", "module", None), None), "") #doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    CCPPError: No C type for 'u', the kind_phys config item must be one of r4, r8
+    """
+    kind = var.kind.lower()
+    if kind in _CONFIG_KINDS:
+        ckind = str(parse_config(config).get(kind, '')).lower()
+        if ckind not in _CONFIG_KINDS[kind]:
+            emsg = "No C type for '{}', the {} config item must be one of {}"
+            raise parse_tools.CCPPError(emsg.format(
+                var.local_name, kind, ', '.join(_CONFIG_KINDS[kind])))
+        # end if
+        kind = ckind
+    # end if
+    return (var.var_type.lower(), kind)
+
+###############################################################################
+def c_type_names(var, config):
+###############################################################################
+    """Return the C and ctypes type names for registry variable, <var>,
+    in a build with config items, <config> (see c_type_key).
+    Raise CCPPError if <var> does not have an interoperable intrinsic type"""
+    key = c_type_key(var, config)
+    if key not in _C_TYPES:
+        emsg = "No C type for '{}', {}"
+        if var.kind:
+            vtype = '{}({})'.format(var.var_type, var.kind)
+        else:
+            vtype = var.var_type
+        # end if
+        raise parse_tools.CCPPError(emsg.format(var.local_name, vtype))
+    # end if
+    return _C_TYPES[key]
+
+# Standard name hash used by the generated field catalogs
+# (see File.write_catalog_source). The modulus is 2**31 - 1 so that
+# the Fortran version never overflows a 64-bit integer.
+CATALOG_HASH_MULTIPLIER = 31
+CATALOG_HASH_MODULUS = 2147483647
+
+###############################################################################
+def catalog_hash(standard_name):
+###############################################################################
+    """Return the (case insensitive) hash of <standard_name> used by the
+    generated field catalogs. This must match the Fortran version written
+    by File.write_catalog_source.
+    >>> catalog_hash('a')
+    97
+    >>> catalog_hash('AB') == catalog_hash('ab') == 97 * 31 + 98
+    True
+    """
+    hval = 0
+    for char in standard_name.lower():
+        hval = ((hval * CATALOG_HASH_MULTIPLIER) + ord(char)) % \
+            CATALOG_HASH_MODULUS
+    # end for
+    return hval
+
+###############################################################################
+def catalog_hash_table(standard_names):
+###############################################################################
+    """Return an open addressing (linear probing) hash table for
+    <standard_names> as a list of (1-based) indices into <standard_names>.
+    Empty slots are zero. The search for a name starts at slot
+    catalog_hash(name) modulo the table size, the table size is the
+    smallest power of two which is at least twice the number of names.
+    >>> catalog_hash_table(['a', 'b'])
+    [0, 1, 2, 0]
+    >>> catalog_hash_table(['a', 'e'])
+    [0, 1, 2, 0]
+    >>> catalog_hash_table([])
+    [0]
+    """
+    table_size = 1
+    while table_size < 2 * len(standard_names):
+        table_size *= 2
+    # end while
+    table = [0] * table_size
+    for index, stdname in enumerate(standard_names):
+        slot = catalog_hash(stdname) % table_size
+        while table[slot] != 0:
+            slot = (slot + 1) % table_size
+        # end while
+        table[slot] = index + 1
+    # end for
+    return table
+
+# Config items which fix the size of a registry dimension for a build
+_DIMENSION_ALIASES = {'pcols' : 'horizontal_dimension',
+                      'nlev' : 'vertical_layer_dimension'}
+
+###############################################################################
+def parse_config(config):
+###############################################################################
+    """Return <config> as a dictionary.
+    <config> may already be a dictionary, None, or a string of
+    comma-separated <name>=<value> items. Integer values are converted.
+
+    >>> sorted(parse_config("pcols=16, gravity_waves=True").items())
+    [('gravity_waves', 'True'), ('pcols', 16)]
+    >>> parse_config({'nlev' : 30})
+    {'nlev': 30}
+    >>> parse_config("")
+    {}
+    >>> parse_config("pcols") #doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    CCPPError: Bad config item, 'pcols', must be <name>=<value>
+    """
+    if not config:
+        return dict()
+    # end if
+    if isinstance(config, dict):
+        return dict(config)
+    # end if
+    cdict = dict()
+    for item in [x.strip() for x in config.split(',') if x.strip()]:
+        if '=' not in item:
+            emsg = "Bad config item, '{}', must be <name>=<value>"
+            raise parse_tools.CCPPError(emsg.format(item))
+        # end if
+        name, value = [x.strip() for x in item.split('=', 1)]
+        try:
+            cdict[name] = int(value)
+        except ValueError:
+            cdict[name] = value
+        # end try
+    # end for
+    return cdict
+
+###############################################################################
+def fixed_dimensions(config):
+###############################################################################
+    """Return a dictionary of dimension standard names whose size is fixed
+    by <config> and their sizes.
+    Dimensions are fixed by giving an integer value to either a dimension
+    standard name (e.g., horizontal_dimension=16) or a config alias
+    (pcols or nlev). Fixing the number of layers also fixes the number
+    of interfaces unless that is given explicitly.
+
+    >>> sorted(fixed_dimensions("pcols=16,nlev=30,dyn=se").items())
+    [('horizontal_dimension', 16), ('vertical_interface_dimension', 31), ('vertical_layer_dimension', 30)]
+    >>> fixed_dimensions({'vertical_interface_dimension' : 33})
+    {'vertical_interface_dimension': 33}
+    >>> fixed_dimensions({'nlev' : 'null'})
+    {}
+    """
+    cdict = parse_config(config)
+    fixed = dict()
+    for name, value in cdict.items():
+        if not isinstance(value, int) or isinstance(value, bool):
+            continue
+        # end if
+        if name.lower() in _DIMENSION_ALIASES:
+            fixed[_DIMENSION_ALIASES[name.lower()]] = value
+        elif name.lower().endswith('_dimension'):
+            fixed[name.lower()] = value
+        # end if
+    # end for
+    if (('vertical_layer_dimension' in fixed) and
+            ('vertical_interface_dimension' not in fixed)):
+        fixed['vertical_interface_dimension'] = \
+            fixed['vertical_layer_dimension'] + 1
+    # end if
+    return fixed
+
+###############################################################################
+def fixed_dimension_name(std_name):
+###############################################################################
+    """Return the name of the Fortran parameter for fixed dimension,
+    <std_name>. The parameter is private to each generated module so
+    modules which fix the same dimension can be used together.
+
+    >>> fixed_dimension_name('horizontal_dimension')
+    'fixed_horizontal_dimension'
+    """
+    return 'fixed_{}'.format(std_name)
+
+# sys.intern is the intern builtin in Python 2
+# pylint: disable=undefined-variable
+_INTERN = getattr(sys, 'intern', None) or intern
+# pylint: enable=undefined-variable
+
+###############################################################################
+def _intern(value):
+###############################################################################
+    """Return <value>, interned if it is a string, so that the many copies
+    of a standard name, unit, kind or dimension in a large registry share
+    one string object.
+
+    >>> _intern('kind_phys') is _intern(''.join(['kind_', 'phys']))
+    True
+    >>> _intern(None) is None
+    True
+    """
+    if isinstance(value, str):
+        return _INTERN(value)
+    # end if
+    return value
+
 ###############################################################################
 class TypeEntry:
 ###############################################################################
     "Simple type to capture a type and its source module name"
 
+    __slots__ = ('__type', '__module', '__ddt')
+
     def __init__(self, ttype, module, ddt=None):
         """Initialize TypeEntry"""
-        self.__type = ttype
+        self.__type = _intern(ttype)
         self.__module = module
         self.__ddt = ddt # The actual DDT object, if <ttype> is a DDT
 
@@ -110,6 +686,53 @@ class TypeRegistry(dict):
         # end if
         self[ttype] = TypeEntry(new_type, type_module, type_ddt)
 
+###############################################################################
+def write_metadata_entry(outfile, entry):
+###############################################################################
+    """Write <entry>, a variable's CCPP metadata dictionary (see
+    VarBase.metadata_entry), to <outfile> in the metadata file format.
+
+    >>> write_metadata_entry(sys.stdout, OrderedDict([('local_name', 'u'), ('standard_name', 'east_wind'), ('units', 'm s-1'), ('type', 'real'), ('kind', 'kind_phys'), ('dimensions', ['horizontal_dimension']), ('protected', True)]))
+    [ u ]
+      standard_name = east_wind
+      units = m s-1
+      type = real | kind = kind_phys
+      dimensions = (horizontal_dimension)
+      protected = True
+    """
+    outfile.write('[ {} ]\n'.format(entry['local_name']))
+    outfile.write('  {} = {}\n'.format('standard_name',
+                                       entry['standard_name']))
+    if 'long_name' in entry:
+        outfile.write('  {} = {}\n'.format('long_name', entry['long_name']))
+    # end if
+    outfile.write('  {} = {}\n'.format('units', entry['units']))
+    if 'ddt_type' in entry:
+        outfile.write('  {} = {}\n'.format('ddt_type', entry['ddt_type']))
+    elif 'kind' in entry:
+        outfile.write('  {} = {} | {} = {}\n'.format('type', entry['type'],
+                                                     'kind', entry['kind']))
+    else:
+        outfile.write('  {} = {}\n'.format('type', entry['type']))
+    # end if
+    outfile.write('  {} = ({})\n'.format('dimensions',
+                                         ', '.join(entry['dimensions'])))
+    if entry.get('protected'):
+        outfile.write('  protected = True\n')
+    # end if
+
+###############################################################################
+def write_metadata_table(outfile, table):
+###############################################################################
+    """Write <table>, a CCPP argument table dictionary (see
+    VarDict.metadata_table), to <outfile> in the metadata file format."""
+    outfile.write('[ccpp-arg-table]\n')
+    outfile.write('  name = {}\n'.format(table['name']))
+    outfile.write('  type = {}\n'.format(table['type']))
+    for entry in table['variables']:
+        write_metadata_entry(outfile, entry)
+    # end for
+
 ###############################################################################
 class VarBase(object):
 ###############################################################################
@@ -119,20 +742,28 @@ class VarBase(object):
     __pointer_def_init = "NULL()"
     __pointer_type_str = "pointer"
 
+    # Registries may hold a very large number of variables, keep them small
+    __slots__ = ('__local_name', '__dimensions', '__dimension_string',
+                 '__units', '__type', '__kind', '__standard_name',
+                 '__long_name', '__initial_value', '__ic_names',
+                 '__allocatable')
+
     def __init__(self, elem_node, local_name, dimensions, known_types,
                  type_default, units_default="",
                  kind_default='', alloc_default='none'):
-        self.__local_name = local_name
-        self.__dimensions = dimensions
-        self.__units = elem_node.get('units', default=units_default)
+        self.__local_name = _intern(local_name)
+        self.__dimensions = tuple([_intern(x) for x in dimensions])
+        self.__dimension_string = None # Built when first needed
+        self.__units = _intern(elem_node.get('units', default=units_default))
         ttype = elem_node.get('type', default=type_default)
         self.__type = known_types.known_type(ttype)
-        self.__kind = elem_node.get('kind', default=kind_default)
-        self.__standard_name = elem_node.get('standard_name')
+        self.__kind = _intern(elem_node.get('kind', default=kind_default))
+        self.__standard_name = _intern(elem_node.get('standard_name'))
         self.__long_name = ''
         self.__initial_value = ''
         self.__ic_names = None
-        self.__allocatable = elem_node.get('allocatable', default=alloc_default)
+        self.__allocatable = _intern(elem_node.get('allocatable',
+                                                   default=alloc_default))
         if self.__allocatable == "none":
             self.__allocatable = ""
         # end if
@@ -140,11 +771,11 @@ class VarBase(object):
             # We cannot have a kind property with a DDT type2
             if self.is_ddt and self.kind:
                 emsg = "kind attribute illegal for DDT type {}"
-                raise CCPPError(emsg.format(self.var_type))
+                raise parse_tools.CCPPError(emsg.format(self.var_type))
             # end if (else this type is okay)
         else:
             emsg = '{} is an unknown Variable type, {}'
-            raise CCPPError(emsg.format(local_name, ttype))
+            raise parse_tools.CCPPError(emsg.format(local_name, ttype))
         # end if
         for attrib in elem_node:
             if attrib.tag == 'long_name':
@@ -153,7 +784,8 @@ class VarBase(object):
                 self.__initial_value = attrib.text
             elif attrib.tag == 'ic_file_input_names':
                 #Separate out string into list:
-                self.__ic_names = [x.strip() for x in attrib.text.split(' ') if x]
+                self.__ic_names = tuple([x.strip()
+                                         for x in attrib.text.split(' ') if x])
 
             # end if (just ignore other tags)
         # end for
@@ -162,24 +794,39 @@ class VarBase(object):
             self.__initial_value = VarBase.__pointer_def_init
         # end if
 
+    def remove_allocatable(self):
+        """Remove the allocatable attribute from this variable, keeping any
+        other attribute (e.g., 'allocatable, target' becomes 'target').
+        Used when the shape of the variable is known at compile time."""
+        attrs = [x.strip() for x in self.__allocatable.split(',')]
+        self.__allocatable = _intern(', '.join([x for x in attrs
+                                                if x and
+                                                (x != 'allocatable')]))
+
     def write_metadata(self, outfile):
         """Write out this variable as CCPP metadata"""
-        outfile.write('[ {} ]\n'.format(self.local_name))
-        outfile.write('  {} = {}\n'.format('standard_name', self.standard_name))
+        write_metadata_entry(outfile, self.metadata_entry())
+
+    def metadata_entry(self):
+        """Return this variable's CCPP metadata as a dictionary.
+        This is what write_metadata writes (see write_metadata_entry)."""
+        entry = OrderedDict()
+        entry['local_name'] = self.local_name
+        entry['standard_name'] = self.standard_name
         if self.long_name:
-            outfile.write('  {} = {}\n'.format('long_name', self.long_name))
+            entry['long_name'] = self.long_name
         # end if
-        outfile.write('  {} = {}\n'.format('units', self.units))
+        entry['units'] = self.units
         if self.is_ddt:
-            outfile.write('  {} = {}\n'.format('ddt_type', self.var_type))
-        elif self.kind:
-            outfile.write('  {} = {} | {} = {}\n'.format('type', self.var_type,
-                                                         'kind', self.kind))
+            entry['ddt_type'] = self.var_type
         else:
-            outfile.write('  {} = {}\n'.format('type', self.var_type))
+            entry['type'] = self.var_type
+            if self.kind:
+                entry['kind'] = self.kind
+            # end if
         # end if
-        outfile.write('  {} = {}\n'.format('dimensions',
-                                           self.dimension_string))
+        entry['dimensions'] = list(self.dimensions)
+        return entry
 
     def write_initial_value(self, outfile, indent, init_var, ddt_str):
         """Write the code for the initial value of this variable
@@ -246,13 +893,17 @@ class VarBase(object):
 
     @property
     def dimensions(self):
-        """Return the dimensions for this variable"""
+        """Return the dimensions (a tuple) for this variable"""
         return self.__dimensions
 
     @property
     def dimension_string(self):
         """Return the dimension_string for this variable"""
-        return '(' + ', '.join(self.dimensions) + ')'
+        if self.__dimension_string is None:
+            self.__dimension_string = _intern('(' + ', '.join(self.dimensions)
+                                              + ')')
+        # end if
+        return self.__dimension_string
 
     @property
     def long_name(self):
@@ -290,6 +941,9 @@ class ArrayElement(VarBase):
 ###############################################################################
     """Documented array element of a registry Variable"""
 
+    __slots__ = ('__parent_name', '__index_name', '__index_string',
+                 '__local_index_name_str')
+
     def __init__(self, elem_node, parent_name, dimensions, known_types,
                  parent_type, parent_kind, parent_units, parent_alloc, vdict):
         """Initialize the Arary Element information by identifying its
@@ -297,14 +951,15 @@ class ArrayElement(VarBase):
         """
 
         self.__parent_name = parent_name
-        self.__index_name = elem_node.get('index_name')
+        self.__index_name = _intern(elem_node.get('index_name'))
         pos = elem_node.get('index_pos')
 
         # Check to make sure we know about this index
         var = vdict.find_variable_by_standard_name(self.index_name)
         if not var:
             emsg = "Unknown array index, '{}', in '{}'"
-            raise CCPPError(emsg.format(self.index_name, parent_name))
+            raise parse_tools.CCPPError(emsg.format(self.index_name,
+                                                    parent_name))
         # end if
         # Find the location of this element's index
         found = False
@@ -333,8 +988,9 @@ class ArrayElement(VarBase):
                 '{}({})'.format(parent_name, local_index_string)
         else:
             emsg = "Cannot find element dimension, '{}' in {}({})"
-            raise CCPPError(emsg.format(self.index_name, parent_name,
-                                        ', '.join(dimensions)))
+            raise parse_tools.CCPPError(emsg.format(self.index_name,
+                                                    parent_name,
+                                                    ', '.join(dimensions)))
         # end if
         local_name = '{}({})'.format(parent_name, self.index_string)
         super(ArrayElement, self).__init__(elem_node, local_name, my_dimensions,
@@ -392,21 +1048,35 @@ class Variable(VarBase):
                         "kind", "local_name", "name", "standard_name",
                         "type", "units", "version"]
 
-    def __init__(self, var_node, known_types, vdict, logger):
+    __slots__ = ('__elements', '__fixed_dims', '__access', '__protected',
+                 '__def_dims_str', '__type_string')
+
+    def __init__(self, var_node, known_types, vdict, logger, fixed_dims=None):
         # pylint: disable=too-many-locals
-        """Initialize a Variable from registry XML"""
+        """Initialize a Variable from registry XML
+        <fixed_dims> is an optional dictionary of dimension standard names
+        whose size is known at compile time (see fixed_dimensions).
+        An allocatable variable whose dimensions are all fixed is declared
+        with a fixed shape instead. This includes DDT members, which are
+        built here before DDT moves them out of <vdict>.
+        """
         self.__elements = list()
+        self.__fixed_dims = list()
+        if fixed_dims is None:
+            fixed_dims = dict()
+        # end if
         local_name = var_node.get('local_name')
         allocatable = var_node.get('allocatable', default="none")
+        fixed_shape = False
         # Check attributes
         for att in var_node.attrib:
             if att not in Variable.__VAR_ATTRIBUTES:
                 emsg = "Bad variable attribute, '{}', for '{}'"
-                raise CCPPError(emsg.format(att, local_name))
+                raise parse_tools.CCPPError(emsg.format(att, local_name))
             # end if
         # end for
         ttype = var_node.get('type')
-        self.__access = var_node.get('access', default='public')
+        self.__access = _intern(var_node.get('access', default='public'))
         if self.__access == "protected":
             self.__access = "public"
             self.__protected = True
@@ -419,18 +1089,35 @@ class Variable(VarBase):
             if attrib.tag == 'dimensions':
                 my_dimensions = [x.strip() for x in attrib.text.split(' ') if x]
                 def_dims = list() # Dims used for variable declarations
+                if fixed_dims and (allocatable in ("allocatable",
+                                                   "allocatable, target")):
+                    fixed_shape = all([(Variable.constant_dimension(x)
+                                        is not None) or
+                                       (x.lower() in fixed_dims)
+                                       for dim in my_dimensions
+                                       for x in [y.strip() for y in
+                                                 dim.split(':')]])
+                # end if
                 for dim in my_dimensions:
                     if dim.count(':') > 1:
                         emsg = "Illegal dimension string, '{},' in '{}'"
                         emsg += ', step not allowed.'
-                        raise CCPPError(emsg.format(dim, local_name))
+                        raise parse_tools.CCPPError(emsg.format(dim,
+                                                                local_name))
                     # end if
-                    if allocatable in ("", "parameter", "target"):
+                    if fixed_shape or (allocatable in ("", "parameter",
+                                                       "target")):
                         # We need to find a local variable for every dimension
                         dimstrs = [x.strip() for x in dim.split(':')]
                         ldimstrs = list()
                         for ddim in dimstrs:
                             lname = Variable.constant_dimension(ddim)
+                            if (lname is None) and (ddim.lower() in fixed_dims):
+                                lname = fixed_dimension_name(ddim.lower())
+                                if ddim.lower() not in self.__fixed_dims:
+                                    self.__fixed_dims.append(ddim.lower())
+                                # end if
+                            # end if
                             if not lname:
                                 var = vdict.find_variable_by_standard_name(ddim)
                                 if var:
@@ -439,8 +1126,8 @@ class Variable(VarBase):
                             # end if
                             if not lname:
                                 emsg = "Dimension, '{}', not found for '{}'"
-                                raise CCPPError(emsg.format(ddim,
-                                                            local_name))
+                                emsg = emsg.format(ddim, local_name)
+                                raise parse_tools.CCPPError(emsg)
                             # end if
                             ldimstrs.append(lname)
                         # end for
@@ -451,7 +1138,8 @@ class Variable(VarBase):
                     # end if
                 # end for
                 if def_dims:
-                    self.__def_dims_str = '(' + ', '.join(def_dims) + ')'
+                    self.__def_dims_str = _intern('(' + ', '.join(def_dims)
+                                                  + ')')
                 # end if
 
             elif attrib.tag == 'long_name':
@@ -464,27 +1152,33 @@ class Variable(VarBase):
                 pass # picked up in parent
             else:
                 emsg = "Unknown Variable content, '{}'"
-                raise CCPPError(emsg.format(attrib.tag))
+                raise parse_tools.CCPPError(emsg.format(attrib.tag))
             # end if
         # end for
         # Initialize the base class
         super(Variable, self).__init__(var_node, local_name,
                                        my_dimensions, known_types, ttype)
+        if fixed_shape:
+            self.remove_allocatable()
+        # end if
         for attrib in var_node:
             # Second pass, only process array elements
             if attrib.tag == 'element':
                 self.__elements.append(ArrayElement(attrib, local_name,
                                                     my_dimensions, known_types,
                                                     ttype, self.kind,
-                                                    self.units, allocatable,
-                                                    vdict))
+                                                    self.units,
+                                                    self.allocatable, vdict))
 
             # end if (all other processing done above)
         # end for
+        # Nothing more is added, share the empty tuple when possible
+        self.__elements = tuple(self.__elements)
+        self.__fixed_dims = tuple(self.__fixed_dims)
         # Some checks
         if (self.allocatable == 'parameter') and (not self.initial_value):
             emsg = "parameter, '{}', does not have an initial value"
-            raise CCPPError(emsg.format(local_name))
+            raise parse_tools.CCPPError(emsg.format(local_name))
         # end if
         # Maybe fix up type string
         if self.module:
@@ -494,22 +1188,33 @@ class Variable(VarBase):
         else:
             self.__type_string = '{}'.format(self.var_type)
         # end if
+        self.__type_string = _intern(self.__type_string)
         if logger:
             dmsg = 'Found registry Variable, {} ({})'
             logger.debug(dmsg.format(self.local_name, self.standard_name))
         # end if
 
     def write_metadata(self, outfile):
-        """Write out this variable as CCPP metadata"""
+        """Write out this variable (and its array elements) as CCPP metadata"""
+        for entry in self.metadata_entries():
+            write_metadata_entry(outfile, entry)
+        # end for
+
+    def metadata_entries(self):
+        """Return a list of the CCPP metadata dictionaries (see
+        VarBase.metadata_entry) written for this variable"""
+        entries = list()
         if self.access != "private":
-            super(Variable, self).write_metadata(outfile)
+            entry = self.metadata_entry()
             if (self.allocatable == "parameter") or self.protected:
-                outfile.write('  protected = True\n')
+                entry['protected'] = True
             # end if
+            entries.append(entry)
             for element in self.__elements:
-                element.write_metadata(outfile)
+                entries.append(element.metadata_entry())
             # end for
         # end if
+        return entries
 
     def write_definition(self, outfile, access, indent,
                          maxtyp=0, maxacc=0, maxall=0, has_protect=False):
@@ -613,7 +1318,7 @@ class Variable(VarBase):
             if dimension_string:
                 subi += 1
                 emsg = "Arrays of DDT objects not implemented"
-                raise ParseInternalError(emsg)
+                raise parse_tools.ParseInternalError(emsg)
             # end if
             for var in my_ddt.variable_list():
                 var.write_allocate_routine(outfile, subi,
@@ -623,7 +1328,7 @@ class Variable(VarBase):
             lname = '{}{}'.format(ddt_str, self.local_name)
             if self.allocatable == "pointer":
                 all_type = 'associated'
-            elif self.allocatable == "allocatable":
+            elif self.allocatable[0:11] == "allocatable":
                 all_type = 'allocated'
             else:
                 all_type = ''
@@ -683,9 +1388,15 @@ class Variable(VarBase):
 
     @property
     def elements(self):
-        """Return elements list for this variable"""
+        """Return elements (a tuple) for this variable"""
         return self.__elements
 
+    @property
+    def fixed_dimensions(self):
+        """Return the fixed (compile-time) dimension standard names used to
+        declare this variable"""
+        return self.__fixed_dims
+
 ###############################################################################
 class VarDict(OrderedDict):
 ###############################################################################
@@ -697,7 +1408,10 @@ class VarDict(OrderedDict):
         self.__name = name
         self.__type = ttype
         self.__logger = logger
-        self.__standard_names = list()
+        # Lowercase standard name -> variable, for the current variables
+        self.__std_index = dict()
+        # Removed standard names (adding one again is still an error)
+        self.__removed_std_names = set()
         self.__dimensions = set() # All known dimensions for this dictionary
 
     @property
@@ -719,7 +1433,10 @@ class VarDict(OrderedDict):
         """Add a variable if it does not conflict with existing entries"""
         local_name = newvar.local_name
         std_name = newvar.standard_name
-        if local_name.lower() in self:
+        # Interned, so a name which is already lowercase is not copied
+        lname = _intern(local_name.lower())
+        sname = _intern(std_name.lower())
+        if lname in self:
             # We already have a matching variable, error!
             emsg = "duplicate variable local_name, '{}', in {}"
             ovar = self[local_name]
@@ -727,26 +1444,21 @@ class VarDict(OrderedDict):
                 emsg2 = ", already defined with standard_name, '{}'"
                 emsg += emsg2.format(ovar.standard_name)
             # end if
-            raise CCPPError(emsg.format(local_name, self.name))
+            raise parse_tools.CCPPError(emsg.format(local_name, self.name))
         # end if
-        if std_name.lower() in self.__standard_names:
+        if (sname in self.__std_index) or (sname in self.__removed_std_names):
             # We have a standard name collision, error!
             emsg = "duplicate variable standard_name, '{}' from '{}' in '{}'"
-            ovar = None
-            for testvar in self.variable_list():
-                if testvar.standard_name.lower() == std_name.lower():
-                    ovar = testvar
-                    break
-                # end if
-            # end for
+            ovar = self.__std_index.get(sname)
             if ovar is not None:
                 emsg2 = ", already defined with local_name, '{}'"
                 emsg += emsg2.format(ovar.local_name)
             # end if
-            raise CCPPError(emsg.format(std_name, local_name, self.name))
+            raise parse_tools.CCPPError(emsg.format(std_name, local_name,
+                                                    self.name))
         # end if
-        self[local_name.lower()] = newvar
-        self.__standard_names.append(std_name.lower())
+        self[lname] = newvar
+        self.__std_index[sname] = newvar
         for dim in newvar.dimensions:
             dimstrs = [x.strip() for x in dim.split(':')]
             for ddim in dimstrs:
@@ -775,14 +1487,7 @@ class VarDict(OrderedDict):
     def find_variable_by_standard_name(self, std_name):
         """Return this dictionary's variable matching standard name, <std_name>.
         Return None if not found."""
-        sname = std_name.lower()
-        fvar = None
-        for var in self.variable_list():
-            if sname == var.standard_name.lower():
-                fvar = var
-                break
-            # end if
-        # end for
+        fvar = self.__std_index.get(std_name.lower())
         if (not fvar) and self.__logger:
             lmsg = 'Standard name, {}, not found in {}'
             self.__logger.debug(lmsg.format(std_name, self.name))
@@ -796,6 +1501,8 @@ class VarDict(OrderedDict):
         var = self.find_variable_by_standard_name(std_name)
         if var:
             del self[var.local_name.lower()]
+            del self.__std_index[std_name.lower()]
+            self.__removed_std_names.add(std_name.lower())
             # NB: Do not remove standard_name, it is still an error
         else:
             if self.__logger:
@@ -810,12 +1517,19 @@ class VarDict(OrderedDict):
 
     def write_metadata(self, outfile):
         """Write out the variables in this dictionary as CCPP metadata"""
-        outfile.write('[ccpp-arg-table]\n')
-        outfile.write('  name = {}\n'.format(self.name))
-        outfile.write('  type = {}\n'.format(self.module_type))
+        write_metadata_table(outfile, self.metadata_table())
+
+    def metadata_table(self):
+        """Return the CCPP argument table written by write_metadata
+        as a dictionary"""
+        table = OrderedDict()
+        table['name'] = self.name
+        table['type'] = self.module_type
+        table['variables'] = list()
         for var in self.variable_list():
-            var.write_metadata(outfile)
-        # end if
+            table['variables'].extend(var.metadata_entries())
+        # end for
+        return table
 
     def write_definition(self, outfile, access, indent):
         """Write the definition for the variables in this dictionary to
@@ -852,6 +1566,7 @@ class DDT:
         """Initialize a DDT from registry XML (<ddt_node>)
         <var_dict> is the dictionary where variables referenced in <ddt_node>
         must reside. Each DDT variable is removed from <var_dict>
+        If <dycore> is None, members for every dycore are included.
 
         >>> DDT(ET.fromstring('<ddt type="physics_state"><dessert>ice_cream</dessert></ddt>'), TypeRegistry(), VarDict("foo", "module", None), 'eul', None, None) #doctest: +IGNORE_EXCEPTION_DETAIL
         Traceback (most recent call last):
@@ -859,6 +1574,7 @@ class DDT:
         """
         self.__type = ddt_node.get('type')
         self.__logger = logger
+        self.__config = config
         self.__data = list()
         extends = ddt_node.get('extends', default=None)
         if extends is None:
@@ -869,15 +1585,21 @@ class DDT:
         if extends and (not self.__extends):
             emsg = ("DDT, '{}', extends type '{}', however, this type is "
                     "not known")
-            raise CCPPError(emsg.format(self.ddt_type, extends))
+            raise parse_tools.CCPPError(emsg.format(self.ddt_type, extends))
         # end if
-        self.__bindc = ddt_node.get('bindC', default=False)
+        # bindC is an xs:boolean so it may be given as true, false, 1, or 0
+        self.__bindc = ddt_node.get('bindC',
+                                    default='false').lower() in ('true', '1')
         if self.__extends and self.__bindc:
             emsg = ("DDT, '{}', cannot have both 'extends' and 'bindC' "
                     "attributes")
-            raise CCPPError(emsg.format(self.ddt_type))
+            raise parse_tools.CCPPError(emsg.format(self.ddt_type))
         # end if
         self.__private = ddt_node.get('private', default=False)
+        self.__dycores = dict() # Member standard name -> dycore filter
+        # Flattened member and use lists, built when first needed
+        self.__flat_vars = None
+        self.__module_uses = None
         for attrib in ddt_node:
             if attrib.tag == 'data':
                 varname = attrib.text
@@ -885,43 +1607,102 @@ class DDT:
                 attrib_dycores = [x.strip().lower() for x in
                                   attrib.get('dycore', default="").split(',')
                                   if x]
-                if attrib_dycores and (dycore not in attrib_dycores):
+                if (attrib_dycores and (dycore is not None) and
+                        (dycore not in attrib_dycores)):
                     include_var = False
                 # end if
                 if include_var:
                     var = var_dict.find_variable_by_standard_name(varname)
                     if var:
                         self.__data.append(var)
+                        self.__dycores[var.standard_name.lower()] = \
+                            tuple(attrib_dycores)
                         var_dict.remove_variable(varname)
                     else:
                         emsg = ("Variable, '{}', not found for DDT, '{}', "
                                 "in '{}'")
-                        raise CCPPError(emsg.format(varname, self.ddt_type,
-                                                    var_dict.name))
+                        emsg = emsg.format(varname, self.ddt_type,
+                                           var_dict.name)
+                        raise parse_tools.CCPPError(emsg)
                     # end if
                 # end if
             else:
                 emsg = "Unknown DDT element type, '{}', in '{}'"
-                raise CCPPError(emsg.format(attrib.tag, self.ddt_type))
+                raise parse_tools.CCPPError(emsg.format(attrib.tag,
+                                                        self.ddt_type))
             # end if
         # end for
 
     def variable_list(self):
-        """Return the variable list for this DDT"""
-        vlist = list(self.__data)
-        if self.__extends:
-            vlist.extend(self.__extends.ddt.variable_list())
+        """Return the variables of this DDT followed by those of its parent
+        types (a tuple).
+        A DDT does not change once it is built so the flattened list is
+        only built on the first call.
+
+        >>> vdict = VarDict("foo", "module", None)
+        >>> vdict.add_variable(Variable(ET.fromstring('<variable local_name="u" standard_name="east_wind" type="real" units="m s-1"/>'), TypeRegistry(), vdict, None))
+        >>> ddt = DDT(ET.fromstring('<ddt type="wind"><data>east_wind</data></ddt>'), TypeRegistry(), vdict, 'eul', None, None)
+        >>> [x.local_name for x in ddt.variable_list()]
+        ['u']
+        >>> ddt.variable_list() is ddt.variable_list()
+        True
+        """
+        if self.__flat_vars is None:
+            vlist = list(self.__data)
+            if self.__extends:
+                vlist.extend(self.__extends.ddt.variable_list())
+            # end if
+            self.__flat_vars = tuple(vlist)
         # end if
-        return vlist
+        return self.__flat_vars
+
+    def member_dycores(self, var):
+        """Return the (lowercase) dycores for which member, <var>, is part
+        of this DDT. An empty tuple means every dycore."""
+        return self.__dycores.get(var.standard_name.lower(), tuple())
+
+    def module_uses(self):
+        """Return a tuple of (module, type) for each member variable (see
+        variable_list) with a type defined in a module, in member order
+        (duplicates are kept)."""
+        if self.__module_uses is None:
+            self.__module_uses = tuple([(var.module, var.var_type)
+                                        for var in self.variable_list()
+                                        if var.module])
+        # end if
+        return self.__module_uses
+
+    def c_members(self):
+        """Return a list of (variable, C type, ctypes type) tuples for the
+        members of this bind(C) DDT.
+        Raise CCPPError if a member is not interoperable with C."""
+        members = list()
+        for var in self.__data:
+            if var.dimensions or var.allocatable or var.is_ddt:
+                emsg = "Member, '{}', of bind(C) DDT, '{}', is not scalar"
+                raise parse_tools.CCPPError(emsg.format(var.local_name,
+                                                        self.ddt_type))
+            # end if
+            ctype, ctypes_type = c_type_names(var, self.__config)
+            members.append((var, ctype, ctypes_type))
+        # end for
+        return members
 
     def write_metadata(self, outfile):
         """Write out this DDT as CCPP metadata"""
-        outfile.write('[ccpp-arg-table]\n')
-        outfile.write('  name = {}\n'.format(self.ddt_type))
-        outfile.write('  type = ddt\n')
+        write_metadata_table(outfile, self.metadata_table())
+
+    def metadata_table(self):
+        """Return the CCPP argument table written by write_metadata
+        as a dictionary"""
+        table = OrderedDict()
+        table['name'] = self.ddt_type
+        table['type'] = 'ddt'
+        table['variables'] = list()
         for var in self.__data:
-            var.write_metadata(outfile)
-        # end if
+            table['variables'].extend(var.metadata_entries())
+        # end for
+        return table
 
     def write_definition(self, outfile, access, indent):
         """Write out the Fortran definition for this DDT
@@ -933,7 +1714,7 @@ class DDT:
         # It is an error to have no member variables
         if not self.__data:
             emsg = "DDT, '{}', has no member variables"
-            raise CCPPError(emsg.format(self.ddt_type))
+            raise parse_tools.CCPPError(emsg.format(self.ddt_type))
         # end if
         my_acc = 'private' if self.private else 'public'
         if self.extends:
@@ -965,6 +1746,12 @@ class DDT:
         """Return this DDT's type"""
         return self.__type
 
+    @property
+    def members(self):
+        """Return this DDT's own member variables (see variable_list for
+        the members of its parent types as well)"""
+        return self.__data
+
     @property
     def private(self):
         """Return True iff this DDT is private"""
@@ -1003,6 +1790,10 @@ class File:
                    'number_of_constituents' : 4}
     __min_dim_key = 5 # For sorting unknown dimensions
 
+    # Snapshot type codes for the intrinsic types which can be dumped
+    __snapshot_types = {'real' : 'r', 'integer' : 'i',
+                        'logical' : 'l', 'complex' : 'c'}
+
     def __init__(self, file_node, known_types, dycore, config, logger):
         """Initialize a File object from a registry node (XML)"""
         self.__var_dict = VarDict(file_node.get('name'), file_node.get('type'),
@@ -1012,41 +1803,58 @@ class File:
         self.__known_types = known_types
         self.__ddts = OrderedDict()
         self.__use_statements = list()
+        self.__dycore = dycore
+        self.__config = config
+        self.__config_dims = fixed_dimensions(config)
+        self.__fixed_dims = OrderedDict() # Fixed dimensions used in file
         for obj in file_node:
-            if obj.tag in ['variable', 'array']:
-                newvar = Variable(obj, self.__known_types, self.__var_dict,
-                                  logger)
-                self.__var_dict.add_variable(newvar)
-            elif obj.tag == 'ddt':
-                newddt = DDT(obj, self.__known_types, self.__var_dict,
-                             dycore, config, logger)
-                dmsg = "Adding DDT {} from {} as a known type"
-                dmsg = dmsg.format(newddt.ddt_type, self.__name)
-                logging.debug(dmsg)
-                self.__ddts[newddt.ddt_type] = newddt
-                self.__known_types.add_type(newddt.ddt_type,
-                                            self.__name, newddt)
-            elif obj.tag == 'use':
-                module = obj.get('module', default=None)
-                if not module:
-                    raise CCPPError('Illegal use entry, no module')
-                # end if
-                ref = obj.get('reference', default=None)
-                if not ref:
-                    raise CCPPError('Illegal use entry, no reference')
-                # end if
-                self.__use_statements.append((module, ref))
-            else:
-                emsg = "Unknown registry File element, '{}'"
-                raise CCPPError(emsg.format(obj.tag))
-            # end if
+            self.add_node(obj, logger)
         # end for
 
+    def add_node(self, obj, logger):
+        """Add the registry object described by <obj> (a use, variable,
+        array, or ddt XML element) to this File.
+        <obj> is not referenced after this call so it may be discarded
+        (see stream_registry)."""
+        if obj.tag in ['variable', 'array']:
+            newvar = Variable(obj, self.__known_types, self.__var_dict,
+                              logger, fixed_dims=self.__config_dims)
+            self.__var_dict.add_variable(newvar)
+            for dim in newvar.fixed_dimensions:
+                self.__fixed_dims[dim] = self.__config_dims[dim]
+            # end for
+        elif obj.tag == 'ddt':
+            newddt = DDT(obj, self.__known_types, self.__var_dict,
+                         self.__dycore, self.__config, logger)
+            dmsg = "Adding DDT {} from {} as a known type"
+            dmsg = dmsg.format(newddt.ddt_type, self.__name)
+            logging.debug(dmsg)
+            self.__ddts[newddt.ddt_type] = newddt
+            self.__known_types.add_type(newddt.ddt_type,
+                                        self.__name, newddt)
+        elif obj.tag == 'use':
+            module = obj.get('module', default=None)
+            if not module:
+                raise parse_tools.CCPPError('Illegal use entry, no module')
+            # end if
+            ref = obj.get('reference', default=None)
+            if not ref:
+                emsg = 'Illegal use entry, no reference'
+                raise parse_tools.CCPPError(emsg)
+            # end if
+            self.__use_statements.append((module, ref))
+        else:
+            emsg = "Unknown registry File element, '{}'"
+            raise parse_tools.CCPPError(emsg.format(obj.tag))
+        # end if
+
     def write_metadata(self, outdir, logger):
-        """Write out the variables in this file as CCPP metadata"""
-        ofilename = os.path.join(outdir, "{}.meta".format(self.name))
+        """Write out the variables in this file as CCPP metadata.
+        <outdir> is an output directory or sink (e.g., a MemorySink)."""
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.meta".format(self.name))
         logger.info("Writing registry metadata file, {}".format(ofilename))
-        with open(ofilename, "w") as outfile:
+        with open(sink.target(ofilename), "w") as outfile:
             # Write DDTs defined in this file
             for ddt in self.__ddts.values():
                 ddt.write_metadata(outfile)
@@ -1054,6 +1862,34 @@ class File:
             # Write Variables defined in this file
             self.__var_dict.write_metadata(outfile)
         # end with
+        return ofilename
+
+    def write_metadata_sidecar(self, meta_filename, logger, sink=None):
+        """Write the JSON sidecar for metadata file, <meta_filename>.
+        The sidecar holds the same argument tables in structured form
+        along with the SHA-256 hash of <meta_filename> so that a reader
+        can skip parsing the metadata text when the hashes match
+        (see load_metadata_sidecar).
+        <sink> is the output sink <meta_filename> was written to
+        (default is its directory)."""
+        if sink is None:
+            sink = DirectorySink(os.path.dirname(meta_filename))
+        # end if
+        sidecar = OrderedDict()
+        sidecar['version'] = METADATA_SIDECAR_VERSION
+        sidecar['metadata_file'] = os.path.basename(meta_filename)
+        meta_data = sink.read(meta_filename)
+        sidecar['sha256'] = hashlib.sha256(meta_data).hexdigest()
+        sidecar['tables'] = [ddt.metadata_table()
+                             for ddt in self.__ddts.values()]
+        sidecar['tables'].append(self.__var_dict.metadata_table())
+        ofilename = meta_filename + '.json'
+        logger.info("Writing registry metadata sidecar, {}".format(ofilename))
+        with open(sink.target(ofilename), "w") as outfile:
+            json.dump(sidecar, outfile, indent=2)
+            outfile.write('\n')
+        # end with
+        return ofilename
 
     @classmethod
     def dim_sort_key(cls, dim_name):
@@ -1065,34 +1901,69 @@ class File:
         # end if
         return File.__dim_order[dim_name]
 
+    def use_list(self):
+        """Return a list of (module, type or reference) tuples for the
+        use statements in this File's source code"""
+        module_list = list() # tuple of (module, type)
+        for var in self.__var_dict.variable_list():
+            mod = var.module
+            if mod and (mod.lower() != self.name.lower()):
+                module_list.append((mod, var.var_type))
+            # end if
+        # end for
+        # Add any DDT types
+        for ddt in self.__ddts.values():
+            for mod, var_type in ddt.module_uses():
+                if mod.lower() != self.name.lower():
+                    module_list.append((mod, var_type))
+                # end if
+            # end for
+        # end for
+        # Add in any explicit use entries from the registry
+        for ref in self.__use_statements:
+            module_list.append(ref)
+        # end if
+        return module_list
+
+    def module_dependencies(self, modname=None):
+        """Return a list of the non-intrinsic modules used by generated
+        module, <modname>, in order of first use.
+        <modname> may be this File's module (the default), its snapshot
+        module, its C binding module or its field catalog module."""
+        if (modname is None) or (modname == self.name):
+            modules = list()
+            for mod, _ in self.use_list():
+                if mod.lower() not in modules:
+                    modules.append(mod.lower())
+                # end if
+            # end for
+            # Modules used by the allocate routine
+            modules.extend([x for x in ('shr_infnan_mod', 'cam_abortutils')
+                            if x not in modules])
+        elif modname == self.snapshot_module_name():
+            modules = [self.name, 'cam_abortutils']
+        elif modname == self.c_binding_module_name():
+            modules = [self.name]
+        elif modname == self.catalog_module_name():
+            modules = [self.name, 'cam_abortutils']
+        else:
+            emsg = "Unknown generated module, '{}', for {}"
+            raise parse_tools.ParseInternalError(emsg.format(modname,
+                                                             self.name))
+        # end if
+        return modules
+
     def write_source(self, outdir, indent, logger):
         """Write out source code for the variables in this file"""
-        ofilename = os.path.join(outdir, "{}.F90".format(self.name))
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.F90".format(self.name))
         logger.info("Writing registry source file, {}".format(ofilename))
-        with FortranWriter(ofilename, "w", indent=indent) as outfile:
+        with fortran_tools.FortranWriter(sink.target(ofilename), "w",
+                                         indent=indent) as outfile:
             # Define the module header
             outfile.write('module {}\n'.format(self.name), 0)
             # Use statements (if any)
-            module_list = list() # tuple of (module, type)
-            for var in self.__var_dict.variable_list():
-                mod = var.module
-                if mod and (mod.lower() != self.name.lower()):
-                    module_list.append((mod, var.var_type))
-                # end if
-            # end for
-            # Add any DDT types
-            for ddt in self.__ddts.values():
-                for var in ddt.variable_list():
-                    mod = var.module
-                    if mod and (mod.lower() != self.name.lower()):
-                        module_list.append((mod, var.var_type))
-                    # end if
-                # end for
-            # end for
-            # Add in any explicit use entries from the registry
-            for ref in self.__use_statements:
-                module_list.append(ref)
-            # end if
+            module_list = self.use_list()
             if module_list:
                 maxlen = max([len(x[0]) for x in module_list])
             else:
@@ -1106,6 +1977,16 @@ class File:
             # end for
             # More boilerplate
             outfile.write("\nimplicit none\nprivate\n", 0)
+            # Dimensions fixed at compile time (if any)
+            if self.__fixed_dims:
+                outfile.write('!! Fixed dimensions', 1)
+                for dim, dsize in self.__fixed_dims.items():
+                    dstr = 'integer, private, parameter :: {} = {}'
+                    outfile.write(dstr.format(fixed_dimension_name(dim),
+                                              dsize), 1)
+                # end for
+                outfile.write('', 0)
+            # end if
             # Write DDTs defined in this file
             for ddt in self.__ddts.values():
                 ddt.write_definition(outfile, 'private', 1)
@@ -1127,6 +2008,7 @@ class File:
             outfile.write('\nend module {}'.format(self.name), 0)
 
         # end with
+        return ofilename
 
     def allocate_routine_name(self):
         """Return the name of the allocate routine for this module"""
@@ -1382,25 +2264,724 @@ class File:
         #Return max string length of input variable names:
         return ic_name_max_len
 
-    @property
-    def name(self):
-        """Return this File's name"""
-        return self.__name
-
-    @property
-    def file_type(self):
-        """Return this File's type"""
-        return self.__type
+    def variable_list(self):
+        """Return a list of the Variables defined in this File, including
+        the members of DDTs defined in this File"""
+        vlist = list(self.__var_dict.variable_list())
+        for ddt in self.__ddts.values():
+            for var in ddt.variable_list():
+                if var not in vlist:
+                    vlist.append(var)
+                # end if
+            # end for
+        # end for
+        return vlist
 
-###############################################################################
-def parse_command_line(args, description):
-###############################################################################
-    """Parse and return the command line arguments when
-    this module is executed"""
-    parser = argparse.ArgumentParser(description=description,
-                                     formatter_class=argparse.RawTextHelpFormatter)
+    def snapshot_module_name(self):
+        """Return the name of the snapshot module for this File"""
+        return '{}_snapshot'.format(self.name)
+
+    def snapshot_routine_name(self):
+        """Return the name of the snapshot write routine for this File"""
+        return 'write_{}_snapshot'.format(self.name)
+
+    def snapshot_fields(self):
+        """Return a list of (variable, reference) tuples, one for each
+        public intrinsic field in this File, in snapshot order.
+        <reference> is the Fortran expression for the field (e.g.,
+        phys_state%u). DDT variables are expanded into their members,
+        array elements are part of their parent array."""
+        fields = list()
+        self.__add_snapshot_fields(self.__var_dict.variable_list(), '',
+                                   fields)
+        return fields
+
+    def __add_snapshot_fields(self, var_list, ddt_str, fields):
+        """Add the snapshot fields from <var_list> to <fields>"""
+        for var in var_list:
+            if var.access == 'private':
+                continue
+            # end if
+            my_ddt = var.is_ddt
+            if my_ddt:
+                if not (my_ddt.private or var.dimensions):
+                    sub_ddt_str = '{}{}%'.format(ddt_str, var.local_name)
+                    self.__add_snapshot_fields(my_ddt.variable_list(),
+                                               sub_ddt_str, fields)
+                # end if (arrays of DDTs are not supported)
+            elif var.var_type.lower() in File.__snapshot_types:
+                fields.append((var, '{}{}'.format(ddt_str, var.local_name)))
+            # end if (other types, e.g., character, are skipped)
+        # end for
 
-    parser.add_argument("registry_file",
+    @staticmethod
+    def __snapshot_status(var, ref):
+        """Return the Fortran test for whether <ref> (the reference to
+        <var>) currently has storage or None if it always has storage"""
+        if var.allocatable == 'pointer':
+            status = 'associated({})'.format(ref)
+        elif var.allocatable[0:11] == 'allocatable':
+            status = 'allocated({})'.format(ref)
+        else:
+            status = None
+        # end if
+        return status
+
+    def write_snapshot_source(self, outdir, indent, logger):
+        """Write a Fortran module with a routine which dumps the fields in
+        this File to a flat binary (stream) snapshot file.
+        The snapshot begins with a self-describing header:
+           'CAMSNAP1', a byte-order marker (int32 = 1), the field count (int32)
+        followed, for each field, by:
+           the standard name length (int32), the standard name, a type
+           code (r, i, l, or c), the item size in bytes (int32), the rank
+           (int32), and the current shape (int64 * rank)
+        The field data follows the header, in the same order, in
+        Fortran (column-major) order. Unallocated fields have a zero shape.
+        """
+        fields = self.snapshot_fields()
+        modname = self.snapshot_module_name()
+        subname = self.snapshot_routine_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.F90".format(modname))
+        logger.info("Writing registry snapshot file, {}".format(ofilename))
+        use_vars = list()
+        for _, ref in fields:
+            lname = ref.split('%')[0]
+            if lname not in use_vars:
+                use_vars.append(lname)
+            # end if
+        # end for
+        with fortran_tools.FortranWriter(sink.target(ofilename), "w",
+                                         indent=indent) as outfile:
+            outfile.write('module {}\n'.format(modname), 0)
+            outfile.write('use iso_fortran_env, only: int32, int64', 1)
+            for lname in use_vars:
+                outfile.write('use {}, only: {}'.format(self.name, lname), 1)
+            # end for
+            outfile.write("\nimplicit none\nprivate\n", 0)
+            outfile.write('!! public interfaces', 0)
+            outfile.write('public :: {}'.format(subname), 1)
+            outfile.write("\nCONTAINS\n", 0)
+            outfile.write('subroutine {}(filename)'.format(subname), 1)
+            outfile.write('use cam_abortutils, only: endrun', 2)
+            outfile.write('!! Dummy argument', 2)
+            outfile.write('character(len=*), intent(in) :: filename', 2)
+            outfile.write('', 0)
+            outfile.write('!! Local variables', 2)
+            outfile.write('integer                     :: unit', 2)
+            outfile.write('integer                     :: ierr', 2)
+            subn_str = 'character(len=*), parameter :: subname = "{}"'
+            outfile.write(subn_str.format(subname), 2)
+            outfile.write('', 0)
+            outfile.write("open(newunit=unit, file=filename, " +
+                          "access='stream', form='unformatted', " +
+                          "status='replace', action='write', iostat=ierr)", 2)
+            outfile.write('if (ierr /= 0) then', 2)
+            emsg = 'subname//": Unable to open "//trim(filename)'
+            outfile.write('call endrun({})'.format(emsg), 3)
+            outfile.write('end if', 2)
+            outfile.write('! Snapshot header', 2)
+            outfile.write("write(unit) 'CAMSNAP1'", 2)
+            outfile.write('write(unit) 1_int32', 2)
+            outfile.write('write(unit) {}_int32'.format(len(fields)), 2)
+            for var, ref in fields:
+                tcode = File.__snapshot_types[var.var_type.lower()]
+                rank = len(var.dimensions)
+                outfile.write('! {}'.format(ref), 2)
+                outfile.write("write(unit) {}_int32, '{}'".format(
+                    len(var.standard_name), var.standard_name), 2)
+                outfile.write(("write(unit) '{}', int(storage_size({})/8, " +
+                               "int32), {}_int32").format(tcode, ref, rank), 2)
+                if rank > 0:
+                    status = File.__snapshot_status(var, ref)
+                    shape_str = 'write(unit) int(shape({}), int64)'.format(ref)
+                    if status:
+                        outfile.write('if ({}) then'.format(status), 2)
+                        outfile.write(shape_str, 3)
+                        outfile.write('else', 2)
+                        outfile.write('write(unit) {}'.format(
+                            ', '.join(['0_int64']*rank)), 3)
+                        outfile.write('end if', 2)
+                    else:
+                        outfile.write(shape_str, 2)
+                    # end if
+                # end if
+            # end for
+            outfile.write('! Snapshot data', 2)
+            for var, ref in fields:
+                status = File.__snapshot_status(var, ref)
+                if status:
+                    outfile.write('if ({}) then'.format(status), 2)
+                    outfile.write('write(unit) {}'.format(ref), 3)
+                    outfile.write('end if', 2)
+                else:
+                    outfile.write('write(unit) {}'.format(ref), 2)
+                # end if
+            # end for
+            outfile.write('close(unit)', 2)
+            outfile.write('end subroutine {}'.format(subname), 1)
+            outfile.write('\nend module {}'.format(modname), 0)
+        # end with
+        return ofilename
+
+    def write_snapshot_reader(self, outdir, logger):
+        """Write a Python module which maps a snapshot file written by the
+        routine from <write_snapshot_source> with numpy.memmap"""
+        modname = self.snapshot_module_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.py".format(modname))
+        logger.info("Writing registry snapshot reader, {}".format(ofilename))
+        field_strs = list()
+        for var, ref in self.snapshot_fields():
+            tcode = File.__snapshot_types[var.var_type.lower()]
+            field_strs.append("    ({!r}, {!r}, {!r}, {!r}, {!r}),\n".format(
+                var.standard_name, ref, tcode, var.kind,
+                tuple(var.dimensions)))
+        # end for
+        with open(sink.target(ofilename), "w") as outfile:
+            outfile.write(_SNAPSHOT_READER_TEMPLATE.format(
+                module=self.name, snapmod=modname,
+                routine=self.snapshot_routine_name(),
+                fields=''.join(field_strs)))
+        # end with
+        return ofilename
+
+    def c_binding_module_name(self):
+        """Return the name of the C binding module for this File"""
+        return '{}_c_binding'.format(self.name)
+
+    def c_binding_fields(self):
+        """Return a list of (variable, reference, C symbol) tuples, one for
+        each public field in this File whose storage can be passed to C.
+        These are module variables of a bind(C) DDT type and intrinsic
+        fields with a C type (see c_type_names). Fields must either
+        be pointers or be module variables with the target attribute."""
+        fields = list()
+        for var in self.__var_dict.variable_list():
+            my_ddt = var.is_ddt
+            if ((var.access != 'private') and my_ddt and my_ddt.bindC and
+                    (not var.dimensions) and ('target' in var.allocatable)):
+                fields.append((var, var.local_name))
+            # end if
+        # end for
+        for var, ref in self.snapshot_fields():
+            if var.allocatable == 'pointer':
+                addressable = True
+            else:
+                addressable = ('%' not in ref) and ('target' in var.allocatable)
+            # end if
+            if addressable and (c_type_key(var, self.__config) in _C_TYPES):
+                fields.append((var, ref))
+            # end if
+        # end for
+        return [(var, ref, '{}_{}'.format(self.name, ref.replace('%', '_')))
+                for var, ref in fields]
+
+    def write_c_binding_source(self, outdir, indent, logger):
+        """Write a Fortran module with a bind(C) accessor function for each
+        field in c_binding_fields. Each function returns the C address
+        of its field (or C_NULL_PTR if the field is not allocated) and,
+        for arrays, the field's current shape."""
+        modname = self.c_binding_module_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.F90".format(modname))
+        logger.info("Writing registry C binding file, {}".format(ofilename))
+        fields = self.c_binding_fields()
+        use_vars = list()
+        for _, ref, _ in fields:
+            lname = ref.split('%')[0]
+            if lname not in use_vars:
+                use_vars.append(lname)
+            # end if
+        # end for
+        with fortran_tools.FortranWriter(sink.target(ofilename), "w",
+                                         indent=indent) as outfile:
+            outfile.write('module {}\n'.format(modname), 0)
+            cmods = 'c_ptr, c_loc, c_null_ptr, c_int64_t'
+            outfile.write('use iso_c_binding, only: {}'.format(cmods), 1)
+            for lname in use_vars:
+                outfile.write('use {}, only: {}'.format(self.name, lname), 1)
+            # end for
+            outfile.write("\nimplicit none\nprivate\n", 0)
+            outfile.write('!! public interfaces', 0)
+            for index in range(len(fields)):
+                outfile.write('public :: get_c_ptr_{}'.format(index + 1), 1)
+            # end for
+            outfile.write("\nCONTAINS\n", 0)
+            for index, field in enumerate(fields):
+                var, ref, symbol = field
+                rank = len(var.dimensions)
+                funcname = 'get_c_ptr_{}'.format(index + 1)
+                if rank > 0:
+                    args = 'dims'
+                else:
+                    args = ''
+                # end if
+                outfile.write('! {}: {}'.format(ref, var.standard_name), 1)
+                outfile.write(('function {}({}) result(cptr) ' +
+                               'bind(C, name="{}")').format(funcname, args,
+                                                            symbol), 1)
+                if rank > 0:
+                    outfile.write('!! Dummy argument', 2)
+                    dstr = 'integer(c_int64_t), intent(out) :: dims({})'
+                    outfile.write(dstr.format(rank), 2)
+                # end if
+                outfile.write('!! Function result', 2)
+                outfile.write('type(c_ptr) :: cptr', 2)
+                outfile.write('', 0)
+                if var.allocatable == 'pointer':
+                    status = 'associated({})'.format(ref)
+                elif var.allocatable[0:11] == 'allocatable':
+                    status = 'allocated({})'.format(ref)
+                else:
+                    status = None
+                # end if
+                if status:
+                    outfile.write('if ({}) then'.format(status), 2)
+                    sindent = 3
+                else:
+                    sindent = 2
+                # end if
+                if rank > 0:
+                    outfile.write('dims = int(shape({}), c_int64_t)'.format(ref),
+                                  sindent)
+                # end if
+                outfile.write('cptr = c_loc({})'.format(ref), sindent)
+                if status:
+                    outfile.write('else', 2)
+                    if rank > 0:
+                        outfile.write('dims = 0_c_int64_t', 3)
+                    # end if
+                    outfile.write('cptr = c_null_ptr', 3)
+                    outfile.write('end if', 2)
+                # end if
+                outfile.write('end function {}\n'.format(funcname), 1)
+            # end for
+            outfile.write('end module {}'.format(modname), 0)
+        # end with
+        return ofilename
+
+    def write_c_header(self, outdir, logger):
+        """Write a C header with a struct for each bind(C) DDT in this File
+        and a prototype for each accessor from write_c_binding_source"""
+        modname = self.c_binding_module_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.h".format(modname))
+        logger.info("Writing registry C header file, {}".format(ofilename))
+        guard = '{}_H'.format(modname.upper())
+        with open(sink.target(ofilename), "w") as outfile:
+            outfile.write('/* C mirrors of the bind(C) types and fields ')
+            outfile.write('in {}\n'.format(self.name))
+            outfile.write('   This file was generated by ')
+            outfile.write('generate_registry_data.py, do not edit. */\n\n')
+            outfile.write('#ifndef {}\n#define {}\n\n'.format(guard, guard))
+            outfile.write('#include <stdint.h>\n')
+            for ddt in self.__ddts.values():
+                if not ddt.bindC:
+                    continue
+                # end if
+                outfile.write('\n/* {} */\n'.format(ddt.ddt_type))
+                outfile.write('typedef struct {\n')
+                for var, ctype, _ in ddt.c_members():
+                    outfile.write('  {} {}; /* {} */\n'.format(ctype,
+                                                               var.local_name,
+                                                               var.standard_name))
+                # end for
+                outfile.write('}} {};\n'.format(ddt.ddt_type))
+            # end for
+            outfile.write('\n/* Field accessors: Return the address of a ')
+            outfile.write('field (NULL if it is not\n   allocated). ')
+            outfile.write('For arrays, <dims> is set to the field shape ')
+            outfile.write('(Fortran order). */\n')
+            for var, ref, symbol in self.c_binding_fields():
+                if var.is_ddt:
+                    rtype = var.var_type
+                else:
+                    rtype = c_type_names(var, self.__config)[0]
+                # end if
+                if var.dimensions:
+                    args = 'int64_t dims[{}]'.format(len(var.dimensions))
+                else:
+                    args = 'void'
+                # end if
+                outfile.write('{} *{}({}); /* {}: {} */\n'.format(
+                    rtype, symbol, args, ref, var.standard_name))
+            # end for
+            outfile.write('\n#endif /* {} */\n'.format(guard))
+        # end with
+        return ofilename
+
+    def write_ctypes_module(self, outdir, logger):
+        """Write a Python module with ctypes mirrors of the bind(C) DDTs in
+        this File and zero-copy numpy views over the fields from
+        c_binding_fields"""
+        modname = self.c_binding_module_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.py".format(modname))
+        logger.info("Writing registry ctypes module, {}".format(ofilename))
+        struct_strs = list()
+        for ddt in self.__ddts.values():
+            if not ddt.bindC:
+                continue
+            # end if
+            members = ddt.c_members()
+            struct_strs.append('class {}(ctypes.Structure):\n'.format(
+                ddt.ddt_type))
+            struct_strs.append('    """ctypes mirror of bind(C) DDT, ' +
+                               '{}"""\n'.format(ddt.ddt_type))
+            struct_strs.append('    _fields_ = [{}]\n'.format(
+                ',\n                '.join(['({!r}, ctypes.{})'.format(
+                    var.local_name, ctypes_type)
+                                            for var, _, ctypes_type
+                                            in members])))
+            struct_strs.append('    standard_names = {{{}}}\n\n'.format(
+                ',\n                      '.join(['{!r} : {!r}'.format(
+                    var.local_name, var.standard_name)
+                                                  for var, _, _ in members])))
+        # end for
+        field_strs = list()
+        for var, ref, symbol in self.c_binding_fields():
+            if var.is_ddt:
+                ctypes_type = var.var_type
+            else:
+                ctypes_type = 'ctypes.{}'.format(
+                    c_type_names(var, self.__config)[1])
+            # end if
+            field_strs.append('    ({!r}, ({!r}, {!r}, {}, {!r}, {!r})),\n'.format(
+                var.standard_name, symbol, ref, ctypes_type, var.kind,
+                tuple(var.dimensions)))
+        # end for
+        with open(sink.target(ofilename), "w") as outfile:
+            outfile.write(_CTYPES_MODULE_TEMPLATE.format(
+                module=self.name, bindmod=modname,
+                structs=''.join(struct_strs), fields=''.join(field_strs)))
+        # end with
+        return ofilename
+
+    @staticmethod
+    def __write_parameter_array(outfile, decl, values, type_spec):
+        """Write parameter array declaration, <decl>, with <values>
+        (Fortran strings), one value per line.
+        <type_spec> is the type of an empty array constructor."""
+        if not values:
+            outfile.write('{} = (/ {} :: /)'.format(decl, type_spec), 1)
+            return
+        # end if
+        outfile.write('{} = (/ &'.format(decl), 1)
+        for index, value in enumerate(values):
+            if index == len(values) - 1:
+                suffix = ' /)'
+            else:
+                suffix = ', &'
+            # end if
+            outfile.write('{}{}'.format(value, suffix), 2)
+        # end for
+
+    def catalog_module_name(self):
+        """Return the name of the field catalog module for this File"""
+        return '{}_catalog'.format(self.name)
+
+    def catalog_fields(self):
+        """Return a list of (variable, reference, addressable) tuples, one
+        for each field in this File's field catalog (the snapshot fields,
+        see snapshot_fields), in catalog index order.
+        <addressable> is True if a pointer may be associated with the
+        field's storage (see c_binding_fields).
+        Raise CCPPError if two fields have the same standard name."""
+        fields = list()
+        stdnames = set()
+        for var, ref in self.snapshot_fields():
+            stdname = var.standard_name.lower()
+            if stdname in stdnames:
+                emsg = "Duplicate standard name, '{}', in field catalog for {}"
+                raise parse_tools.CCPPError(emsg.format(var.standard_name,
+                                                        self.name))
+            # end if
+            stdnames.add(stdname)
+            if var.allocatable == 'pointer':
+                addressable = True
+            else:
+                addressable = ('%' not in ref) and ('target' in var.allocatable)
+            # end if
+            fields.append((var, ref, addressable))
+        # end for
+        return fields
+
+    def write_catalog_source(self, outdir, indent, logger):
+        """Write a Fortran module which looks up the fields in this File
+        by standard name.
+        <name>_field_index returns a field's catalog index using a hash
+           table of the standard names (see catalog_hash_table), the
+           hash is computed in Fortran exactly as by catalog_hash.
+        <name>_field_info returns a field's type code (r, i, l, or c) and
+           rank.
+        <name>_field_shape returns a field's current shape.
+        <name>_field_pointer associates the component of a field pointer
+           with the field's rank with the field's storage (if the field
+           is a pointer or a target and has storage).
+        """
+        # pylint: disable=too-many-locals
+        # pylint: disable=too-many-statements
+        fields = self.catalog_fields()
+        modname = self.catalog_module_name()
+        sink = output_sink(outdir)
+        ofilename = sink.path("{}.F90".format(modname))
+        logger.info("Writing registry field catalog, {}".format(ofilename))
+        stdnames = [var.standard_name.lower() for var, _, _ in fields]
+        table = catalog_hash_table(stdnames)
+        max_rank = max([len(var.dimensions) for var, _, _ in fields] + [0])
+        if stdnames:
+            name_len = max([len(x) for x in stdnames])
+        else:
+            name_len = 1
+        # end if
+        use_vars = list()
+        for var, ref, addressable in fields:
+            lname = ref.split('%')[0]
+            if ((var.dimensions or addressable) and
+                    (lname not in use_vars)):
+                use_vars.append(lname)
+            # end if
+        # end for
+        ptr_type = '{}_field_ptr'.format(self.name)
+        index_func = '{}_field_index'.format(self.name)
+        info_sub = '{}_field_info'.format(self.name)
+        shape_func = '{}_field_shape'.format(self.name)
+        ptr_sub = '{}_field_pointer'.format(self.name)
+        with fortran_tools.FortranWriter(sink.target(ofilename), "w",
+                                         indent=indent) as outfile:
+            outfile.write('module {}\n'.format(modname), 0)
+            outfile.write('use iso_fortran_env, only: int64', 1)
+            for lname in use_vars:
+                outfile.write('use {}, only: {}'.format(self.name, lname), 1)
+            # end for
+            outfile.write("\nimplicit none\nprivate\n", 0)
+            outfile.write('!! Number of fields in the catalog', 1)
+            outfile.write('integer, public, parameter :: ' +
+                          '{}_num_fields = {}'.format(self.name, len(fields)),
+                          1)
+            outfile.write('', 0)
+            outfile.write('!! Pointer to the storage of a catalog field, ' +
+                          'only the component', 1)
+            outfile.write("!! with the field's rank is associated", 1)
+            outfile.write('type, public :: {}'.format(ptr_type), 1)
+            outfile.write('class(*), pointer :: rank0 => null()', 2)
+            for rank in range(1, max_rank + 1):
+                outfile.write('class(*), pointer :: ' +
+                              'rank{}({}) => null()'.format(
+                                  rank, ','.join([':']*rank)), 2)
+            # end for
+            outfile.write('end type {}\n'.format(ptr_type), 1)
+            outfile.write('!! Standard names, type codes, and ranks ' +
+                          'by catalog index', 1)
+            outfile.write('integer, parameter :: name_len = {}'.format(
+                name_len), 1)
+            nfields = len(fields)
+            name_strs = ["'{}'".format(x.ljust(name_len)) for x in stdnames]
+            tcode_strs = ["'{}'".format(File.__snapshot_types[
+                var.var_type.lower()]) for var, _, _ in fields]
+            rank_strs = [str(len(var.dimensions)) for var, _, _ in fields]
+            File.__write_parameter_array(outfile,
+                                         'character(len=name_len), ' +
+                                         'parameter :: standard_names' +
+                                         '({})'.format(nfields), name_strs,
+                                         'character(len=name_len)')
+            File.__write_parameter_array(outfile,
+                                         'character(len=1), parameter :: ' +
+                                         'type_codes({})'.format(nfields),
+                                         tcode_strs, 'character(len=1)')
+            File.__write_parameter_array(outfile,
+                                         'integer, parameter :: ' +
+                                         'ranks({})'.format(nfields),
+                                         rank_strs, 'integer')
+            outfile.write('', 0)
+            outfile.write('!! Hash table of catalog indices ' +
+                          '(zero is an empty slot)', 1)
+            outfile.write('integer, parameter :: hash_size = {}'.format(
+                len(table)), 1)
+            File.__write_parameter_array(outfile, 'integer, parameter :: ' +
+                                         'hash_table(hash_size)',
+                                         [str(x) for x in table], 'integer')
+            outfile.write('', 0)
+            outfile.write('!! public interfaces', 0)
+            for pname in (index_func, info_sub, shape_func, ptr_sub):
+                outfile.write('public :: {}'.format(pname), 1)
+            # end for
+            outfile.write("\nCONTAINS\n", 0)
+            # Index lookup
+            outfile.write(('integer function {}(standard_name) ' +
+                           'result(findex)').format(index_func), 1)
+            outfile.write('!! Return the catalog index of <standard_name> ' +
+                          '(zero if it is not in the catalog)', 2)
+            outfile.write('character(len=*), intent(in) :: standard_name', 2)
+            outfile.write('', 0)
+            outfile.write('character(len=len(standard_name)) :: lname', 2)
+            outfile.write('integer(int64)                   :: hval', 2)
+            outfile.write('integer                          :: ichr', 2)
+            outfile.write('integer                          :: cindex', 2)
+            outfile.write('integer                          :: slot', 2)
+            outfile.write('integer                          :: probe', 2)
+            outfile.write('', 0)
+            outfile.write('lname = standard_name', 2)
+            outfile.write('hval = 0_int64', 2)
+            outfile.write('do cindex = 1, len_trim(standard_name)', 2)
+            outfile.write('ichr = ichar(standard_name(cindex:cindex))', 3)
+            outfile.write("if ((ichr >= ichar('A')) .and. " +
+                          "(ichr <= ichar('Z'))) then", 3)
+            outfile.write('ichr = ichr + 32', 4)
+            outfile.write('lname(cindex:cindex) = char(ichr)', 4)
+            outfile.write('end if', 3)
+            outfile.write(('hval = mod((hval * {}_int64) + ' +
+                           'int(ichr, int64), {}_int64)').format(
+                               CATALOG_HASH_MULTIPLIER,
+                               CATALOG_HASH_MODULUS), 3)
+            outfile.write('end do', 2)
+            outfile.write('slot = int(mod(hval, int(hash_size, int64))) + 1',
+                          2)
+            outfile.write('findex = 0', 2)
+            outfile.write('do probe = 1, hash_size', 2)
+            outfile.write('if (hash_table(slot) == 0) then', 3)
+            outfile.write('exit', 4)
+            outfile.write('else if (standard_names(hash_table(slot)) == ' +
+                          'lname) then', 3)
+            outfile.write('findex = hash_table(slot)', 4)
+            outfile.write('exit', 4)
+            outfile.write('end if', 3)
+            outfile.write('slot = mod(slot, hash_size) + 1', 3)
+            outfile.write('end do', 2)
+            outfile.write('end function {}\n'.format(index_func), 1)
+            # Type and rank
+            outfile.write('subroutine {}(findex, type_code, rank)'.format(
+                info_sub), 1)
+            outfile.write('!! Return the type code (r, i, l, or c) and ' +
+                          'rank of field <findex>', 2)
+            outfile.write('integer,          intent(in)  :: findex', 2)
+            outfile.write('character(len=1), intent(out) :: type_code', 2)
+            outfile.write('integer,          intent(out) :: rank', 2)
+            outfile.write('', 0)
+            outfile.write('call check_index(findex, "{}")'.format(info_sub), 2)
+            outfile.write('type_code = type_codes(findex)', 2)
+            outfile.write('rank = ranks(findex)', 2)
+            outfile.write('end subroutine {}\n'.format(info_sub), 1)
+            # Shape query
+            outfile.write('function {}(findex) result(fshape)'.format(
+                shape_func), 1)
+            outfile.write('!! Return the current shape of field <findex> ' +
+                          '(zeros if it has no storage)', 2)
+            outfile.write('integer, intent(in)         :: findex', 2)
+            outfile.write('integer(int64), allocatable :: fshape(:)', 2)
+            outfile.write('', 0)
+            outfile.write('call check_index(findex, "{}")'.format(shape_func),
+                          2)
+            outfile.write('allocate(fshape(ranks(findex)))', 2)
+            outfile.write('fshape = 0_int64', 2)
+            outfile.write('select case (findex)', 2)
+            for index, field in enumerate(fields):
+                var, ref, _ = field
+                if not var.dimensions:
+                    continue
+                # end if
+                outfile.write('case ({}) ! {}'.format(index + 1, ref), 2)
+                status = File.__snapshot_status(var, ref)
+                shape_str = 'fshape = int(shape({}), int64)'.format(ref)
+                if status:
+                    outfile.write('if ({}) then'.format(status), 3)
+                    outfile.write(shape_str, 4)
+                    outfile.write('end if', 3)
+                else:
+                    outfile.write(shape_str, 3)
+                # end if
+            # end for
+            outfile.write('end select', 2)
+            outfile.write('end function {}\n'.format(shape_func), 1)
+            # Storage pointer
+            outfile.write('subroutine {}(findex, fptr)'.format(ptr_sub), 1)
+            outfile.write('!! Associate the component of <fptr> with the ' +
+                          "rank of field <findex> with the field's", 2)
+            outfile.write('!! storage. All components of <fptr> are null ' +
+                          'if the field has no storage', 2)
+            outfile.write('!! or is neither a pointer nor a target.', 2)
+            outfile.write('integer,              intent(in)  :: findex', 2)
+            outfile.write('type({}), intent(out) :: fptr'.format(ptr_type), 2)
+            outfile.write('', 0)
+            outfile.write('call check_index(findex, "{}")'.format(ptr_sub), 2)
+            outfile.write('select case (findex)', 2)
+            for index, field in enumerate(fields):
+                var, ref, addressable = field
+                if not addressable:
+                    continue
+                # end if
+                outfile.write('case ({}) ! {}'.format(index + 1, ref), 2)
+                status = File.__snapshot_status(var, ref)
+                ptr_str = 'fptr%rank{} => {}'.format(len(var.dimensions), ref)
+                if status:
+                    outfile.write('if ({}) then'.format(status), 3)
+                    outfile.write(ptr_str, 4)
+                    outfile.write('end if', 3)
+                else:
+                    outfile.write(ptr_str, 3)
+                # end if
+            # end for
+            outfile.write('end select', 2)
+            outfile.write('end subroutine {}\n'.format(ptr_sub), 1)
+            # Index check
+            outfile.write('subroutine check_index(findex, caller)', 1)
+            outfile.write('use cam_abortutils, only: endrun', 2)
+            outfile.write('!! Dummy arguments', 2)
+            outfile.write('integer,          intent(in) :: findex', 2)
+            outfile.write('character(len=*), intent(in) :: caller', 2)
+            outfile.write('', 0)
+            outfile.write('character(len=16) :: index_str', 2)
+            outfile.write('', 0)
+            outfile.write('if ((findex < 1) .or. ' +
+                          '(findex > {}_num_fields)) then'.format(self.name),
+                          2)
+            outfile.write("write(index_str, '(i0)') findex", 3)
+            outfile.write('call endrun(caller//": Invalid field index, "' +
+                          '//trim(index_str))', 3)
+            outfile.write('end if', 2)
+            outfile.write('end subroutine check_index', 1)
+            outfile.write('\nend module {}'.format(modname), 0)
+        # end with
+        return ofilename
+
+    @property
+    def name(self):
+        """Return this File's name"""
+        return self.__name
+
+    @property
+    def file_type(self):
+        """Return this File's type"""
+        return self.__type
+
+    @property
+    def fixed_dimensions(self):
+        """Return a dictionary of the fixed dimensions used in this File
+        and their sizes"""
+        return self.__fixed_dims
+
+    @property
+    def var_dict(self):
+        """Return the VarDict of this File's module variables (DDT members
+        are not included)"""
+        return self.__var_dict
+
+    @property
+    def ddts(self):
+        """Return a list of the DDTs defined in this File"""
+        return list(self.__ddts.values())
+
+###############################################################################
+def parse_command_line(args, description):
+###############################################################################
+    """Parse and return the command line arguments when
+    this module is executed"""
+    parser = argparse.ArgumentParser(description=description,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument("registry_file",
                         metavar='<registry XML filename>',
                         type=str, help="XML file with CAM registry library")
     parser.add_argument("--dycore", type=str, required=True,
@@ -1408,8 +2989,11 @@ def parse_command_line(args, description):
                         help="Dycore (EUL, FV, FV3, MPAS, SE, none)")
     parser.add_argument("--config", type=str, required=True,
                         metavar='CONFIG (required)',
-                        help=("Comma-separated onfig items "
-                              "(e.g., gravity_waves=True)"))
+                        help=("Comma-separated config items "
+                              "(e.g., gravity_waves=True)\n"
+                              "Integer pcols, nlev, or <name>_dimension "
+                              "items fix those\ndimensions at compile "
+                              "time (e.g., pcols=16,nlev=32)"))
     parser.add_argument("--output-dir", type=str, default=None,
                         help="Directory where output files will be written")
     group = parser.add_mutually_exclusive_group()
@@ -1419,13 +3003,59 @@ def parse_command_line(args, description):
                        help='Disable logging except for errors', default=False)
     parser.add_argument("--indent", type=int, default=3,
                         help="Indent level for Fortran source code")
+    parser.add_argument("--snapshot", action='store_true', default=False,
+                        help=("Also write a Fortran state snapshot routine "
+                              "and a Python\nnumpy.memmap reader for "
+                              "each registry file"))
+    parser.add_argument("--c-bindings", action='store_true', default=False,
+                        help=("Also write bind(C) field accessors, a C "
+                              "header, and a Python\nctypes module for "
+                              "each registry file (requires a\nkind_phys=r4 "
+                              "or kind_phys=r8 --config item)"))
+    parser.add_argument("--catalog", action='store_true', default=False,
+                        help=("Also write a Fortran field catalog (lookup "
+                              "by standard name) for\neach registry file"))
+    parser.add_argument("--depfile", type=str, default=None,
+                        help=("Write a dependency file listing the inputs "
+                              "of every generated\nfile and the Fortran "
+                              "module order of the generated modules"))
+    parser.add_argument("--depfile-format", type=str, default='make',
+                        choices=['make', 'ninja'],
+                        help=("Dependency file format (ninja omits the "
+                              "module order rules)"))
+    parser.add_argument("--stream", action='store_true', default=False,
+                        help=("Build registry objects while reading the "
+                              "registry to reduce\npeak memory for very "
+                              "large registries"))
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help=("Directory where schema validation results "
+                              "for the registry\nand its fragments are kept "
+                              "so that unchanged files are\nnot validated "
+                              "again (only results checked by xmllint\n"
+                              "are kept)"))
     pargs = parser.parse_args(args)
+    if pargs.c_bindings:
+        # The C type of a build-dependent kind comes from the config
+        try:
+            config = parse_config(pargs.config)
+        except parse_tools.CCPPError as ccpperr:
+            parser.error(str(ccpperr))
+        # end try
+        for kind in sorted(_CONFIG_KINDS):
+            if str(config.get(kind, '')).lower() not in _CONFIG_KINDS[kind]:
+                emsg = "--c-bindings requires a {} config item ({})"
+                parser.error(emsg.format(kind, ' or '.join(
+                    ["{}={}".format(kind, x) for x in _CONFIG_KINDS[kind]])))
+            # end if
+        # end for
+    # end if
     return pargs
 
 ###############################################################################
-def write_registry_files(registry, dycore, config, outdir, indent, logger):
+def parse_registry(registry, dycore, config, logger):
 ###############################################################################
-    """Write metadata and source files for <registry>
+    """Parse <registry> (an XML root element) and return a list of
+    File objects.
 
     >>> File(ET.fromstring('<variable name="physics_types" type="module"><user reference="kind_phys"/></variable>'), TypeRegistry(), 'eul', "", None) #doctest: +IGNORE_EXCEPTION_DETAIL
     Traceback (most recent call last):
@@ -1441,36 +3071,627 @@ def write_registry_files(registry, dycore, config, outdir, indent, logger):
             files.append(File(section, known_types, dycore, config, logger))
         else:
             emsg = "Unknown registry object type, '{}'"
-            raise CCPPError(emsg.format(section.tag))
+            raise parse_tools.CCPPError(emsg.format(section.tag))
         # end if
     # end for
+    return files
+
+###############################################################################
+def write_registry_files(registry, dycore, config, outdir, indent, logger,
+                         snapshot=False, c_bindings=False, catalog=False):
+###############################################################################
+    """Write metadata and source files for <registry>
+    If <snapshot> is True, also write state snapshot writers and readers.
+    If <c_bindings> is True, also write C and Python bindings.
+    If <catalog> is True, also write field catalogs.
+    Return the list of registry File objects and an OrderedDict of the
+    files written for each of them.
+    """
+    files = parse_registry(registry, dycore, config, logger)
+    outputs = write_files(files, outdir, indent, logger,
+                          snapshot=snapshot, c_bindings=c_bindings,
+                          catalog=catalog)
+    return files, outputs
+
+###############################################################################
+def write_files(files, outdir, indent, logger, snapshot=False,
+                c_bindings=False, catalog=False):
+###############################################################################
+    """Write metadata and source files for <files>, a list of registry
+    File objects (see write_registry_files).
+    <outdir> is an output directory or sink (e.g., a MemorySink).
+    Return an OrderedDict of the files written for each of them.
+    """
+    sink = output_sink(outdir)
     # Make sure output directory exists
-    if not os.path.exists(outdir):
-        os.makedirs(outdir)
-    # end if
+    sink.create()
     # Write metadata
+    outputs = OrderedDict()
     for file_ in files:
-        file_.write_metadata(outdir, logger)
-        file_.write_source(outdir, indent, logger)
+        meta_file = file_.write_metadata(sink, logger)
+        ofiles = [meta_file,
+                  file_.write_metadata_sidecar(meta_file, logger, sink=sink),
+                  file_.write_source(sink, indent, logger)]
+        if snapshot:
+            ofiles.append(file_.write_snapshot_source(sink, indent, logger))
+            ofiles.append(file_.write_snapshot_reader(sink, logger))
+        # end if
+        if c_bindings:
+            ofiles.append(file_.write_c_binding_source(sink, indent, logger))
+            ofiles.append(file_.write_c_header(sink, logger))
+            ofiles.append(file_.write_ctypes_module(sink, logger))
+        # end if
+        if catalog:
+            ofiles.append(file_.write_catalog_source(sink, indent, logger))
+        # end if
+        outputs[file_.name] = ofiles
     # end for
+    return outputs
+
+###############################################################################
+def _stream_xml(xml_file, item_depth):
+###############################################################################
+    """Parse <xml_file> incrementally and yield (event, depth, element)
+    for each element at most <item_depth> deep (the root is at depth 1).
+    Elements above <item_depth> are yielded at their 'start' event, when
+    only their attributes are known, and at their 'end' event.
+    Elements at <item_depth> are only yielded, complete, at their 'end'
+    event. Every element is removed from the tree once the caller is done
+    with it so that the tree never holds more than one complete item."""
+    if not (os.path.isfile(xml_file) and os.access(xml_file, os.R_OK)):
+        emsg = "Cannot read registry file, {}"
+        raise parse_tools.CCPPError(emsg.format(xml_file))
+    # end if
+    parents = list()
+    with open(xml_file, "rb") as infile:
+        for event, elem in ET.iterparse(infile, events=('start', 'end')):
+            if event == 'start':
+                if len(parents) < item_depth - 1:
+                    yield event, len(parents) + 1, elem
+                # end if
+                parents.append(elem)
+            else:
+                parents.pop()
+                depth = len(parents) + 1
+                if depth <= item_depth:
+                    yield event, depth, elem
+                # end if
+                if 1 < depth <= item_depth:
+                    parents[-1].remove(elem)
+                # end if
+            # end if
+        # end for
+    # end with
+
+###############################################################################
+def _fragment_file(registry_file, include):
+###############################################################################
+    """Return the absolute path of the registry fragment named by
+    <include>, an include XML element in <registry_file>"""
+    frag_file = os.path.join(os.path.dirname(registry_file),
+                             include.get('href'))
+    return os.path.abspath(frag_file)
+
+###############################################################################
+def _check_fragment(frag_file, fragment, version):
+###############################################################################
+    """Raise CCPPError if <fragment>, the root element of <frag_file>, is
+    not a registry fragment of registry schema version, <version>"""
+    if fragment.tag != 'registry_fragment':
+        emsg = "{}: Unknown registry fragment type, '{}'"
+        raise parse_tools.CCPPError(emsg.format(frag_file, fragment.tag))
+    # end if
+    if parse_tools.find_schema_version(fragment) != version:
+        emsg = "{}: Fragment version, {}, does not match registry"
+        raise parse_tools.CCPPError(emsg.format(frag_file,
+                                                fragment.get('version')))
+    # end if
+
+###############################################################################
+def _registry_root(registry_file):
+###############################################################################
+    """Return the root element of <registry_file>, with its attributes but
+    not its contents, without reading the rest of the file"""
+    elements = _stream_xml(registry_file, 2)
+    _, _, root = next(elements)
+    elements.close()
+    return root
+
+###############################################################################
+def registry_fragments(registry_file):
+###############################################################################
+    """Return the list of registry fragment files included by
+    <registry_file>, in include order, reading it incrementally without
+    building any registry objects (see stream_registry)."""
+    fragments = list()
+    for _, depth, elem in _stream_xml(registry_file, 3):
+        if (depth == 3) and (elem.tag == 'include'):
+            frag_file = _fragment_file(registry_file, elem)
+            if frag_file not in fragments:
+                fragments.append(frag_file)
+            # end if
+        # end if
+    # end for
+    return fragments
+
+###############################################################################
+def stream_registry(registry_file, dycore, config, logger):
+###############################################################################
+    """Parse <registry_file> incrementally and return a list of File
+    objects and a list of the registry fragment files it includes.
+    Unlike parse_registry, the registry XML tree is never held in memory.
+    Each registry object (and each object in an included fragment) is
+    added to its File (see File.add_node) as soon as its end tag is read
+    and is then discarded, so peak memory is set by the File objects
+    rather than by the size of the registry XML."""
+    files = list()
+    fragments = list()
+    known_types = TypeRegistry()
+    version = None
+    file_ = None
+    for event, depth, elem in _stream_xml(registry_file, 3):
+        if depth == 1:
+            if event == 'start':
+                version = parse_tools.find_schema_version(elem)
+            # end if
+        elif depth == 2:
+            if elem.tag != 'file':
+                emsg = "Unknown registry object type, '{}'"
+                raise parse_tools.CCPPError(emsg.format(elem.tag))
+            # end if
+            if event == 'start':
+                logger.info("Parsing {}, {}, from registry".format(
+                    elem.tag, elem.get('name')))
+                # Only the attributes of <elem> are needed here
+                file_node = ET.Element(elem.tag, dict(elem.attrib))
+                file_ = File(file_node, known_types, dycore, config, logger)
+            else:
+                files.append(file_)
+                file_ = None
+            # end if
+        elif elem.tag == 'include':
+            frag_file = _fragment_file(registry_file, elem)
+            logger.info("Including registry fragment, {}".format(frag_file))
+            if frag_file not in fragments:
+                fragments.append(frag_file)
+            # end if
+            for _, fdepth, felem in _stream_xml(frag_file, 2):
+                if fdepth == 1:
+                    _check_fragment(frag_file, felem, version)
+                else:
+                    file_.add_node(felem, logger)
+                # end if
+            # end for
+        else:
+            file_.add_node(elem, logger)
+        # end if
+    # end for
+    return files, fragments
+
+###############################################################################
+def generator_scripts():
+###############################################################################
+    """Return a list of the Python source files used to generate registry
+    files (this script and the ccpp-framework modules it imports)"""
+    scripts = [os.path.abspath(__file__)]
+    for modname in ('parse_tools', 'fortran_tools'):
+        module = sys.modules.get(modname)
+        if (module is None) or (not getattr(module, '__file__', None)):
+            continue
+        # end if
+        if hasattr(module, '__path__'):
+            # A package, depend on all of its modules
+            for mpath in module.__path__:
+                scripts.extend(sorted([os.path.join(mpath, x)
+                                       for x in os.listdir(mpath)
+                                       if x.endswith('.py')]))
+            # end for
+        else:
+            scripts.append(os.path.abspath(module.__file__))
+        # end if
+    # end for
+    return scripts
+
+###############################################################################
+def _make_escape(path):
+###############################################################################
+    """Return <path> escaped for use in a Make or Ninja dependency file
+
+    >>> print(_make_escape('a dir/file$1.F90'))
+    a\\ dir/file$$1.F90
+    """
+    return path.replace('$', '$$').replace(' ', '\\ ')
+
+###############################################################################
+def write_depfile(depfile, outputs, inputs, files, module_rules=True):
+###############################################################################
+    """Write dependency file, <depfile>, for the generated registry files.
+    <outputs> is the dictionary of generated files returned by
+       write_registry_files.
+    <inputs> is a list of the input files (registry, schema, fragments
+       and generator scripts) which every generated file depends on.
+    <files> is the list of registry File objects.
+    If <module_rules> is True, also write a rule for each generated
+    Fortran module, <name>.o <name>.mod: <source> <used module>.mod ...,
+    and an empty rule for each input so that Make does not fail if an
+    input is removed. Leave <module_rules> False for Ninja, which only
+    accepts rules for the outputs of the edge which owns the depfile."""
+    all_outputs = [x for ofiles in outputs.values() for x in ofiles]
+    with open(depfile, "w") as outfile:
+        outfile.write("{}: {}\n".format(
+            ' '.join([_make_escape(x) for x in all_outputs]),
+            ' \\\n  '.join([_make_escape(x) for x in inputs])))
+        if module_rules:
+            for file_ in files:
+                sources = [x for x in outputs[file_.name]
+                           if x.endswith('.F90')]
+                for source in sources:
+                    modname = os.path.splitext(os.path.basename(source))[0]
+                    deps = file_.module_dependencies(modname)
+                    outfile.write("\n{name}.o {name}.mod: {src}".format(
+                        name=modname, src=_make_escape(source)))
+                    for dep in deps:
+                        outfile.write(" {}.mod".format(dep))
+                    # end for
+                    outfile.write("\n")
+                # end for
+            # end for
+            outfile.write("\n")
+            for infile in inputs:
+                outfile.write("{}:\n".format(_make_escape(infile)))
+            # end for
+        # end if
+    # end with
+
+###############################################################################
+def read_depfile(depfile):
+###############################################################################
+    """Return the lists of outputs and inputs from the first rule of
+    dependency file, <depfile> (as written by write_depfile).
+    Return None if <depfile> cannot be read.
+    """
+    try:
+        with open(depfile, "r") as infile:
+            text = infile.read()
+        # end with
+    except (IOError, OSError):
+        return None
+    # end try
+    rule = text.replace('\\\n', ' ').split('\n')[0]
+    tokens = [x.replace('\\ ', ' ').replace('$$', '$')
+              for x in re.findall(r"(?:\\ |\S)+", rule)]
+    for index, token in enumerate(tokens):
+        if token.endswith(':'):
+            tokens[index] = token[:-1]
+            return tokens[0:index+1], tokens[index+1:]
+        # end if
+    # end for
+    return None
+
+###############################################################################
+def outputs_up_to_date(depfile, signature):
+###############################################################################
+    """Return True if the outputs listed in dependency file, <depfile>, all
+    exist and are newer than all of its inputs and if the previous run
+    used the same arguments (<signature> matches the one saved with
+    <depfile>)."""
+    try:
+        with open(depfile + '.args', "r") as sigfile:
+            if sigfile.read() != signature:
+                return False
+            # end if
+        # end with
+    except (IOError, OSError):
+        return False
+    # end try
+    rule = read_depfile(depfile)
+    if (rule is None) or (not rule[0]):
+        return False
+    # end if
+    outputs, inputs = rule
+    try:
+        oldest_output = min([os.path.getmtime(x) for x in outputs])
+        newest_input = max([os.path.getmtime(x) for x in inputs])
+    except OSError:
+        # A missing output or input
+        return False
+    # end try
+    return oldest_output >= newest_input
+
+###############################################################################
+def _validate_registry(registry_file, version, schema_dir, logger,
+                       error_on_no_validate):
+###############################################################################
+    """Validate <registry_file> against the registry schema, <version>,
+    found in <schema_dir>.
+    Return a tuple of whether <registry_file> is valid and the error
+    message to use if it is not."""
+    try:
+        emsg = "Invalid registry file, {}".format(registry_file)
+        file_ok = parse_tools.validate_xml_file(
+            registry_file, 'registry', version, logger,
+            schema_path=schema_dir, error_on_noxmllint=error_on_no_validate)
+    except parse_tools.CCPPError as ccpperr:
+        cemsg = "{}".format(ccpperr).split('\n')[0]
+        if cemsg[0:12] == 'Execution of':
+            xstart = cemsg.find("'")
+            if xstart >= 0:
+                xend = cemsg[xstart + 1:].find("'") + xstart + 1
+                emsg += '\n' + cemsg[xstart + 1:xend]
+            # end if (else, just keep original message)
+        elif cemsg[0:18] == 'validate_xml_file:':
+            emsg += "\n" + cemsg
+        # end if
+        file_ok = False
+    # end if
+    return file_ok, emsg
+
+###############################################################################
+def find_xmllint():
+###############################################################################
+    """Return the path of the xmllint executable used to validate registry
+    files or None if it is not in the PATH"""
+    for path_dir in os.environ.get('PATH', '').split(os.pathsep):
+        xmllint = os.path.join(path_dir, 'xmllint')
+        if os.path.isfile(xmllint) and os.access(xmllint, os.X_OK):
+            return xmllint
+        # end if
+    # end for
+    return None
+
+###############################################################################
+def _cached_validation(xml_file, version, schema_file, logger,
+                       error_on_no_validate, cache):
+###############################################################################
+    """Validate <xml_file> against <schema_file> as _validate_registry
+    does. If <cache> (a RegistryCache) is present, only validate
+    <xml_file> if it, or <schema_file>, has changed.
+    Without xmllint or a schema, _validate_registry may only warn so the
+    result is not kept between processes."""
+    schema_dir = schema_file and os.path.dirname(schema_file)
+    if cache is None:
+        return _validate_registry(xml_file, version, schema_dir, logger,
+                                  error_on_no_validate)
+    # end if
+    xmllint = find_xmllint()
+    vkey = (cache.file_hash(xml_file),
+            schema_file and cache.file_hash(schema_file),
+            error_on_no_validate, xmllint)
+    result = cache.validation(vkey)
+    if result is None:
+        result = _validate_registry(xml_file, version, schema_dir, logger,
+                                    error_on_no_validate)
+        cache.add_validation(vkey, result,
+                             persist=bool(xmllint and schema_file))
+    # end if
+    return result
+
+###############################################################################
+class RegistryCache:
+###############################################################################
+    """In-memory cache of registry validation results, parsed registries
+    and generated files, keyed on the contents of the input files.
+    A long-running process (e.g., registry_server.py) passes one
+    RegistryCache to each gen_registry call so that an unchanged registry
+    is not validated, parsed, or rendered again.
+    File contents are only hashed again when their size or modification
+    time changes.
+    If <cache_dir> is present, successful validation results are also
+    kept there so that they survive between processes."""
+
+    def __init__(self, cache_dir=None):
+        """Initialize an empty cache"""
+        self.__cache_dir = cache_dir
+        self.__hashes = dict()      # path -> ((mtime, size), sha256)
+        self.__registries = dict()  # sha256 -> registry XML root
+        self.__validations = dict() # key -> (file_ok, emsg)
+        self.__outputs = dict()     # key -> (files, [(name, [(file, data)])])
+        self.__hits = 0
+        self.__misses = 0
+
+    def file_hash(self, path):
+        """Return the SHA-256 hex digest of the contents of <path>"""
+        path = os.path.abspath(path)
+        fstat = os.stat(path)
+        stamp = (fstat.st_mtime, fstat.st_size)
+        if (path not in self.__hashes) or (self.__hashes[path][0] != stamp):
+            self.__hashes[path] = (stamp, file_sha256(path))
+        # end if
+        return self.__hashes[path][1]
+
+    def registry(self, registry_file):
+        """Return the XML root of <registry_file> (a registry or registry
+        fragment file), reading it only if its contents have changed"""
+        key = self.file_hash(registry_file)
+        if key in self.__registries:
+            self.__hits += 1
+        else:
+            self.__misses += 1
+            _, registry = parse_tools.read_xml_file(registry_file)
+            self.__registries[key] = registry
+        # end if
+        return self.__registries[key]
+
+    def validation(self, key):
+        """Return the cached (file_ok, emsg) validation result for <key>
+        or None if there is none"""
+        result = self.__validations.get(key)
+        if (result is None) and self.__cache_dir:
+            if os.path.exists(self.__validation_file(key)):
+                result = (True, '')
+                self.__validations[key] = result
+            # end if
+        # end if
+        if result is None:
+            self.__misses += 1
+        else:
+            self.__hits += 1
+        # end if
+        return result
+
+    def add_validation(self, key, result, persist=True):
+        """Cache the (file_ok, emsg) validation <result> for <key>.
+        A successful result is also kept in the cache directory (if any)
+        unless <persist> is False (i.e., the file was not checked against
+        a schema)."""
+        self.__validations[key] = result
+        if self.__cache_dir and result[0] and persist:
+            if not os.path.exists(self.__cache_dir):
+                os.makedirs(self.__cache_dir)
+            # end if
+            with open(self.__validation_file(key), "w") as vfile:
+                vfile.write(json.dumps(key) + '\n')
+            # end with
+        # end if
+
+    def __validation_file(self, key):
+        """Return the name of the file which records that the validation
+        of <key> succeeded"""
+        digest = hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.__cache_dir, digest + ".valid")
+
+    def outputs(self, key):
+        """Return True if there are cached generated files for <key>"""
+        if key in self.__outputs:
+            self.__hits += 1
+            return True
+        # end if
+        self.__misses += 1
+        return False
+
+    def add_outputs(self, key, files, outputs, outdir=None):
+        """Read back and cache the generated files, <outputs> (as returned
+        by write_registry_files), for <files> and <key>.
+        <outdir> is the output sink <outputs> were written to (if not
+        a directory)."""
+        sink = output_sink(outdir)
+        contents = list()
+        for name, ofiles in outputs.items():
+            fdata = list()
+            for ofile in ofiles:
+                fdata.append((os.path.basename(ofile), sink.read(ofile)))
+            # end for
+            contents.append((name, fdata))
+        # end for
+        self.__outputs[key] = (files, contents)
+
+    def write_outputs(self, key, outdir):
+        """Write the cached generated files for <key> to <outdir> (an
+        output directory or sink).
+        Return the registry File objects and an OrderedDict of the files
+        written for each of them (as write_registry_files does)."""
+        files, contents = self.__outputs[key]
+        sink = output_sink(outdir)
+        sink.create()
+        outputs = OrderedDict()
+        for name, fdata in contents:
+            outputs[name] = list()
+            for basename, data in fdata:
+                outputs[name].append(sink.write(basename, data))
+            # end for
+        # end for
+        return files, outputs
+
+    def clear(self):
+        """Remove all cached data"""
+        self.__hashes.clear()
+        self.__registries.clear()
+        self.__validations.clear()
+        self.__outputs.clear()
+
+    @property
+    def stats(self):
+        """Return a dictionary of cache statistics"""
+        return {'hits' : self.__hits, 'misses' : self.__misses,
+                'registries' : len(self.__registries),
+                'outputs' : len(self.__outputs)}
+
+###############################################################################
+def include_fragments(registry, registry_file, logger, cache=None):
+###############################################################################
+    """Return a copy of <registry> (an XML root element) where each
+    <include> element in a <file> element is replaced by the contents of
+    the registry fragment file it names, along with a list of the fragment
+    files used. An href is relative to the directory of <registry_file>.
+    If <cache> (a RegistryCache) is present, a fragment is only read again
+    if its contents have changed.
+    <registry> itself is not modified and is returned if it has no
+    <include> elements.
+
+    >>> include_fragments(ET.fromstring('<registry name="r" version="1.0"><file name="f" type="module"><use module="m" reference="r"/></file></registry>'), 'reg.xml', None)[1]
+    []
+    """
+    if registry.find('file/include') is None:
+        return registry, list()
+    # end if
+    version = parse_tools.find_schema_version(registry)
+    fragments = list()
+    expanded = ET.Element(registry.tag, registry.attrib)
+    expanded.text = registry.text
+    for section in registry:
+        if section.find('include') is None:
+            expanded.append(section)
+            continue
+        # end if
+        new_section = ET.SubElement(expanded, section.tag, section.attrib)
+        for item in section:
+            if item.tag != 'include':
+                new_section.append(item)
+                continue
+            # end if
+            frag_file = _fragment_file(registry_file, item)
+            logger.info("Including registry fragment, {}".format(frag_file))
+            if cache is None:
+                _, fragment = parse_tools.read_xml_file(frag_file)
+            else:
+                fragment = cache.registry(frag_file)
+            # end if
+            _check_fragment(frag_file, fragment, version)
+            if frag_file not in fragments:
+                fragments.append(frag_file)
+            # end if
+            for frag_item in fragment:
+                new_section.append(frag_item)
+            # end for
+        # end for
+    # end for
+    return expanded, fragments
 
 ###############################################################################
 def gen_registry(registry_file, dycore, config, outdir, indent,
                  loglevel=None, logger=None, schema_paths=None,
-                 error_on_no_validate=False):
+                 error_on_no_validate=False, snapshot=False,
+                 c_bindings=False, depfile=None, depfile_format='make',
+                 cache=None, stream=False, catalog=False):
 ###############################################################################
     """Parse a registry XML file and generate source code and metadata.
     <dycore> is the name of the dycore for DP coupling specialization.
     <config> is a dictionary containing other configuration items for
        souce code customization.
-    Source code and metadata is output to <outdir>.
+    Source code and metadata is output to <outdir>, a directory or an
+       output sink (see render_registry for in-memory output).
     <indent> is the number of spaces between indent levels.
-    Set <debug> to True for more logging output."""
+    Set <debug> to True for more logging output.
+    Set <snapshot> to True to also write state snapshot code
+       (see File.write_snapshot_source).
+    Set <c_bindings> to True to also write bind(C) field accessors, a C header
+       and a Python ctypes module (see File.write_c_binding_source).
+    Set <catalog> to True to also write a field catalog, which looks up
+       fields by standard name (see File.write_catalog_source).
+    If <depfile> is present, write a dependency file (see write_depfile)
+       in <depfile_format> ('make' or 'ninja') to that path.
+    If <cache> (a RegistryCache) is present, reuse its validation results,
+       parsed registries and fragments, and generated files for unchanged
+       inputs.
+    Set <stream> to True to build the registry objects while reading the
+       registry instead of from a complete XML tree (see stream_registry).
+       This lowers peak memory for very large registries. Only validation
+       results are taken from <cache> in this mode."""
     if not logger:
         if not loglevel:
             loglevel = logging.INFO
         # end if
-        logger = init_log(os.path.basename(__file__), loglevel)
+        logger = parse_tools.init_log(os.path.basename(__file__), loglevel)
     elif loglevel is not None:
         emsg = "gen_registry: Ignoring <loglevel> because logger is present"
         logger.debug(emsg)
@@ -1479,43 +3700,56 @@ def gen_registry(registry_file, dycore, config, outdir, indent,
         schema_paths = [__CURRDIR]
     # end if
     logger.info("Reading CAM registry from %s", registry_file)
-    _, registry = read_xml_file(registry_file)
+    if stream:
+        registry = _registry_root(registry_file)
+    elif cache is None:
+        _, registry = parse_tools.read_xml_file(registry_file)
+    else:
+        registry = cache.registry(registry_file)
+    # end if
     # Validate the XML file
-    version = find_schema_version(registry)
+    version = parse_tools.find_schema_version(registry)
     if 0 < logger.getEffectiveLevel() <= logging.DEBUG:
         verstr = '.'.join([str(x) for x in version])
         logger.debug("Found registry version, v%s", verstr)
     # end if
-    schema_dir = None
+    schema_file = None
     for spath in schema_paths:
         logger.debug("Looking for registry schema in '{}'".format(spath))
-        schema_dir = find_schema_file("registry", version, schema_path=spath)
-        if schema_dir:
-            schema_dir = os.path.dirname(schema_dir)
+        schema_file = parse_tools.find_schema_file("registry", version,
+                                                   schema_path=spath)
+        if schema_file:
             break
         # end if
     # end for
-    try:
-        emsg = "Invalid registry file, {}".format(registry_file)
-        file_ok = validate_xml_file(registry_file, 'registry', version,
-                                    logger, schema_path=schema_dir,
-                                    error_on_noxmllint=error_on_no_validate)
-    except CCPPError as ccpperr:
-        cemsg = "{}".format(ccpperr).split('\n')[0]
-        if cemsg[0:12] == 'Execution of':
-            xstart = cemsg.find("'")
-            if xstart >= 0:
-                xend = cemsg[xstart + 1:].find("'") + xstart + 1
-                emsg += '\n' + cemsg[xstart + 1:xend]
-            # end if (else, just keep original message)
-        elif cemsg[0:18] == 'validate_xml_file:':
-            emsg += "\n" + cemsg
+    file_ok, emsg = _cached_validation(registry_file, version, schema_file,
+                                       logger, error_on_no_validate, cache)
+    fragments = list()
+    if file_ok:
+        # Splice in registry fragments, each one is validated on its own
+        if stream:
+            # Validate the fragments before building objects from them
+            fragments = registry_fragments(registry_file)
+        else:
+            registry, fragments = include_fragments(registry, registry_file,
+                                                    logger, cache=cache)
         # end if
-        file_ok = False
+        for fragment in fragments:
+            file_ok, emsg = _cached_validation(fragment, version, schema_file,
+                                               logger, error_on_no_validate,
+                                               cache)
+            if not file_ok:
+                break
+            # end if
+        # end for
+    # end if
+    if file_ok and stream:
+        files, fragments = stream_registry(registry_file, dycore, config,
+                                           logger)
     # end if
     if not file_ok:
         if error_on_no_validate:
-            raise CCPPError(emsg)
+            raise parse_tools.CCPPError(emsg)
         # end if
         logger.error(emsg)
         retcode = 1
@@ -1523,11 +3757,71 @@ def gen_registry(registry_file, dycore, config, outdir, indent,
         library_name = registry.get('name')
         emsg = "Parsing registry, {}".format(library_name)
         logger.debug(emsg)
-        write_registry_files(registry, dycore, config, outdir, indent, logger)
+        if (cache is None) or stream:
+            okey = None
+        else:
+            okey = (cache.file_hash(registry_file),
+                    tuple([cache.file_hash(x) for x in fragments]), dycore,
+                    json.dumps(parse_config(config), sort_keys=True),
+                    indent, snapshot, c_bindings, catalog)
+        # end if
+        if (okey is not None) and cache.outputs(okey):
+            logger.info("Writing cached registry files to {}".format(outdir))
+            files, outputs = cache.write_outputs(okey, outdir)
+        elif stream:
+            outputs = write_files(files, outdir, indent, logger,
+                                  snapshot=snapshot, c_bindings=c_bindings,
+                                  catalog=catalog)
+        else:
+            files, outputs = write_registry_files(registry, dycore, config,
+                                                  outdir, indent, logger,
+                                                  snapshot=snapshot,
+                                                  c_bindings=c_bindings,
+                                                  catalog=catalog)
+            if okey is not None:
+                cache.add_outputs(okey, files, outputs, outdir=outdir)
+            # end if
+        # end if
+        if depfile:
+            inputs = [os.path.abspath(registry_file)] + fragments
+            if schema_file:
+                inputs.append(os.path.abspath(schema_file))
+            # end if
+            inputs.extend(generator_scripts())
+            logger.info("Writing registry dependency file, {}".format(depfile))
+            write_depfile(depfile, outputs, inputs, files,
+                          module_rules=(depfile_format == 'make'))
+        # end if
         retcode = 0 # Throw exception on error
     # end if
     return retcode
 
+###############################################################################
+def render_registry(registry_file, dycore, config, indent, binary=False,
+                    **kwargs):
+###############################################################################
+    """Parse a registry XML file and generate its source code and metadata
+    in memory, no files are written.
+    The arguments are those of gen_registry (other than <outdir> and
+    <depfile>, which are not allowed in <kwargs>).
+    Return an OrderedDict of the contents of each generated file, keyed
+    by file name (no directory) in the order the files were generated.
+    Contents are str unless <binary> is True.
+    Raise a CCPPError if the files cannot be generated."""
+    if kwargs.get('depfile'):
+        emsg = "render_registry: A dependency file cannot be written"
+        raise parse_tools.CCPPError(emsg)
+    # end if
+    with MemorySink() as sink:
+        retcode = gen_registry(registry_file, dycore, config, sink, indent,
+                               **kwargs)
+        if retcode != 0:
+            emsg = "Unable to generate registry files from {}"
+            raise parse_tools.CCPPError(emsg.format(registry_file))
+        # end if
+        return sink.files(binary=binary)
+    # end with
+
 def main():
     """Function to execute when module called as a script"""
     args = parse_command_line(sys.argv[1:], __doc__)
@@ -1543,9 +3837,38 @@ def main():
     else:
         loglevel = logging.INFO
     # end if
+    if args.depfile:
+        # Skip regeneration if nothing has changed since the last run
+        signature = dict(vars(args))
+        for arg in ('debug', 'quiet'):
+            del signature[arg]
+        # end for
+        signature['registry_file'] = os.path.abspath(args.registry_file)
+        signature['output_dir'] = os.path.abspath(outdir)
+        signature = json.dumps(signature, sort_keys=True)
+        if outputs_up_to_date(args.depfile, signature):
+            if not args.quiet:
+                print("Registry files in {} are up to date".format(outdir))
+            # end if
+            return 0
+        # end if
+    # end if
+    if args.cache_dir:
+        cache = RegistryCache(cache_dir=args.cache_dir)
+    else:
+        cache = None
+    # end if
     retcode = gen_registry(args.registry_file, args.dycore.lower(),
                            args.config, outdir, args.indent,
-                           loglevel=loglevel)
+                           loglevel=loglevel, snapshot=args.snapshot,
+                           c_bindings=args.c_bindings, depfile=args.depfile,
+                           depfile_format=args.depfile_format, cache=cache,
+                           stream=args.stream, catalog=args.catalog)
+    if args.depfile and (retcode == 0):
+        with open(args.depfile + '.args', "w") as sigfile:
+            sigfile.write(signature)
+        # end with
+    # end if
     return retcode
 
 ###############################################################################
@@ -0,0 +1,544 @@
+#!/usr/bin/env python
+
+"""
+Report which CAM registry pointer variables could be declared as
+'allocatable, target' instead.
+
+A registry variable with allocatable="pointer" is a candidate for
+conversion when no CCPP scheme or host source file re-associates it.
+The evidence used for each decision is:
+  - CCPP scheme metadata (.meta) tables which reference the variable's
+    standard name (this is how the variable reaches a scheme),
+  - scheme dummy arguments for the variable which are declared with the
+    pointer attribute,
+  - pointer assignment (=>), nullify, or associated applied to the
+    variable (by registry local name) or to a scheme dummy argument
+    for the variable.
+Any pointer evidence keeps the variable a pointer.
+DDT members are never converted, a component of a derived type cannot
+have the target attribute (it is taken from the parent variable).
+
+To run doctest on this file: python -m doctest pointer_advisor.py
+"""
+
+# Python library imports
+import xml.etree.ElementTree as ET
+import io
+import os
+import os.path
+import re
+import argparse
+import sys
+import logging
+
+# CAM registry imports (also sets up the ccpp-framework scripts path)
+# pylint: disable=wrong-import-position
+from generate_registry_data import parse_registry, parse_config
+from generate_registry_data import include_fragments
+from parse_tools import read_xml_file, init_log, CCPPError
+# pylint: enable=wrong-import-position
+
+# Source file suffixes to scan
+_FORTRAN_SUFFIXES = ('.F90', '.f90', '.F', '.f')
+# Allocation attribute written for converted variables
+_TARGET_ALLOC = "allocatable, target"
+# A pointer variable's default initial value (not valid for allocatables)
+_POINTER_INIT = "NULL()"
+
+_SECTION_RE = re.compile(r"^\s*\[\s*([^\]]+?)\s*\]\s*$")
+_SUBROUTINE_RE = re.compile(r"^\s*(?:\w+\s+)*subroutine\s+(\w+)",
+                            re.IGNORECASE)
+_END_SUBROUTINE_RE = re.compile(r"^\s*end\s*subroutine\b", re.IGNORECASE)
+_DECLARATION_RE = re.compile(r"^([^:]*?)::(.*)$")
+
+###############################################################################
+def _strip_comment(line):
+###############################################################################
+    """Return <line> without any Fortran comment.
+
+    >>> _strip_comment("x => y ! point x at y")
+    'x => y '
+    >>> _strip_comment("call endrun('x != y')")
+    "call endrun('x != y')"
+    """
+    quote = None
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+            # end if
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '!':
+            return line[0:index]
+        # end if
+    # end for
+    return line
+
+###############################################################################
+def read_fortran_statements(filename):
+###############################################################################
+    """Return a list of (line number, statement) pairs from Fortran source
+    file, <filename>. Comments are removed and continuation lines are
+    joined to the line where the statement starts."""
+    statements = list()
+    with io.open(filename, "r", errors='replace') as infile:
+        current = ''
+        start = 0
+        for lineno, line in enumerate(infile, start=1):
+            text = _strip_comment(line.rstrip('\n')).strip()
+            if current:
+                if text.startswith('&'):
+                    text = text[1:]
+                # end if
+            else:
+                start = lineno
+            # end if
+            if text.endswith('&'):
+                current += text[:-1] + ' '
+            else:
+                current += text
+                if current.strip():
+                    statements.append((start, current.strip()))
+                # end if
+                current = ''
+            # end if
+        # end for
+        if current.strip():
+            statements.append((start, current.strip()))
+        # end if
+    # end with
+    return statements
+
+###############################################################################
+def read_scheme_metadata(filename):
+###############################################################################
+    """Return a dictionary of the CCPP argument tables in metadata file,
+    <filename>. Each key is a table (subroutine) name and each value is a
+    dictionary of standard name to dummy argument local name."""
+    tables = dict()
+    table = None
+    arg_name = None
+    with io.open(filename, "r", errors='replace') as infile:
+        for line in infile:
+            text = line.split('#', 1)[0].strip()
+            match = _SECTION_RE.match(text)
+            if match:
+                section = match.group(1)
+                if section.lower() in ('ccpp-arg-table',
+                                       'ccpp-table-properties'):
+                    table = section.lower()
+                    arg_name = None
+                else:
+                    arg_name = section
+                # end if
+                continue
+            # end if
+            if '=' not in text:
+                continue
+            # end if
+            for item in text.split('|'):
+                if '=' not in item:
+                    continue
+                # end if
+                key, value = [x.strip() for x in item.split('=', 1)]
+                if key.lower() != 'name' and key.lower() != 'standard_name':
+                    continue
+                # end if
+                if (arg_name is None) and (key.lower() == 'name'):
+                    if table == 'ccpp-arg-table':
+                        table = value.lower()
+                        tables.setdefault(table, dict())
+                    # end if
+                elif ((arg_name is not None) and (table in tables) and
+                      (key.lower() == 'standard_name')):
+                    tables[table][value.lower()] = arg_name.lower()
+                # end if
+            # end for
+        # end for
+    # end with
+    return tables
+
+###############################################################################
+def _pointer_patterns(name):
+###############################################################################
+    """Return a list of (reason, compiled regular expression) pairs which
+    find pointer-only use of variable, <name>.
+    <name> may be referenced directly or as a DDT component (e.g., a%<name>).
+
+    >>> [x[0] for x in _pointer_patterns('u') if x[1].search('st%u => v')]
+    ['pointer assignment']
+    >>> [x[0] for x in _pointer_patterns('u') if x[1].search('v => st%u')]
+    []
+    >>> [x[0] for x in _pointer_patterns('u') if x[1].search('if (associated(st % u)) x = 1')]
+    ['associated']
+    """
+    ref = r"(?<![\w%])(?:\w+\s*(?:\([^()]*\))?\s*%\s*)*" + re.escape(name)
+    return [('pointer assignment',
+             re.compile(r"^\s*" + ref + r"\s*=>", re.IGNORECASE)),
+            ('nullify',
+             re.compile(r"\bnullify\s*\([^)]*" + ref + r"\b", re.IGNORECASE)),
+            ('associated',
+             re.compile(r"\bassociated\s*\(\s*" + ref + r"\b",
+                        re.IGNORECASE))]
+
+###############################################################################
+def _declares_pointer(statement, name):
+###############################################################################
+    """Return True if <statement> declares <name> with the pointer attribute
+
+    >>> _declares_pointer('real(kind_phys), intent(in), pointer :: u(:), v(:)', 'v')
+    True
+    >>> _declares_pointer('real(kind_phys), intent(in) :: u(:)', 'u')
+    False
+    """
+    match = _DECLARATION_RE.match(statement)
+    if not match:
+        return False
+    # end if
+    attrs = [x.strip().lower() for x in match.group(1).split(',')]
+    if 'pointer' not in attrs:
+        return False
+    # end if
+    entities = re.sub(r"\([^()]*\)", "", match.group(2))
+    entities = [x.split('=')[0].strip().lower() for x in entities.split(',')]
+    return name.lower() in entities
+
+###############################################################################
+class _CommentTreeBuilder(ET.TreeBuilder):
+###############################################################################
+    """An XML tree builder which keeps the comments inside the root element
+    (TreeBuilder's insert_comments argument needs Python 3.8)"""
+
+    def __init__(self):
+        """Initialize the tree builder"""
+        ET.TreeBuilder.__init__(self)
+        self.__depth = 0
+
+    def start(self, tag, attrs):
+        """Open element, <tag>"""
+        self.__depth += 1
+        return ET.TreeBuilder.start(self, tag, attrs)
+
+    def end(self, tag):
+        """Close element, <tag>"""
+        self.__depth -= 1
+        return ET.TreeBuilder.end(self, tag)
+
+    def comment(self, data):
+        """Add a comment element (a tree only has one top-level element)"""
+        if self.__depth > 0:
+            self.start(ET.Comment, {})
+            self.data(data)
+            self.end(ET.Comment)
+        # end if
+
+###############################################################################
+class PointerAdvice:
+###############################################################################
+    """The aliasing evidence and advice for one registry pointer variable"""
+
+    def __init__(self, var, file_name):
+        """Initialize advice for Variable, <var>, from registry file,
+        <file_name>"""
+        self.__var = var
+        self.__file_name = file_name
+        self.__schemes = list()
+        self.__evidence = list()
+
+    def add_scheme(self, metafile, table, arg_name):
+        """Record that CCPP scheme table, <table>, in <metafile> uses this
+        variable as dummy argument, <arg_name>"""
+        self.__schemes.append((metafile, table, arg_name))
+
+    def add_evidence(self, filename, lineno, reason, statement):
+        """Record evidence that this variable is pointer-associated"""
+        self.__evidence.append((filename, lineno, reason, statement))
+
+    def report(self):
+        """Return a text report of the decision and its evidence"""
+        var = self.__var
+        if self.convert:
+            decision = "CONVERT to '{}'".format(_TARGET_ALLOC)
+        else:
+            decision = "KEEP pointer"
+        # end if
+        lines = ["{} ({}) in {}: {}".format(var.local_name,
+                                            var.standard_name,
+                                            self.__file_name, decision)]
+        for metafile, table, arg_name in self.__schemes:
+            lines.append("    used by {} as '{}' ({})".format(table, arg_name,
+                                                             metafile))
+        # end for
+        if not self.__schemes:
+            lines.append("    not used by any scanned CCPP scheme")
+        # end if
+        for filename, lineno, reason, statement in self.__evidence:
+            lines.append("    {}:{}: {}: {}".format(filename, lineno,
+                                                    reason, statement))
+        # end for
+        if not self.__evidence:
+            lines.append("    no pointer association found")
+        # end if
+        return '\n'.join(lines)
+
+    @property
+    def variable(self):
+        """Return the registry Variable for this advice"""
+        return self.__var
+
+    @property
+    def file_name(self):
+        """Return the name of the registry file defining this variable"""
+        return self.__file_name
+
+    @property
+    def schemes(self):
+        """Return a list of (metadata file, table, argument name) tuples
+        for the schemes which use this variable"""
+        return self.__schemes
+
+    @property
+    def evidence(self):
+        """Return a list of (filename, line number, reason, statement)
+        tuples of pointer-association evidence"""
+        return self.__evidence
+
+    @property
+    def convert(self):
+        """Return True if this variable can be declared 'allocatable, target'
+        """
+        return not self.__evidence
+
+###############################################################################
+def find_source_files(scan_dirs):
+###############################################################################
+    """Return sorted lists of the metadata and Fortran source files found
+    under each directory in <scan_dirs>"""
+    meta_files = list()
+    source_files = list()
+    for scan_dir in scan_dirs:
+        if not os.path.isdir(scan_dir):
+            emsg = "Scan directory, '{}', does not exist"
+            raise CCPPError(emsg.format(scan_dir))
+        # end if
+        for root, _, files in os.walk(scan_dir):
+            for fname in files:
+                fpath = os.path.join(root, fname)
+                if fname.endswith('.meta'):
+                    meta_files.append(fpath)
+                elif fname.endswith(_FORTRAN_SUFFIXES):
+                    source_files.append(fpath)
+                # end if
+            # end for
+        # end for
+    # end for
+    return sorted(meta_files), sorted(source_files)
+
+###############################################################################
+def advise_pointers(files, scan_dirs, logger):
+###############################################################################
+    """Return a list of PointerAdvice objects, one for each pointer
+    variable in <files> (a list of registry File objects), using the CCPP
+    metadata and Fortran source files found under <scan_dirs>.
+    Generated registry files (e.g., <file name>.F90) are not scanned.
+    Only module variables are advised, DDT members are skipped."""
+    advice = list()
+    by_std_name = dict()
+    for file_ in files:
+        for var in file_.var_dict.variable_list():
+            if var.allocatable == "pointer":
+                padv = PointerAdvice(var, file_.name)
+                advice.append(padv)
+                by_std_name[var.standard_name.lower()] = padv
+            # end if
+        # end for
+    # end for
+    meta_files, source_files = find_source_files(scan_dirs)
+    generated = set([f.name.lower() for f in files])
+    # Scheme dummy argument names for each table (subroutine)
+    scheme_args = dict()
+    for metafile in meta_files:
+        if os.path.splitext(os.path.basename(metafile))[0].lower() in generated:
+            continue
+        # end if
+        logger.debug("Scanning metadata file, {}".format(metafile))
+        for table, args in read_scheme_metadata(metafile).items():
+            for std_name, arg_name in args.items():
+                if std_name in by_std_name:
+                    by_std_name[std_name].add_scheme(metafile, table, arg_name)
+                    scheme_args.setdefault(table, dict())[arg_name] = \
+                        by_std_name[std_name]
+                # end if
+            # end for
+        # end for
+    # end for
+    # Registry (host) references, by local name
+    host_patterns = list()
+    for padv in advice:
+        for reason, pattern in _pointer_patterns(padv.variable.local_name):
+            host_patterns.append((padv, reason, pattern))
+        # end for
+    # end for
+    for source in source_files:
+        if os.path.splitext(os.path.basename(source))[0].lower() in generated:
+            continue
+        # end if
+        logger.debug("Scanning source file, {}".format(source))
+        subroutine = None
+        dummy_patterns = list()
+        for lineno, statement in read_fortran_statements(source):
+            if _END_SUBROUTINE_RE.match(statement):
+                subroutine = None
+                dummy_patterns = list()
+                continue
+            # end if
+            match = _SUBROUTINE_RE.match(statement)
+            if match:
+                subroutine = match.group(1).lower()
+                dummy_patterns = list()
+                for arg_name, padv in scheme_args.get(subroutine,
+                                                      dict()).items():
+                    for reason, pattern in _pointer_patterns(arg_name):
+                        dummy_patterns.append((padv, arg_name,
+                                               reason, pattern))
+                    # end for
+                # end for
+                continue
+            # end if
+            for padv, reason, pattern in host_patterns:
+                if pattern.search(statement):
+                    padv.add_evidence(source, lineno, reason, statement)
+                # end if
+            # end for
+            if subroutine in scheme_args:
+                for arg_name, padv in scheme_args[subroutine].items():
+                    if _declares_pointer(statement, arg_name):
+                        reason = "pointer dummy argument in {}"
+                        padv.add_evidence(source, lineno,
+                                          reason.format(subroutine),
+                                          statement)
+                    # end if
+                # end for
+                for padv, arg_name, reason, pattern in dummy_patterns:
+                    if pattern.search(statement):
+                        reason = "{} of {} in {}".format(reason, arg_name,
+                                                         subroutine)
+                        padv.add_evidence(source, lineno, reason, statement)
+                    # end if
+                # end for
+            # end if
+        # end for
+    # end for
+    return advice
+
+###############################################################################
+def rewrite_registry(registry_file, advice, outfile, logger):
+###############################################################################
+    """Write a copy of <registry_file> to <outfile> where each convertible
+    variable in <advice> is declared 'allocatable, target'.
+    Variables in included registry fragments are not converted.
+    Neither are variables which are a DDT member for any dycore (the
+    advice is only for one dycore, the registry is for all of them).
+    Return the number of variables converted."""
+    convert = dict()
+    for padv in advice:
+        if padv.convert:
+            convert.setdefault(padv.file_name, set()).add(
+                padv.variable.standard_name)
+        # end if
+    # end for
+    parser = ET.XMLParser(target=_CommentTreeBuilder())
+    tree = ET.parse(registry_file, parser=parser)
+    num_converted = 0
+    for file_node in tree.getroot():
+        std_names = convert.get(file_node.get('name'), set())
+        ddt_members = set([x.text.strip() for x in file_node.iter('data')
+                           if x.text])
+        for var_node in file_node:
+            if ((var_node.tag in ('variable', 'array')) and
+                    (var_node.get('standard_name') in std_names)):
+                if var_node.get('standard_name') in ddt_members:
+                    lmsg = "Not converting {}, it is a DDT member"
+                    logger.info(lmsg.format(var_node.get('local_name')))
+                    continue
+                # end if
+                var_node.set('allocatable', _TARGET_ALLOC)
+                for init in var_node.findall('initial_value'):
+                    if init.text and (init.text.strip() == _POINTER_INIT):
+                        var_node.remove(init)
+                    # end if
+                # end for
+                num_converted += 1
+            # end if
+        # end for
+    # end for
+    logger.info("Writing converted registry file, {}".format(outfile))
+    tree.write(outfile, encoding="UTF-8", xml_declaration=True)
+    return num_converted
+
+###############################################################################
+def parse_command_line(args, description):
+###############################################################################
+    """Parse and return the command line arguments when
+    this module is executed"""
+    parser = argparse.ArgumentParser(description=description,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument("registry_file",
+                        metavar='<registry XML filename>',
+                        type=str, help="XML file with CAM registry library")
+    parser.add_argument("scan_dirs", metavar='<scan directory>', nargs='+',
+                        type=str,
+                        help=("Directories to search for CCPP scheme "
+                              "metadata and\nFortran source files"))
+    parser.add_argument("--dycore", type=str, required=True,
+                        metavar='DYCORE (required)',
+                        help="Dycore (EUL, FV, FV3, MPAS, SE, none)")
+    parser.add_argument("--config", type=str, default="",
+                        help=("Comma-separated config items "
+                              "(e.g., gravity_waves=True)"))
+    parser.add_argument("--rewrite", type=str, default=None,
+                        metavar='<registry XML filename>',
+                        help=("Write a copy of the registry with convertible "
+                              "pointer\nvariables declared "
+                              "'allocatable, target'"))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--debug", action='store_true',
+                       help='Increase logging', default=False)
+    group.add_argument("--quiet", action='store_true',
+                       help='Disable logging except for errors', default=False)
+    pargs = parser.parse_args(args)
+    return pargs
+
+def main():
+    """Function to execute when module called as a script"""
+    args = parse_command_line(sys.argv[1:], __doc__)
+    if args.debug:
+        loglevel = logging.DEBUG
+    elif args.quiet:
+        loglevel = logging.ERROR
+    else:
+        loglevel = logging.INFO
+    # end if
+    logger = init_log(os.path.basename(__file__), loglevel)
+    _, registry = read_xml_file(args.registry_file)
+    registry, _ = include_fragments(registry, args.registry_file, logger)
+    files = parse_registry(registry, args.dycore.lower(),
+                           parse_config(args.config), logger)
+    advice = advise_pointers(files, args.scan_dirs, logger)
+    for padv in advice:
+        print(padv.report())
+    # end for
+    if args.rewrite:
+        num_converted = rewrite_registry(args.registry_file, advice,
+                                         args.rewrite, logger)
+        logger.info("Converted {} of {} pointer variables".format(
+            num_converted, len(advice)))
+    # end if
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    __RETCODE = main()
+    sys.exit(__RETCODE)
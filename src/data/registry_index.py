@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+
+"""
+Searchable index of the variables in CAM registry files.
+
+The index is a local SQLite database holding, for each registry file
+(and any registry fragments it includes):
+  - every module variable, DDT member and array element, with its
+    local name, standard name, units, type, kind, dimensions, dycore
+    filter (DDT members only) and initial condition file input names,
+  - the dimensions of each of these, one row per dimension name,
+  - the DDTs defined in each registry file.
+The index is built from the same File, VarDict and DDT objects used to
+generate the registry source code. A registry is only parsed again when
+its contents, or the contents of one of its fragments, have changed.
+
+Usage:
+  registry_index.py update <registry XML file> [<registry XML file> ...]
+  registry_index.py remove <registry XML file> [<registry XML file> ...]
+  registry_index.py find [--standard-name NAME] [--local-name NAME]
+                         [--dimension NAME] [--module NAME] [--json]
+
+The index is kept in registry_index.db in the current directory unless
+--db or $CAM_REGISTRY_INDEX is given.
+"""
+
+# Python library imports
+import argparse
+import json
+import logging
+import os
+import os.path
+import sqlite3
+import sys
+from collections import OrderedDict
+
+# CAM registry imports (also sets up the ccpp-framework scripts path)
+# pylint: disable=wrong-import-position
+from generate_registry_data import parse_registry, include_fragments
+from generate_registry_data import file_sha256, parse_tools
+# pylint: enable=wrong-import-position
+
+# Environment variable used to override the default index path
+INDEX_ENV = "CAM_REGISTRY_INDEX"
+# Increment when the tables change, an older index is rebuilt
+_SCHEMA_VERSION = 1
+_TABLES = ('inputs', 'files', 'ddts', 'variables', 'dimensions')
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inputs (
+    registry TEXT NOT NULL,
+    path TEXT NOT NULL,
+    stamp TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (registry, path));
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    registry TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    type TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS ddts (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    type TEXT NOT NULL COLLATE NOCASE,
+    extends TEXT,
+    private INTEGER NOT NULL,
+    bindc INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS variables (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    container TEXT NOT NULL COLLATE NOCASE,
+    category TEXT NOT NULL,
+    local_name TEXT NOT NULL COLLATE NOCASE,
+    standard_name TEXT NOT NULL COLLATE NOCASE,
+    long_name TEXT NOT NULL,
+    units TEXT NOT NULL,
+    type TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    allocatable TEXT NOT NULL,
+    access TEXT NOT NULL,
+    dimensions TEXT NOT NULL,
+    dycores TEXT NOT NULL,
+    ic_names TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS dimensions (
+    variable_id INTEGER NOT NULL REFERENCES variables(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS files_registry ON files(registry);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS ddts_file ON ddts(file_id);
+CREATE INDEX IF NOT EXISTS variables_file ON variables(file_id);
+CREATE INDEX IF NOT EXISTS variables_standard_name ON variables(standard_name);
+CREATE INDEX IF NOT EXISTS variables_local_name ON variables(local_name);
+CREATE INDEX IF NOT EXISTS dimensions_variable ON dimensions(variable_id, name);
+CREATE INDEX IF NOT EXISTS dimensions_name ON dimensions(name, variable_id);
+"""
+# Columns returned by RegistryIndex.find
+_FIND_COLUMNS = ('registry', 'module', 'container', 'category', 'local_name',
+                 'standard_name', 'long_name', 'units', 'type', 'kind',
+                 'allocatable', 'access', 'dimensions', 'dycores',
+                 'ic_names')
+# Columns holding lists (stored as separated strings)
+_LIST_COLUMNS = {'dimensions' : ' ', 'dycores' : ',', 'ic_names' : ' '}
+
+###############################################################################
+def default_index_path():
+###############################################################################
+    """Return the index path to use when none is given"""
+    return os.environ.get(INDEX_ENV) or os.path.join(os.getcwd(),
+                                                     "registry_index.db")
+
+###############################################################################
+def _file_stamp(path):
+###############################################################################
+    """Return a string which changes when <path> is modified"""
+    fstat = os.stat(path)
+    return "{!r}:{}".format(fstat.st_mtime, fstat.st_size)
+
+###############################################################################
+class RegistryIndex:
+###############################################################################
+    """SQLite index of registry variables (see the module documentation)"""
+
+    def __init__(self, db_path, logger=None):
+        """Open (or create) the index at <db_path>"""
+        self.__logger = logger or logging.getLogger(__name__)
+        self.__conn = sqlite3.connect(db_path)
+        self.__conn.execute("PRAGMA foreign_keys = ON")
+        version = self.__conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != _SCHEMA_VERSION:
+            # Out of date (or new) index, start over
+            with self.__conn:
+                for table in reversed(_TABLES):
+                    self.__conn.execute("DROP TABLE IF EXISTS {}".format(table))
+                # end for
+            # end with
+        # end if
+        self.__conn.executescript(_SCHEMA)
+        self.__conn.execute("PRAGMA user_version = {}".format(_SCHEMA_VERSION))
+
+    def close(self):
+        """Close the index database"""
+        self.__conn.close()
+
+    def __enter__(self):
+        """Use the index as a context manager (closed on exit)"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the index"""
+        self.close()
+
+    def registries(self):
+        """Return a sorted list of the registry files in the index"""
+        rows = self.__conn.execute("SELECT DISTINCT registry FROM inputs "
+                                   "ORDER BY registry")
+        return [x[0] for x in rows]
+
+    def up_to_date(self, registry_file):
+        """Return True if <registry_file> and the fragments it included
+        are unchanged since it was indexed"""
+        rows = self.__conn.execute("SELECT path, stamp, sha256 FROM inputs "
+                                   "WHERE registry = ?",
+                                   (os.path.abspath(registry_file),))
+        rows = rows.fetchall()
+        if not rows:
+            return False
+        # end if
+        for path, stamp, sha256 in rows:
+            try:
+                new_stamp = _file_stamp(path)
+            except OSError:
+                return False
+            # end try
+            if new_stamp != stamp:
+                if file_sha256(path) != sha256:
+                    return False
+                # end if
+                # Touched but unchanged, remember the new stamp
+                with self.__conn:
+                    self.__conn.execute("UPDATE inputs SET stamp = ? WHERE "
+                                        "registry = ? AND path = ?",
+                                        (new_stamp,
+                                         os.path.abspath(registry_file), path))
+                # end with
+            # end if
+        # end for
+        return True
+
+    def update(self, registry_files, force=False):
+        """Index each file in <registry_files> which is new or has changed
+        (every file if <force> is True).
+        Return the list of registry files which were indexed."""
+        indexed = list()
+        for registry_file in registry_files:
+            registry_file = os.path.abspath(registry_file)
+            if (not force) and self.up_to_date(registry_file):
+                self.__logger.debug("%s is up to date", registry_file)
+                continue
+            # end if
+            self.__logger.info("Indexing %s", registry_file)
+            _, registry = parse_tools.read_xml_file(registry_file)
+            registry, fragments = include_fragments(registry, registry_file,
+                                                    self.__logger)
+            # Index the members for every dycore
+            files = parse_registry(registry, None, {}, self.__logger)
+            with self.__conn:
+                self.__remove(registry_file)
+                for path in [registry_file] + fragments:
+                    self.__conn.execute("INSERT INTO inputs VALUES "
+                                        "(?, ?, ?, ?)",
+                                        (registry_file, path,
+                                         _file_stamp(path),
+                                         file_sha256(path)))
+                # end for
+                for file_ in files:
+                    self.__add_file(registry_file, file_)
+                # end for
+            # end with
+            indexed.append(registry_file)
+        # end for
+        return indexed
+
+    def remove(self, registry_file):
+        """Remove <registry_file> from the index"""
+        with self.__conn:
+            self.__remove(os.path.abspath(registry_file))
+        # end with
+
+    def __remove(self, registry_file):
+        """Remove the rows for <registry_file> (in the current transaction)"""
+        self.__conn.execute("DELETE FROM inputs WHERE registry = ?",
+                            (registry_file,))
+        self.__conn.execute("DELETE FROM files WHERE registry = ?",
+                            (registry_file,))
+
+    def __add_file(self, registry_file, file_):
+        """Add the variables and DDTs of <file_> (a registry File)"""
+        cursor = self.__conn.execute("INSERT INTO files (registry, name, "
+                                     "type) VALUES (?, ?, ?)",
+                                     (registry_file, file_.name,
+                                      file_.file_type))
+        file_id = cursor.lastrowid
+        for var in file_.var_dict.variable_list():
+            self.__add_variable(file_id, file_.name, 'variable', var)
+        # end for
+        for ddt in file_.ddts:
+            extends = ddt.extends.type_type if ddt.extends else None
+            self.__conn.execute("INSERT INTO ddts VALUES (?, ?, ?, ?, ?)",
+                                (file_id, ddt.ddt_type, extends,
+                                 str(ddt.private).lower() in ('true', '1'),
+                                 bool(ddt.bindC)))
+            for var in ddt.members:
+                self.__add_variable(file_id, ddt.ddt_type, 'ddt_member', var,
+                                    dycores=ddt.member_dycores(var))
+            # end for
+        # end for
+
+    def __add_variable(self, file_id, container, category, var, dycores=(),
+                       access=None):
+        """Add <var> (a Variable or ArrayElement) and its array elements"""
+        if access is None:
+            access = var.access
+        # end if
+        row = (file_id, container, category, var.local_name,
+               var.standard_name, var.long_name or '', var.units,
+               var.var_type, var.kind, var.allocatable, access,
+               ' '.join(var.dimensions), ','.join(dycores),
+               ' '.join(var.ic_names or ()))
+        cursor = self.__conn.execute("INSERT INTO variables (file_id, "
+                                     "container, category, local_name, "
+                                     "standard_name, long_name, units, type, "
+                                     "kind, allocatable, access, dimensions, "
+                                     "dycores, ic_names) VALUES "
+                                     "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+                                     "?)", row)
+        var_id = cursor.lastrowid
+        dims = list()
+        for position, dim in enumerate(var.dimensions):
+            for name in [x.strip() for x in dim.split(':') if x.strip()]:
+                dims.append((var_id, position, name))
+            # end for
+        # end for
+        self.__conn.executemany("INSERT INTO dimensions VALUES (?, ?, ?)",
+                                dims)
+        for element in getattr(var, 'elements', ()):
+            self.__add_variable(file_id, container, 'array_element', element,
+                                dycores=dycores, access=access)
+        # end for
+
+    def find(self, standard_name=None, local_name=None, dimension=None,
+             module=None):
+        """Return a list of the indexed variables matching every given
+        (case-insensitive) <standard_name>, <local_name>, <dimension>
+        (standard name) and <module>.
+        Each entry is an OrderedDict keyed by the column names in
+        _FIND_COLUMNS. The dimensions, dycores and ic_names entries are
+        lists."""
+        query = ("SELECT f.registry, f.name, v.container, v.category, "
+                 "v.local_name, v.standard_name, v.long_name, v.units, "
+                 "v.type, v.kind, v.allocatable, v.access, v.dimensions, "
+                 "v.dycores, v.ic_names FROM variables v "
+                 "JOIN files f ON v.file_id = f.id")
+        terms = list()
+        args = list()
+        if standard_name:
+            terms.append("v.standard_name = ?")
+            args.append(standard_name)
+        # end if
+        if local_name:
+            terms.append("v.local_name = ?")
+            args.append(local_name)
+        # end if
+        if dimension:
+            terms.append("EXISTS (SELECT 1 FROM dimensions d WHERE "
+                         "d.variable_id = v.id AND d.name = ?)")
+            args.append(dimension)
+        # end if
+        if module:
+            terms.append("f.name = ?")
+            args.append(module)
+        # end if
+        if terms:
+            query += " WHERE " + " AND ".join(terms)
+        # end if
+        query += " ORDER BY v.id"
+        results = list()
+        for row in self.__conn.execute(query, args):
+            entry = OrderedDict(zip(_FIND_COLUMNS, row))
+            for column, sep in _LIST_COLUMNS.items():
+                entry[column] = [x for x in entry[column].split(sep) if x]
+            # end for
+            results.append(entry)
+        # end for
+        return results
+
+###############################################################################
+def parse_command_line(args, description):
+###############################################################################
+    """Parse and return the command line arguments when
+    this module is executed"""
+    parser = argparse.ArgumentParser(description=description,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--db", type=str, default=None,
+                        help=("Index database (default ${} or "
+                              "registry_index.db)").format(INDEX_ENV))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--debug", action='store_true',
+                       help='Increase logging', default=False)
+    group.add_argument("--quiet", action='store_true',
+                       help='Disable logging except for errors', default=False)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    update = subparsers.add_parser('update',
+                                   help="Index new or changed registries")
+    update.add_argument("registry_files", metavar='<registry XML filename>',
+                        nargs='+', type=str)
+    update.add_argument("--force", action='store_true', default=False,
+                        help="Index registries even if they are unchanged")
+    remove = subparsers.add_parser('remove',
+                                   help="Remove registries from the index")
+    remove.add_argument("registry_files", metavar='<registry XML filename>',
+                        nargs='+', type=str)
+    find = subparsers.add_parser('find', help="Search the index")
+    find.add_argument("--standard-name", type=str, default=None)
+    find.add_argument("--local-name", type=str, default=None)
+    find.add_argument("--dimension", type=str, default=None,
+                      help="Dimension standard name")
+    find.add_argument("--module", type=str, default=None)
+    find.add_argument("--json", action='store_true', default=False,
+                      help="Print the matches as JSON")
+    pargs = parser.parse_args(args)
+    return pargs
+
+def main():
+    """Function to execute when module called as a script"""
+    args = parse_command_line(sys.argv[1:], __doc__)
+    if args.debug:
+        loglevel = logging.DEBUG
+    elif args.quiet:
+        loglevel = logging.ERROR
+    else:
+        loglevel = logging.INFO
+    # end if
+    logger = parse_tools.init_log(os.path.basename(__file__), loglevel)
+    with RegistryIndex(args.db or default_index_path(), logger) as index:
+        if args.command == 'update':
+            indexed = index.update(args.registry_files, force=args.force)
+            logger.info("Indexed %d of %d registries", len(indexed),
+                        len(args.registry_files))
+        elif args.command == 'remove':
+            for registry_file in args.registry_files:
+                index.remove(registry_file)
+            # end for
+        else:
+            matches = index.find(standard_name=args.standard_name,
+                                 local_name=args.local_name,
+                                 dimension=args.dimension,
+                                 module=args.module)
+            if args.json:
+                print(json.dumps(matches, indent=2))
+            else:
+                for entry in matches:
+                    print("{}: {} ({}) in {} [{}]{}".format(
+                        entry['standard_name'], entry['local_name'],
+                        entry['category'], entry['container'],
+                        ', '.join(entry['dimensions']),
+                        (" dycores={}".format(','.join(entry['dycores']))
+                         if entry['dycores'] else "")))
+                # end for
+            # end if
+        # end if
+    # end with
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    __RETCODE = main()
+    sys.exit(__RETCODE)
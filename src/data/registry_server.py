@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+"""
+Long-running CAM registry generation server and its client.
+
+The server keeps the registry schema validation results, the parsed
+registries and the generated files in memory (see RegistryCache in
+generate_registry_data.py) and regenerates only when an input file
+changes. It listens on a local (Unix domain) socket for one JSON request
+per connection and writes the same files gen_registry would.
+
+Usage:
+  registry_server.py start [--socket <path>]  # Run the server
+  registry_server.py stop [--socket <path>]   # Stop a running server
+  registry_server.py status [--socket <path>] # Report server cache stats
+  registry_server.py generate <generate_registry_data.py arguments>
+
+The generate command uses a running server if there is one, otherwise it
+generates the registry files in this process.
+The server and its client require Python 3.
+"""
+
+# Python library imports
+import argparse
+import builtins
+import json
+import os
+import os.path
+import socket
+import socketserver
+import sys
+import tempfile
+
+# Environment variable used to override the default socket path
+SOCKET_ENV = "CAM_REGISTRY_SOCKET"
+# Arguments accepted by gen_registry which may be sent to the server
+_GEN_ARGS = ('registry_file', 'dycore', 'config', 'outdir', 'indent',
+             'loglevel', 'schema_paths', 'error_on_no_validate', 'snapshot',
+             'c_bindings', 'depfile', 'depfile_format', 'stream',
+             'catalog')
+# Arguments which are paths, made absolute before sending to the server
+_PATH_ARGS = ('registry_file', 'outdir', 'depfile')
+# Seconds to wait for the server to answer a generate request before
+# generating in this process instead
+REQUEST_TIMEOUT = 300
+# Seconds to wait for the server to answer a stop or status request
+_CONTROL_TIMEOUT = 5
+
+###############################################################################
+def default_socket_path():
+###############################################################################
+    """Return the socket path to use when none is given"""
+    spath = os.environ.get(SOCKET_ENV)
+    if not spath:
+        spath = os.path.join(tempfile.gettempdir(),
+                             "cam_registry_{}.sock".format(os.getuid()))
+    # end if
+    return spath
+
+###############################################################################
+def _send_request(request, socket_path, timeout=None):
+###############################################################################
+    """Send <request> (a dictionary) to the server at <socket_path> and
+    return its (dictionary) response.
+    Raise OSError if there is no server listening on <socket_path>."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        data = b''
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            # end if
+            data += chunk
+        # end while
+    # end with
+    return json.loads(data.decode('utf-8'))
+
+###############################################################################
+class _RegistryRequestHandler(socketserver.StreamRequestHandler):
+###############################################################################
+    """Handle one JSON request to the registry server"""
+
+    def handle(self):
+        """Read a request, run it, and write the JSON response"""
+        # pylint: disable=import-outside-toplevel
+        from generate_registry_data import gen_registry, parse_tools
+        # pylint: enable=import-outside-toplevel
+        response = dict()
+        try:
+            request = json.loads(self.rfile.read().decode('utf-8'))
+            command = request.get('command')
+            if command == 'generate':
+                kwargs = dict([(x, y) for x, y in request['args'].items()
+                               if x in _GEN_ARGS])
+                response['retcode'] = gen_registry(logger=self.server.logger,
+                                                   cache=self.server.cache,
+                                                   **kwargs)
+            elif command == 'status':
+                response['stats'] = self.server.cache.stats
+            elif command == 'stop':
+                self.server.stopping = True
+            else:
+                response['error'] = "Unknown command, '{}'".format(command)
+            # end if
+        except parse_tools.CCPPError as ccpperr:
+            response['error'] = str(ccpperr)
+            response['error_type'] = 'CCPPError'
+        except Exception as err: # pylint: disable=broad-except
+            # Report any other failure to the client, keep serving
+            response['error'] = str(err)
+            response['error_type'] = type(err).__name__
+        # end try
+        self.wfile.write(json.dumps(response).encode('utf-8'))
+
+###############################################################################
+class RegistryServer(socketserver.UnixStreamServer):
+###############################################################################
+    """Registry generation server. Requests are handled one at a time
+    so that the shared cache and output directories are never written
+    concurrently."""
+
+    def __init__(self, socket_path, logger):
+        """Create a server listening on <socket_path>"""
+        # pylint: disable=import-outside-toplevel
+        from generate_registry_data import RegistryCache
+        # pylint: enable=import-outside-toplevel
+        if os.path.exists(socket_path):
+            try:
+                _send_request({'command' : 'status'}, socket_path,
+                              timeout=_CONTROL_TIMEOUT)
+                emsg = "A registry server is already running on {}"
+                raise OSError(emsg.format(socket_path))
+            except (ConnectionError, FileNotFoundError):
+                # A stale socket from a server which did not exit cleanly
+                os.remove(socket_path)
+            # end try
+        # end if
+        self.cache = RegistryCache()
+        self.logger = logger
+        self.stopping = False
+        self.socket_path = socket_path
+        # Only this user may send requests, the socket is created (by bind)
+        # without access for anyone else
+        old_umask = os.umask(0o177)
+        try:
+            super(RegistryServer, self).__init__(socket_path,
+                                                 _RegistryRequestHandler)
+        finally:
+            os.umask(old_umask)
+        # end try
+
+    def serve(self):
+        """Handle requests until a stop request is received"""
+        try:
+            while not self.stopping:
+                self.handle_request()
+            # end while
+        finally:
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            # end if
+        # end try
+
+###############################################################################
+def generate(socket_path=None, timeout=REQUEST_TIMEOUT, **kwargs):
+###############################################################################
+    """Generate registry files with the server at <socket_path> (or the
+    default socket path) if it is running, otherwise in this process.
+    If the server does not answer within <timeout> seconds, it may still
+    be writing the files so it is sent a stop request. Once the server
+    answers that (it handles one request at a time), the files are
+    generated in this process. If it does not answer within another
+    <timeout> seconds, raise OSError.
+    <kwargs> are gen_registry arguments; the return value and any
+    CCPPError raised are the same as for gen_registry."""
+    if socket_path is None:
+        socket_path = default_socket_path()
+    # end if
+    args = dict(kwargs)
+    for arg in _PATH_ARGS:
+        if args.get(arg):
+            args[arg] = os.path.abspath(args[arg])
+        # end if
+    # end for
+    if args.get('schema_paths'):
+        args['schema_paths'] = [os.path.abspath(x)
+                                for x in args['schema_paths']]
+    # end if
+    try:
+        response = _send_request({'command' : 'generate', 'args' : args},
+                                 socket_path, timeout=timeout)
+    except (ConnectionError, FileNotFoundError):
+        response = None
+    except socket.timeout:
+        # Do not write the files while the server may still be writing them
+        try:
+            _send_request({'command' : 'stop'}, socket_path, timeout=timeout)
+        except socket.timeout:
+            emsg = ("Registry server on {} did not answer within {} seconds "
+                    "and may still be writing {}")
+            raise OSError(emsg.format(socket_path, timeout, args['outdir']))
+        except (ConnectionError, FileNotFoundError):
+            pass # The server exited, nothing more will be written
+        # end try
+        response = None
+    # end try
+    # pylint: disable=import-outside-toplevel
+    if response is None:
+        # No server, generate in this process
+        from generate_registry_data import gen_registry
+        return gen_registry(**kwargs)
+    # end if
+    if 'error' in response:
+        from generate_registry_data import parse_tools
+        if response.get('error_type') == 'CCPPError':
+            raise parse_tools.CCPPError(response['error'])
+        # end if
+        # Raise built-in exceptions (e.g., FileNotFoundError) as themselves
+        etype = getattr(builtins, response.get('error_type', ''), None)
+        if isinstance(etype, type) and issubclass(etype, Exception):
+            raise etype(response['error'])
+        # end if
+        raise RuntimeError(response['error'])
+    # end if
+    # pylint: enable=import-outside-toplevel
+    return response['retcode']
+
+###############################################################################
+def main():
+###############################################################################
+    """Function to execute when module called as a script"""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("command", choices=['start', 'stop', 'status',
+                                            'generate'],
+                        help="Server command")
+    parser.add_argument("--socket", type=str, default=None,
+                        help=("Server socket path (default ${} or a file in "
+                              "the\ntemporary directory)").format(SOCKET_ENV))
+    parser.add_argument("--debug", action='store_true', default=False,
+                        help="Increase server logging")
+    args, gen_args = parser.parse_known_args(sys.argv[1:])
+    socket_path = args.socket or default_socket_path()
+    # pylint: disable=import-outside-toplevel
+    if args.command == 'start':
+        import logging
+        from generate_registry_data import parse_tools
+        loglevel = logging.DEBUG if args.debug else logging.INFO
+        logger = parse_tools.init_log(os.path.basename(__file__), loglevel)
+        server = RegistryServer(socket_path, logger)
+        server.logger.info("Registry server listening on %s", socket_path)
+        server.serve()
+        retcode = 0
+    elif args.command in ('stop', 'status'):
+        try:
+            response = _send_request({'command' : args.command}, socket_path,
+                                     timeout=_CONTROL_TIMEOUT)
+        except (ConnectionError, FileNotFoundError, socket.timeout):
+            print("No registry server running on {}".format(socket_path))
+            return 1
+        # end try
+        if 'stats' in response:
+            print(json.dumps(response['stats'], sort_keys=True))
+        # end if
+        retcode = 0
+    else:
+        import logging
+        from generate_registry_data import parse_command_line
+        gargs = parse_command_line(gen_args, "Generate CAM registry files")
+        if gargs.debug:
+            loglevel = logging.DEBUG
+        elif gargs.quiet:
+            loglevel = logging.ERROR
+        else:
+            loglevel = logging.INFO
+        # end if
+        retcode = generate(socket_path=socket_path,
+                           registry_file=gargs.registry_file,
+                           dycore=gargs.dycore.lower(), config=gargs.config,
+                           outdir=gargs.output_dir or os.getcwd(),
+                           indent=gargs.indent, loglevel=loglevel,
+                           snapshot=gargs.snapshot,
+                           c_bindings=gargs.c_bindings,
+                           depfile=gargs.depfile,
+                           depfile_format=gargs.depfile_format,
+                           stream=gargs.stream, catalog=gargs.catalog)
+    # end if
+    # pylint: enable=import-outside-toplevel
+    return retcode
+
+###############################################################################
+if __name__ == "__main__":
+    __RETCODE = main()
+    sys.exit(__RETCODE)
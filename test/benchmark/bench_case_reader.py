@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Benchmark reading CIME case variables for ConfigCAM
+#
+# Assumptions:
+#
+# Command line arguments: see --help
+#
+# Usage: python bench_case_reader.py         # run the benchmark
+#-----------------------------------------------------------------------
+
+"""Time --steps ConfigCAM constructions (one per simulated buildnml,
+build, or submit step) for a fake case whose get_value walks XML env
+files the way a CIME case does. Compare reading each variable from the
+case every time (the old path) with a shared CamCaseReader and with a
+CamCaseReader seeded from a case variable snapshot."""
+
+import sys
+import os
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+sys.path.append(os.path.join(__CAM_ROOT, "cime_config"))
+
+# pylint: disable=wrong-import-position
+from cam_config import ConfigCAM, CamCaseReader, case_reader
+# pylint: enable=wrong-import-position
+
+# Case variables read by ConfigCAM (see FakeCase in cam_config.py)
+_CASE_VALUES = {"ATM_GRID" : "ne30np4.pg3",
+                "ATM_NX" : 48600,
+                "ATM_NY" : 1,
+                "COMP_OCN" : "socn",
+                "CAM_CONFIG_OPTS" : "--physics-suites adiabatic"}
+
+###############################################################################
+class XmlCase:
+###############################################################################
+    """Fake CIME case whose get_value searches XML env files, which are
+    parsed on every call"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, case_dir, num_files, num_entries):
+        """Write <num_files> env files with <num_entries> entries each,
+        the case variables are in the last file"""
+        self.env_files = list()
+        self.num_lookups = 0
+        for findex in range(num_files):
+            env_file = os.path.join(case_dir, "env_{}.xml".format(findex))
+            root = ET.Element("file", version="2.0")
+            group = ET.SubElement(root, "group", id="run_begin_stop_restart")
+            for eindex in range(num_entries):
+                entry = ET.SubElement(group, "entry",
+                                      id="VAR_{}_{}".format(findex, eindex))
+                entry.set("value", str(eindex))
+            # end for
+            if findex == num_files - 1:
+                for key, value in _CASE_VALUES.items():
+                    ET.SubElement(group, "entry", id=key, value=str(value))
+                # end for
+            # end if
+            ET.ElementTree(root).write(env_file)
+            self.env_files.append(env_file)
+        # end for
+
+    def get_value(self, key):
+        """Return the value of <key> from the env files"""
+        self.num_lookups += 1
+        for env_file in self.env_files:
+            for entry in ET.parse(env_file).getroot().iter("entry"):
+                if entry.get("id") == key:
+                    value = entry.get("value")
+                    if isinstance(_CASE_VALUES[key], int):
+                        value = int(value)
+                    # end if
+                    return value
+                # end if
+            # end for
+        # end for
+        return None
+
+###############################################################################
+def time_steps(xml_case, make_case, steps):
+###############################################################################
+    """Construct ConfigCAM <steps> times, each time with the case returned
+    by <make_case>().
+    Return the elapsed time (seconds) and the number of <xml_case> lookups"""
+    logger = logging.getLogger("bench_case_reader")
+    logger.setLevel(logging.ERROR)
+    xml_case.num_lookups = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        ConfigCAM(make_case(), logger)
+    # end for
+    return time.perf_counter() - start, xml_case.num_lookups
+
+###############################################################################
+def main():
+###############################################################################
+    """Run the benchmark and report the results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=20,
+                        help="Number of ConfigCAM constructions")
+    parser.add_argument("--env-files", type=int, default=8,
+                        help="Number of env XML files in the fake case")
+    parser.add_argument("--entries", type=int, default=200,
+                        help="Number of entries in each env XML file")
+    args = parser.parse_args()
+    case_dir = tempfile.mkdtemp()
+    try:
+        xml_case = XmlCase(case_dir, args.env_files, args.entries)
+        snapshot_file = os.path.join(case_dir, "case_snapshot.json")
+        CamCaseReader(xml_case).save_snapshot(snapshot_file)
+        results = list()
+        # The old path, every variable is read from the case every time
+        results.append(("Case get_value per variable", time_steps(
+            xml_case, lambda: CamCaseReader(xml_case), args.steps)))
+        # Shared reader, every variable is read once
+        results.append(("Shared CamCaseReader", time_steps(
+            xml_case, lambda: case_reader(xml_case), args.steps)))
+        # Reader seeded from a snapshot (e.g., in a new process),
+        # no variables are read
+        results.append(("Snapshot-seeded CamCaseReader", time_steps(
+            xml_case, lambda: CamCaseReader(xml_case,
+                                            snapshot_file=snapshot_file),
+            args.steps)))
+    finally:
+        shutil.rmtree(case_dir)
+    # end try
+    print("{} ConfigCAM constructions, {} env files x {} entries".format(
+        args.steps, args.env_files, args.entries))
+    base_time = results[0][1][0]
+    for name, result in results:
+        elapsed, lookups = result
+        print("{:30s} {:8.3f} s  {:5d} case lookups  {:6.1f}x".format(
+            name, elapsed, lookups, base_time / elapsed))
+    # end for
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Benchmark the startup cost of generate_registry_data.py
+#
+# Assumptions:  The ccpp-framework scripts can be found by
+#               generate_registry_data.py (or are on PYTHONPATH)
+#
+# Command line arguments: see --help
+#
+# Usage: python bench_import_time.py         # run the benchmark
+#-----------------------------------------------------------------------
+
+"""Time importing generate_registry_data, a full registry generation, and
+a no-op regeneration (an up-to-date --depfile run) in fresh interpreters.
+Exit with an error if the no-op regeneration takes longer than
+--max-noop seconds."""
+
+import sys
+import os
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+_REGISTRY_DIR = os.path.join(__CAM_ROOT, "src", "data")
+_GENERATOR = os.path.join(_REGISTRY_DIR, "generate_registry_data.py")
+_SAMPLE_REGISTRY = os.path.join(__TEST_DIR, os.pardir, "unit",
+                                "sample_files", "reg_good_ddt.xml")
+
+###############################################################################
+def time_command(command, repeat, cwd=None):
+###############################################################################
+    """Run <command> <repeat> times and return the best wall clock time
+    in seconds. Raise CalledProcessError if <command> fails."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if (best is None) or (elapsed < best):
+            best = elapsed
+        # end if
+    # end for
+    return best
+
+###############################################################################
+def import_times(module):
+###############################################################################
+    """Return a list of (cumulative microseconds, module) for the ten most
+    expensive imports of <module> as reported by python -X importtime"""
+    command = [sys.executable, "-X", "importtime", "-c",
+               "import {}".format(module)]
+    result = subprocess.run(command, check=True, cwd=_REGISTRY_DIR,
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    times = list()
+    for line in result.stderr.splitlines():
+        fields = [x.strip() for x in line.split('|')]
+        if (len(fields) == 3) and fields[1].isdigit():
+            times.append((int(fields[1]), fields[2].strip()))
+        # end if
+    # end for
+    return sorted(times, reverse=True)[0:10]
+
+###############################################################################
+def main():
+###############################################################################
+    """Run the benchmark and report the results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--registry", type=str, default=_SAMPLE_REGISTRY,
+                        help="Registry XML file to generate")
+    parser.add_argument("--dycore", type=str, default="se",
+                        help="Dycore to generate for")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of runs to time (the best is reported)")
+    parser.add_argument("--max-noop", type=float, default=1.0,
+                        help="Maximum time (seconds) for a no-op regeneration")
+    args = parser.parse_args()
+    outdir = tempfile.mkdtemp()
+    try:
+        generate = [sys.executable, _GENERATOR,
+                    os.path.abspath(args.registry), "--dycore", args.dycore,
+                    "--config", "", "--output-dir", outdir, "--quiet"]
+        noop = generate + ["--depfile", os.path.join(outdir, "registry.d")]
+        import_time = time_command([sys.executable, "-c",
+                                    "import generate_registry_data"],
+                                   args.repeat, cwd=_REGISTRY_DIR)
+        full_time = time_command(generate, args.repeat)
+        # The first depfile run generates, the timed runs are no-ops
+        time_command(noop, 1)
+        noop_time = time_command(noop, args.repeat)
+    finally:
+        shutil.rmtree(outdir)
+    # end try
+    print("Import generate_registry_data:  {:8.3f} s".format(import_time))
+    print("Full registry generation:       {:8.3f} s".format(full_time))
+    print("No-op regeneration (--depfile): {:8.3f} s".format(noop_time))
+    print("Most expensive imports (cumulative us):")
+    for usecs, module in import_times("generate_registry_data"):
+        print("  {:10d}  {}".format(usecs, module))
+    # end for
+    if noop_time > args.max_noop:
+        print("No-op regeneration is slower than {} s".format(args.max_noop))
+        return 1
+    # end if
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    sys.exit(main())
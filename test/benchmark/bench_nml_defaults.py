@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Benchmark resolving CAM namelist defaults
+#
+# Assumptions:
+#
+# Command line arguments: see --help
+#
+# Usage: python bench_nml_defaults.py         # run the benchmark
+#-----------------------------------------------------------------------
+
+"""Time resolving the default value of every variable in ConfigCAM's
+namelist groups, --steps times, from a generated namelist defaults file
+in the CIME entry_id format. Compare scanning every default entry and
+value for every variable (the old path) with the NamelistDefaults
+attribute index."""
+
+import sys
+import os
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+sys.path.append(os.path.join(__CAM_ROOT, "cime_config"))
+
+# pylint: disable=wrong-import-position
+from cam_config import ConfigCAM, NamelistDefaults
+# pylint: enable=wrong-import-position
+
+# Namelist attribute values used in the generated defaults file
+_ATTRIBUTE_VALUES = OrderedDict([
+    ("dyn", ["se", "fv", "fv3", "mpas", "eul", "none"]),
+    ("hgrid", ["ne30np4.pg3", "ne16np4.pg3", "ne120np4.pg3", "0.9x1.25",
+               "1.9x2.5", "C96", "mpasa120", "T42", "null"]),
+    ("nlev", ["26", "30", "32", "58", "93", "null"]),
+    ("ocn", ["docn", "socn", "aquaplanet", "pop", "mom"]),
+    ("pcols", ["8", "16", "32"]),
+    ("physics_suites", ["adiabatic", "kessler", "held_suarez", "cam7"])])
+
+# Case variables for the benchmark configuration
+_CASE_VALUES = {"ATM_GRID" : "ne30pg3z58",
+                "ATM_NX" : 48600,
+                "ATM_NY" : 1,
+                "COMP_OCN" : "docn",
+                "CAM_CONFIG_OPTS" : "--physics-suites cam7"}
+
+###############################################################################
+class DictCase:
+###############################################################################
+    """Fake CIME case with the benchmark case variables"""
+
+    # pylint: disable=too-few-public-methods
+
+    def get_value(self, key):
+        """Return the value of <key>"""
+        return _CASE_VALUES[key]
+
+###############################################################################
+def write_defaults_file(defaults_file, groups, num_vars, max_values):
+###############################################################################
+    """Write a namelist defaults file with <num_vars> variables in each of
+    <groups>. Each variable has a default value and up to <max_values>
+    values for random combinations of one to four namelist attributes."""
+    rng = random.Random(42)
+    root = ET.Element("entry_id", version="2.0")
+    for group in groups:
+        for vindex in range(num_vars):
+            entry = ET.SubElement(root, "entry",
+                                  id="{}_var{}".format(group[:-3], vindex))
+            ET.SubElement(entry, "type").text = "char*256"
+            ET.SubElement(entry, "group").text = group
+            values = ET.SubElement(entry, "values")
+            ET.SubElement(values, "value").text = "default"
+            for xindex in range(rng.randint(0, max_values)):
+                attrs = rng.sample(list(_ATTRIBUTE_VALUES), rng.randint(1, 4))
+                value = ET.SubElement(values, "value")
+                for attr in attrs:
+                    value.set(attr, rng.choice(_ATTRIBUTE_VALUES[attr]))
+                # end for
+                value.text = "value_{}".format(xindex)
+            # end for
+        # end for
+    # end for
+    ET.ElementTree(root).write(defaults_file)
+
+###############################################################################
+def scan_defaults(root, groups, attributes):
+###############################################################################
+    """Return the default values of the variables in <groups> by checking
+    every entry and value in <root> (the old path)"""
+    values = OrderedDict()
+    for group in groups:
+        values[group] = OrderedDict()
+        names = [x.get("id") for x in root.iter("entry")
+                 if x.findtext("group") == group]
+        for name in names:
+            best = None
+            for entry in root.iter("entry"):
+                if entry.get("id") != name:
+                    continue
+                # end if
+                for value in entry.iter("value"):
+                    if all(attributes.get(x) == y
+                           for x, y in value.attrib.items()):
+                        if (best is None) or (len(value.attrib) >
+                                              len(best.attrib)):
+                            best = value
+                        # end if
+                    # end if
+                # end for
+            # end for
+            if best is not None:
+                values[group][name] = (best.text or "").strip()
+            # end if
+        # end for
+    # end for
+    return values
+
+###############################################################################
+def main():
+###############################################################################
+    """Run the benchmark and report the results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=20,
+                        help="Number of times to resolve the defaults")
+    parser.add_argument("--variables", type=int, default=150,
+                        help="Number of variables in each namelist group")
+    parser.add_argument("--values", type=int, default=12,
+                        help="Maximum number of attribute values per variable")
+    args = parser.parse_args()
+    logger = logging.getLogger("bench_nml_defaults")
+    logger.setLevel(logging.ERROR)
+    config = ConfigCAM(DictCase(), logger)
+    attributes = config.nml_attributes()
+    defaults_dir = tempfile.mkdtemp()
+    try:
+        defaults_file = os.path.join(defaults_dir, "namelist_defaults.xml")
+        write_defaults_file(defaults_file, config.nml_groups, args.variables,
+                            args.values)
+        root = ET.parse(defaults_file).getroot()
+        # The old path, every entry is checked for every variable
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            scanned = scan_defaults(root, config.nml_groups, attributes)
+        # end for
+        scan_time = time.perf_counter() - start
+        # The attribute index (built once)
+        start = time.perf_counter()
+        defaults = NamelistDefaults(defaults_file)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            indexed = defaults.group_values(config.nml_groups, attributes)
+        # end for
+        index_time = time.perf_counter() - start
+    finally:
+        shutil.rmtree(defaults_dir)
+    # end try
+    if indexed != scanned:
+        print("ERROR: Indexed defaults do not match scanned defaults")
+        return 1
+    # end if
+    num_vars = sum(len(x) for x in indexed.values())
+    print("{} resolutions of {} variables, up to {} values each".format(
+        args.steps, num_vars, args.values + 1))
+    print("{:30s} {:8.3f} s".format("Scan every entry", scan_time))
+    print("{:30s} {:8.3f} s  {:6.1f}x  (index built in {:.3f} s)".format(
+        "NamelistDefaults index", index_time, scan_time / index_time,
+        build_time))
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    sys.exit(main())
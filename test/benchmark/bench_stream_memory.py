@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Benchmark the peak memory of reading a very large registry
+#
+# Assumptions:  The ccpp-framework scripts can be found by
+#               generate_registry_data.py (or are on PYTHONPATH)
+#
+# Command line arguments: see --help
+#
+# Usage: python bench_stream_memory.py         # run the benchmark
+#-----------------------------------------------------------------------
+
+"""Compare the peak (traced) memory and run time of building registry File
+objects from a complete XML tree (read_xml_file + parse_registry) and from
+iterparse events (stream_registry) for a generated registry with
+--num-vars variables. Also report the memory held by the resulting File
+objects, per 100k variables."""
+
+import sys
+import os
+import argparse
+import gc
+import logging
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+sys.path.append(os.path.join(__CAM_ROOT, "src", "data"))
+
+# pylint: disable=wrong-import-position
+from generate_registry_data import parse_registry, stream_registry
+from generate_registry_data import parse_tools
+# pylint: enable=wrong-import-position
+
+###############################################################################
+def write_registry(filename, num_vars, num_members):
+###############################################################################
+    """Write a registry file, <filename>, with one module holding
+    <num_vars> variables and a DDT with <num_members> of them"""
+    with open(filename, "w") as outfile:
+        outfile.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        outfile.write('<registry name="bench_registry" version="1.0">\n')
+        outfile.write('  <file name="bench_types" type="module">\n')
+        outfile.write('    <use module="ccpp_kinds" reference="kind_phys"/>\n')
+        outfile.write('    <variable local_name="ncol" '
+                      'standard_name="horizontal_dimension" units="count" '
+                      'type="integer" access="protected">\n'
+                      '      <initial_value>0</initial_value>\n'
+                      '    </variable>\n')
+        for index in range(num_vars):
+            outfile.write(
+                '    <variable local_name="field_{0:06d}" '
+                'standard_name="benchmark_field_{0:06d}" units="K" '
+                'type="real" kind="kind_phys" allocatable="allocatable">\n'
+                '      <long_name>Benchmark field number {0}</long_name>\n'
+                '      <dimensions>horizontal_dimension</dimensions>\n'
+                '      <ic_file_input_names>fld{0:06d}</ic_file_input_names>\n'
+                '    </variable>\n'.format(index))
+        # end for
+        outfile.write('    <ddt type="bench_state">\n')
+        for index in range(min(num_members, num_vars)):
+            outfile.write('      <data>benchmark_field_{:06d}</data>\n'.format(
+                index))
+        # end for
+        outfile.write('    </ddt>\n')
+        outfile.write('  </file>\n')
+        outfile.write('</registry>\n')
+    # end with
+
+###############################################################################
+def measure(func, *args):
+###############################################################################
+    """Call <func> with <args> and return the peak traced memory (bytes),
+    the traced memory still held by its result (bytes), and the run time
+    (seconds) of the call"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained, elapsed
+
+###############################################################################
+def tree_path(registry_file, dycore, logger):
+###############################################################################
+    """Build File objects from the complete registry XML tree"""
+    _, registry = parse_tools.read_xml_file(registry_file)
+    return parse_registry(registry, dycore, {}, logger)
+
+###############################################################################
+def stream_path(registry_file, dycore, logger):
+###############################################################################
+    """Build File objects from iterparse events"""
+    files, _ = stream_registry(registry_file, dycore, {}, logger)
+    return files
+
+###############################################################################
+def main():
+###############################################################################
+    """Run the benchmark and report the results"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num-vars", type=int, default=20000,
+                        help="Number of variables in the generated registry")
+    parser.add_argument("--num-members", type=int, default=1000,
+                        help="Number of variables in the generated DDT")
+    parser.add_argument("--dycore", type=str, default="se",
+                        help="Dycore to parse for")
+    args = parser.parse_args()
+    logger = logging.getLogger("bench_stream_memory")
+    logger.setLevel(logging.ERROR)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        registry_file = os.path.join(tmpdir, "bench_registry.xml")
+        write_registry(registry_file, args.num_vars, args.num_members)
+        fsize = os.path.getsize(registry_file)
+        # Make sure the lazy ccpp-framework imports are not measured
+        tree_path(registry_file, args.dycore, logger)
+        tree_peak, _, tree_time = measure(tree_path, registry_file,
+                                          args.dycore, logger)
+        stream_peak, retained, stream_time = measure(stream_path,
+                                                     registry_file,
+                                                     args.dycore, logger)
+    finally:
+        shutil.rmtree(tmpdir)
+    # end try
+    mbyte = 1024.0 * 1024.0
+    print("Registry: {} variables, {:.1f} MB".format(args.num_vars,
+                                                    fsize / mbyte))
+    print("XML tree (read_xml_file + parse_registry): "
+          "{:8.1f} MB peak, {:6.2f} s".format(tree_peak / mbyte, tree_time))
+    print("Streaming (stream_registry):               "
+          "{:8.1f} MB peak, {:6.2f} s".format(stream_peak / mbyte,
+                                              stream_time))
+    print("Peak memory ratio (stream / tree): {:.2f}".format(
+        float(stream_peak) / float(tree_peak)))
+    print("Registry objects: {:8.1f} MB, {:8.1f} MB per 100k variables".format(
+        retained / mbyte, retained * 100000.0 / (mbyte * args.num_vars)))
+    return 0
+
+###############################################################################
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,7 +20,10 @@ which will currently run 19 tests, all of which should pass.
 import logging
 import os
 import os.path
+import shutil
 import sys
+import tempfile
+import xml.etree.ElementTree as ET
 
 #Python unit-testing library:
 import unittest
@@ -35,7 +38,8 @@ sys.path.append(CAM_CONF_DIR)
 
 #Import CAM configure objects:
 # pylint: disable=wrong-import-position
-from cam_config import ConfigCAM
+from cam_config import ConfigCAM, CamCaseReader, case_reader
+from cam_config import ConfigEnsemble, scheme_nml_index
 from cam_config import CamConfigTypeError, CamConfigValError
 # pylint: enable=wrong-import-position
 
@@ -258,6 +262,505 @@ class CamConfigTestRoutine(unittest.TestCase):
             #Check that error message matches what's expected:
             self.assertEqual(ermsg, str(typerr.exception))
 
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that the pcols planner recommends a valid value
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_set_pcols_check(self):
+
+        """
+        Check that Config_CAM.set_pcols sets pcols to the planner's
+        recommendation for a finite-volume grid
+        """
+
+        #Create fake case with a 1.9x2.5 (144 x 96) FV grid:
+        fcase = FakeCase()
+        fcase.conf_opts["ATM_GRID"] = "1.9x2.5"
+        fcase.conf_opts["ATM_NX"] = 144
+        fcase.conf_opts["ATM_NY"] = 96
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites adiabatic_suite"
+        fv_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+
+        #Plan for 32 tasks with 4 threads each (432 columns per task):
+        plan = fv_config.plan_pcols(32, 4)
+        self.assertEqual([x.pcols for x in plan][-1], 256)
+        best = fv_config.set_pcols(32, 4)
+
+        #Check that pcols was set and every thread has a chunk:
+        self.assertEqual(fv_config.get_value("pcols"), best.pcols)
+        self.assertTrue(best.fits_cache)
+        self.assertGreaterEqual(best.chunks_per_task, 4)
+        self.assertLessEqual(best.load_imbalance,
+                             min([x.load_imbalance for x in plan]) + 0.05)
+
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that the grid catalog sets the grid information
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_grid_catalog_check(self):
+
+        """
+        Check that Config_CAM uses the grid catalog to translate grid
+        aliases and to find the dycore, column count, and levels
+        """
+
+        #Create fake case with the ne30pg3 grid and 58 levels:
+        fcase = FakeCase()
+        fcase.conf_opts["ATM_GRID"] = "ne30pg3z58"
+        fcase.conf_opts["ATM_NX"] = 48600
+        fcase.conf_opts["ATM_NY"] = 1
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites adiabatic_suite"
+        se_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+
+        #Check the grid-derived values:
+        self.assertEqual(se_config.get_value("dyn"), "se")
+        self.assertEqual(se_config.get_value("hgrid"), "ne30np4.pg3")
+        self.assertEqual(se_config.get_value("nlev"), "58")
+        self.assertEqual(se_config.grid.pg, "pg3")
+        self.assertEqual(se_config.num_columns(), 48600)
+
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check grid names with a suffix after the grid size
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_grid_suffix_check(self):
+
+        """
+        Check that Config_CAM accepts FV3 and SE grid names which do not
+        fully parse, and takes their column count from the case
+        """
+
+        for grid, dyn, ncols in (("C96.mg17", "fv3", 55296),
+                                 ("ne30np4_mg17", "se", 48602)):
+            #Create fake case with the grid:
+            fcase = FakeCase()
+            fcase.conf_opts["ATM_GRID"] = grid
+            fcase.conf_opts["ATM_NX"] = ncols
+            fcase.conf_opts["ATM_NY"] = 1
+            fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites adiabatic_suite"
+            test_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+
+            #Check the grid-derived values:
+            self.assertEqual(test_config.get_value("dyn"), dyn)
+            self.assertIsNone(test_config.grid.ncols)
+            self.assertEqual(test_config.num_columns(), ncols)
+
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that the case reader memoizes and snapshots values
+    #+++++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_case_reader_check(self):
+
+        """
+        Check that CamCaseReader reads each case variable once, that
+        it is shared by ConfigCAM objects for the same case, and that
+        it can be seeded from a snapshot file
+        """
+
+        #Create fake case and its (shared) reader:
+        fcase = FakeCase()
+        reader = case_reader(fcase)
+        self.assertIs(case_reader(fcase), reader)
+        self.assertEqual(reader.num_reads, 5)
+
+        #Create two CAM configure objects, no more case reads are needed:
+        ConfigCAM(reader, logging.getLogger("cam_config"))
+        ConfigCAM(reader, logging.getLogger("cam_config"))
+        self.assertEqual(reader.num_reads, 5)
+
+        #A plain case is read fresh, so case changes are seen:
+        fcase.conf_opts["COMP_OCN"] = "docn"
+        fcase.conf_opts["ATM_GRID"] = "ne30pg3"
+        fcase.conf_opts["ATM_NX"] = 48600
+        fcase.conf_opts["ATM_NY"] = 1
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites adiabatic_suite"
+        fresh_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+        self.assertEqual(fresh_config.get_value("ocn"), "docn")
+        self.assertEqual(fresh_config.get_value("hgrid"), "ne30np4.pg3")
+
+        #The shared reader keeps its values until invalidated:
+        shared_config = ConfigCAM(reader, logging.getLogger("cam_config"))
+        self.assertEqual(shared_config.get_value("ocn"), "socn")
+        reader.invalidate()
+        shared_config = ConfigCAM(reader, logging.getLogger("cam_config"))
+        self.assertEqual(shared_config.get_value("ocn"), "docn")
+        self.assertEqual(shared_config.get_value("hgrid"), "ne30np4.pg3")
+        self.assertEqual(reader.num_reads, 10)
+
+        #Save the snapshot and seed a reader without a case:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            snapshot_file = os.path.join(tmp_dir, "case_snapshot.json")
+            reader.save_snapshot(snapshot_file)
+            seeded = CamCaseReader(None, snapshot_file=snapshot_file)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        #Check that the seeded reader works with ConfigCAM:
+        self.assertEqual(seeded.values, reader.values)
+        seeded_config = ConfigCAM(seeded, logging.getLogger("cam_config"))
+        self.assertEqual(seeded_config.get_value("hgrid"), "ne30np4.pg3")
+        self.assertEqual(seeded.num_reads, 0)
+
+    #+++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that a configure snapshot can be saved and reloaded
+    #+++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_snapshot_check(self):
+
+        """
+        Check that a ConfigCAM snapshot reloads the same configuration
+        when the input fingerprint matches, and is rejected otherwise
+        """
+
+        #Save the test configuration and reload it:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            snapshot_file = os.path.join(tmp_dir, "config_snapshot.json")
+            self.test_config_cam.save_snapshot(snapshot_file)
+            fingerprint = self.test_config_cam.input_fingerprint
+            loaded = ConfigCAM.load_snapshot(snapshot_file,
+                                             input_fingerprint=fingerprint)
+            stale = ConfigCAM.load_snapshot(snapshot_file,
+                                            input_fingerprint="0"*64)
+            missing = ConfigCAM.load_snapshot(os.path.join(tmp_dir, "none"),
+                                              fingerprint)
+
+            #Load the snapshot for a case, then change the case:
+            fcase = FakeCase()
+            for_case = ConfigCAM.load_snapshot_for_case(fcase, snapshot_file)
+            fcase.conf_opts["COMP_OCN"] = "docn"
+            changed = ConfigCAM.load_snapshot_for_case(fcase, snapshot_file)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        #Check that every configure object was restored:
+        self.assertIsNone(stale)
+        self.assertIsNone(missing)
+        self.assertIsNone(changed)
+        self.assertEqual(for_case.input_fingerprint, fingerprint)
+        self.assertEqual(loaded.input_fingerprint, fingerprint)
+        self.assertEqual(loaded.nml_groups, self.test_config_cam.nml_groups)
+        self.assertEqual(list(loaded.config_dict),
+                         list(self.test_config_cam.config_dict))
+        for name, obj in self.test_config_cam.config_dict.items():
+            lobj = loaded.config_dict[name]
+            self.assertEqual(lobj.value, obj.value)
+            self.assertEqual(lobj.desc, obj.desc)
+            self.assertEqual(lobj.is_nml_attr, obj.is_nml_attr)
+            if hasattr(obj.valid_vals, "pattern"):
+                self.assertEqual(lobj.valid_vals.pattern,
+                                 obj.valid_vals.pattern)
+            else:
+                self.assertEqual(lobj.valid_vals, obj.valid_vals)
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that fingerprint changes invalidate the right stages
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_fingerprint_check(self):
+
+        """
+        Check that build-related changes invalidate every build stage
+        while namelist-only changes only invalidate the namelist stage
+        """
+
+        #Save the current fingerprints:
+        fcase = FakeCase()
+        test_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+        old_fingerprints = test_config.fingerprints()
+        self.assertEqual(test_config.invalidated_stages(old_fingerprints), [])
+        self.assertEqual(test_config.invalidated_stages(None),
+                         ["registry", "compile", "namelist"])
+
+        #Change a namelist-only option:
+        test_config.set_value("ocn", "docn")
+        self.assertEqual(test_config.build_fingerprint(),
+                         old_fingerprints["build"])
+        self.assertEqual(test_config.invalidated_stages(old_fingerprints),
+                         ["namelist"])
+
+        #Change a build option:
+        test_config.set_value("pcols", 32)
+        self.assertEqual(test_config.invalidated_stages(old_fingerprints),
+                         ["registry", "compile", "namelist"])
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that registry generation runs in-process and is cached
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_generate_registry_check(self):
+
+        """
+        Check that "generate_registry" writes the registry files, that
+        a repeated call reuses the parsed and rendered registry, and
+        that dimensions are only fixed on request
+        """
+
+        #Import the registry generator (only needed for this test):
+        sys.path.append(os.path.join(CAM_ROOT_DIR, "src", "data"))
+        # pylint: disable=import-outside-toplevel
+        from generate_registry_data import RegistryCache
+        # pylint: enable=import-outside-toplevel
+
+        #Set output location:
+        cache = RegistryCache()
+        logger = logging.getLogger("cam_config")
+        tmp_dir = tempfile.mkdtemp()
+        out_source = os.path.join(tmp_dir, "physics_types_simple.F90")
+        try:
+            #Add an allocatable horizontal variable to the simple registry:
+            reg_file = os.path.join(tmp_dir, "reg_alloc.xml")
+            tree = ET.parse(os.path.join(CURRDIR, "sample_files",
+                                         "reg_good_simple.xml"))
+            new_var = ET.SubElement(tree.getroot().find("file"), "variable",
+                                    local_name="u", standard_name="east_wind",
+                                    units="m s-1", type="real",
+                                    kind="kind_phys",
+                                    allocatable="allocatable")
+            ET.SubElement(new_var, "dimensions").text = "horizontal_dimension"
+            tree.write(reg_file)
+
+            #Generate the registry twice:
+            for _ in range(2):
+                self.test_config_cam.generate_registry(reg_file, tmp_dir, 2,
+                                                       logger, cache=cache)
+                with open(out_source, "r") as infile:
+                    source = infile.read()
+                os.remove(out_source)
+            stats = cache.stats
+
+            #Generate the registry with fixed dimensions:
+            self.test_config_cam.generate_registry(reg_file, tmp_dir, 2,
+                                                   logger, cache=cache,
+                                                   fixed_dimensions=True)
+            with open(out_source, "r") as infile:
+                fixed_source = infile.read()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        #The second call uses the cached registry and outputs:
+        self.assertEqual(stats['registries'], 1)
+        self.assertEqual(stats['outputs'], 1)
+
+        #Dimensions are only fixed when requested:
+        self.assertIn(":: u(:)", source)
+        self.assertNotIn(":: u(:)", fixed_source)
+        self.assertIn("horizontal_dimension = 16", fixed_source)
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check namelist default matching on namelist attributes
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_namelist_defaults_check(self):
+
+        """
+        Check that "namelist_defaults" picks the matching default
+        value with the most attributes for each namelist variable
+        """
+
+        #Set the namelist defaults file:
+        defaults_file = os.path.join(CURRDIR, "sample_files",
+                                     "namelist_defaults_cam.xml")
+
+        #Check the defaults for the null grid:
+        defaults = self.test_config_cam.namelist_defaults(defaults_file)
+        self.assertEqual(list(defaults), self.test_config_cam.nml_groups)
+        self.assertEqual(dict(defaults["cam_initfiles_nl"]),
+                         {"ncdata" : "atm/cam/inic/cam_initial.nc",
+                          "use_topo_file" : ".false."})
+        self.assertEqual(dict(defaults["phys_ctl_nl"]),
+                         {"print_energy_errors" : ".false."})
+
+        #Check the defaults for an SE grid with 58 levels:
+        fcase = FakeCase()
+        fcase.conf_opts["ATM_GRID"] = "ne30pg3z58"
+        fcase.conf_opts["ATM_NX"] = 48600
+        fcase.conf_opts["ATM_NY"] = 1
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites kessler"
+        se_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+        defaults = se_config.namelist_defaults(defaults_file)
+        self.assertEqual(dict(defaults["cam_initfiles_nl"]),
+                         {"ncdata" : "atm/cam/inic/se/cam_initial_ne30pg3_L58.nc",
+                          "use_topo_file" : ".true."})
+        self.assertEqual(dict(defaults["phys_ctl_nl"]),
+                         {"print_energy_errors" : ".true."})
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that physics suites are resolved and cached
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_physics_suites_check(self):
+
+        """
+        Check that "resolve_physics_suites" finds each suite's groups,
+        schemes, and namelist groups, and that the parsed suite
+        definition is shared
+        """
+
+        #Create fake case with the sample suite:
+        fcase = FakeCase()
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "-dyn none --physics-suites sample"
+        suite_dirs = [os.path.join(CURRDIR, "sample_files")]
+        test_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+        self.assertIsNone(test_config.suites)
+
+        #Resolve the suites:
+        suites = test_config.resolve_physics_suites(suite_dirs)
+        suite = suites["sample"]
+        self.assertEqual([x[0] for x in suite.groups],
+                         ["physics_before_coupler", "physics_after_coupler"])
+        self.assertEqual(suite.schemes, ("sample_tend", "sample_update",
+                                         "sample_diagnostics"))
+        self.assertEqual(suite.nml_groups, ("sample_tend_nl", "phys_ctl_nl"))
+        self.assertEqual(test_config.nml_groups,
+                         ['cam_initfiles_nl', 'cam_logfile_nl',
+                          'phys_ctl_nl', 'qneg_nl', 'sample_tend_nl'])
+
+        #A second configuration shares the parsed suite definition:
+        other_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+        other_suite = other_config.resolve_physics_suites(suite_dirs)["sample"]
+        self.assertIs(other_suite.groups, suite.groups)
+
+        #Expect "Cam_config_val_error" for an unknown suite:
+        with self.assertRaises(CamConfigValError):
+            self.test_config_cam.resolve_physics_suites(suite_dirs)
+
+        #The scheme namelist index is built once and is sorted:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for sub in ("b_dir", "a_dir"):
+                os.mkdir(os.path.join(tmp_dir, sub))
+                shutil.copy(os.path.join(suite_dirs[0],
+                                         "sample_tend_namelist.xml"),
+                            os.path.join(tmp_dir, sub))
+            index = scheme_nml_index([tmp_dir])
+            self.assertIs(scheme_nml_index([tmp_dir]), index)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(index["sample_tend_namelist.xml"],
+                         os.path.join(tmp_dir, "a_dir",
+                                      "sample_tend_namelist.xml"))
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that ensemble members are derived from the base
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_ensemble_check(self):
+
+        """
+        Check that ensemble members only change their overridden values,
+        that overridden values are checked, and that members are
+        grouped by build fingerprint
+        """
+
+        #Create the ensemble:
+        ensemble = ConfigEnsemble(self.test_config_cam)
+        mem1 = ensemble.add_member("mem001", {"ocn" : "docn"})
+        mem2 = ensemble.add_member("mem002", {"ocn" : "pop", "pcols" : 8})
+        ensemble.add_member("mem003", {})
+
+        #Check member values:
+        self.assertEqual(mem1.get_value("ocn"), "docn")
+        self.assertEqual(mem1.get_value("pcols"), 16)
+        self.assertEqual(mem2.get_value("pcols"), 8)
+        self.assertEqual(self.test_config_cam.get_value("ocn"), "socn")
+
+        #Members do not share configure objects:
+        mem1.set_value("psubcols", 4)
+        self.assertEqual(self.test_config_cam.get_value("psubcols"), 1)
+        self.assertEqual(ensemble.members["mem003"].get_value("psubcols"), 1)
+
+        #Check build groups:
+        self.assertEqual(list(ensemble.build_groups().values()),
+                         [["mem001"], ["mem002"], ["mem003"]])
+        mem1.set_value("psubcols", 1)
+        self.assertEqual(list(ensemble.build_groups().values()),
+                         [["mem001", "mem003"], ["mem002"]])
+
+        #Expect "Cam_config_val_error" for invalid overrides:
+        with self.assertRaises(CamConfigValError):
+            ensemble.add_member("mem004", {"ocn" : "not_an_ocean"})
+        with self.assertRaises(CamConfigValError):
+            ensemble.add_member("mem005", {"hgrid" : "C96"})
+        with self.assertRaises(CamConfigValError):
+            ensemble.add_member("mem001", {})
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check that the constants files are only rewritten on change
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_write_constants_check(self):
+
+        """
+        Check that "write_constants" writes a Fortran parameter and a
+        CPP macro for each integer configure option, and only rewrites
+        the files when a value changes
+        """
+
+        #Create fake case with an Eulerian grid:
+        fcase = FakeCase()
+        fcase.conf_opts["ATM_GRID"] = "T42z26"
+        fcase.conf_opts["ATM_NX"] = 128
+        fcase.conf_opts["ATM_NY"] = 64
+        fcase.conf_opts["CAM_CONFIG_OPTS"] = "--physics-suites kessler"
+        test_config = ConfigCAM(fcase, logging.getLogger("cam_config"))
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            f90_file = os.path.join(tmp_dir, "cam_config_constants.F90")
+            h_file = os.path.join(tmp_dir, "cam_config_constants.h")
+
+            #Write the files twice, the second time nothing changes:
+            self.assertEqual(test_config.write_constants(tmp_dir),
+                             [f90_file, h_file])
+            self.assertEqual(test_config.write_constants(tmp_dir), [])
+            with open(f90_file, "r") as infile:
+                f90_contents = infile.read()
+            with open(h_file, "r") as infile:
+                h_contents = infile.read()
+
+            #Change a value:
+            test_config.set_value("pcols", 8)
+            self.assertEqual(test_config.write_constants(tmp_dir),
+                             [f90_file, h_file])
+
+            #Changing any compiled-in constant invalidates the build:
+            old_fingerprints = test_config.fingerprints()
+            test_config.set_value("trm", 42)
+            self.assertEqual(test_config.write_constants(tmp_dir),
+                             [f90_file, h_file])
+            self.assertEqual(test_config.invalidated_stages(old_fingerprints),
+                             ["registry", "compile", "namelist"])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        #Check the constants:
+        self.assertIn("integer, public, parameter :: config_nlev     = 26",
+                      f90_contents)
+        self.assertIn("integer, public, parameter :: config_trk      = 1",
+                      f90_contents)
+        self.assertIn("#define PLEV 26\n", h_contents)
+        self.assertIn("#define PCOLS 16\n", h_contents)
+        self.assertIn("#define PLAT 64\n", h_contents)
+        self.assertIn("#define PLON 128\n", h_contents)
+        self.assertNotIn("NLAT", h_contents)
+
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+    #Check pcols planner error-handling for an unknown grid
+    #++++++++++++++++++++++++++++++++++++++++++++++++++++
+
+    def test_config_plan_pcols_null_grid_check(self):
+
+        """
+        Check that "plan_pcols" throws the proper error when the
+        number of columns is not known
+        """
+
+        #Expect "Cam_config_val_error":
+        with self.assertRaises(CamConfigValError):
+            #Plan with the null ("-dyn none") grid:
+            self.test_config_cam.plan_pcols(4, 2)
 
 #################################################
 #Run unit tests if this script is called directly
@@ -0,0 +1,145 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Contains unit tests for the CAM registry pointer advisor
+#
+# Assumptions:
+#
+# Command line arguments: none
+#
+# Usage: python test_pointer_advisor.py         # run the unit tests
+#-----------------------------------------------------------------------
+
+"""Test advise_pointers and rewrite_registry in pointer_advisor.py"""
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+import xml.etree.ElementTree as ET
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+__REGISTRY_DIR = os.path.join(__CAM_ROOT, "src", "data")
+_SAMPLE_FILES_DIR = os.path.join(__TEST_DIR, "sample_files")
+
+if not os.path.exists(__REGISTRY_DIR):
+    raise ImportError("Cannot find registry directory")
+
+if not os.path.exists(_SAMPLE_FILES_DIR):
+    raise ImportError("Cannot find sample files directory")
+
+sys.path.append(__REGISTRY_DIR)
+
+# pylint: disable=wrong-import-position
+from generate_registry_data import parse_registry
+from pointer_advisor import advise_pointers, rewrite_registry
+# pylint: enable=wrong-import-position
+
+_SCHEME_META = """[ccpp-table-properties]
+  name = lat_scheme
+  type = scheme
+[ccpp-arg-table]
+  name = lat_scheme_run
+  type = scheme
+[ lat ]
+  standard_name = latitude
+  units = radians
+  type = real | kind = kind_phys
+  dimensions = (horizontal_dimension)
+  intent = in
+[ lon ]
+  standard_name = longitude
+  units = radians
+  type = real | kind = kind_phys
+  dimensions = (horizontal_dimension)
+  intent = in
+"""
+
+_SCHEME_SOURCE = """module lat_scheme
+contains
+  subroutine lat_scheme_run(lat, lon)
+    real(kind_phys), intent(in), pointer :: lat(:) ! Needs a pointer
+    real(kind_phys), intent(in)          :: lon(:)
+  end subroutine lat_scheme_run
+end module lat_scheme
+"""
+
+class PointerAdvisorTest(unittest.TestCase):
+
+    """Tests for `advise_pointers` and `rewrite_registry`."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Write the test scheme files to a temporary directory"""
+        cls.scheme_dir = tempfile.mkdtemp()
+        with open(os.path.join(cls.scheme_dir, "lat_scheme.meta"),
+                  "w") as mfile:
+            mfile.write(_SCHEME_META)
+        # End with
+        with open(os.path.join(cls.scheme_dir, "lat_scheme.F90"),
+                  "w") as sfile:
+            sfile.write(_SCHEME_SOURCE)
+        # End with
+        super(cls, PointerAdvisorTest).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the temporary scheme directory"""
+        shutil.rmtree(cls.scheme_dir)
+        super(cls, PointerAdvisorTest).tearDownClass()
+
+    def test_pointer_advice(self):
+        """Test that a pointer variable passed to a pointer dummy argument
+        is kept as a pointer while an unaliased pointer variable is
+        converted in the rewritten registry"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_simple.xml")
+        out_file = os.path.join(self.scheme_dir, "reg_advised.xml")
+        logger = logging.getLogger("test_pointer_advisor")
+        registry = ET.parse(filename).getroot()
+        # Run test
+        files = parse_registry(registry, 'fv', {}, logger)
+        advice = advise_pointers(files, [self.scheme_dir], logger)
+        decisions = dict([(x.variable.local_name, x) for x in advice])
+        self.assertEqual(sorted(decisions.keys()), ['latitude', 'longitude'])
+        self.assertFalse(decisions['latitude'].convert)
+        self.assertEqual(decisions['latitude'].evidence[0][1], 4)
+        self.assertIn("pointer dummy argument in lat_scheme_run",
+                      decisions['latitude'].report())
+        self.assertTrue(decisions['longitude'].convert)
+        self.assertEqual(decisions['longitude'].schemes[0][1:],
+                         ('lat_scheme_run', 'lon'))
+        num_converted = rewrite_registry(filename, advice, out_file, logger)
+        self.assertEqual(num_converted, 1)
+        allocs = dict([(x.get('local_name'), x.get('allocatable'))
+                       for x in ET.parse(out_file).getroot().iter('variable')])
+        self.assertEqual(allocs['latitude'], 'pointer')
+        self.assertEqual(allocs['longitude'], 'allocatable, target')
+
+    def test_ddt_members(self):
+        """Test that DDT members are not advised and that a variable which
+        is a DDT member for any dycore is not converted in the rewritten
+        registry"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_file = os.path.join(self.scheme_dir, "reg_advised_ddt.xml")
+        logger = logging.getLogger("test_pointer_advisor")
+        registry = ET.parse(filename).getroot()
+        # Run test (latitude is a physics_state member for SE)
+        files = parse_registry(registry, 'se', {}, logger)
+        advice = advise_pointers(files, [self.scheme_dir], logger)
+        self.assertEqual([x.variable.local_name for x in advice],
+                         ['longitude'])
+        self.assertTrue(advice[0].convert)
+        # longitude is a physics_state member for FV so it is not converted
+        num_converted = rewrite_registry(filename, advice, out_file, logger)
+        self.assertEqual(num_converted, 0)
+        allocs = dict([(x.get('local_name'), x.get('allocatable'))
+                       for x in ET.parse(out_file).getroot().iter('variable')])
+        self.assertEqual(allocs['latitude'], 'pointer')
+        self.assertEqual(allocs['longitude'], 'pointer')
+
+if __name__ == '__main__':
+    unittest.main()
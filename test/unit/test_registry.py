@@ -15,6 +15,8 @@
 import sys
 import os
 import glob
+import shutil
+import tempfile
 import unittest
 import filecmp
 import logging
@@ -43,7 +45,10 @@ if not os.path.exists(_SAMPLE_FILES_DIR):
 sys.path.append(__REGISTRY_DIR)
 
 # pylint: disable=wrong-import-position
-from generate_registry_data import gen_registry
+from generate_registry_data import gen_registry, load_metadata_sidecar
+from generate_registry_data import RegistryCache, render_registry
+from generate_registry_data import catalog_hash, parse_command_line
+from parse_tools import CCPPError
 # pylint: enable=wrong-import-position
 
 ###############################################################################
@@ -250,6 +255,604 @@ class RegistryTest(unittest.TestCase):
         self.assertTrue(filecmp.cmp(in_source, out_source, shallow=False),
                         msg=amsg)
 
+    def test_snapshot_reader(self):
+        """Test that the snapshot option writes a Fortran snapshot module
+        and a Python reader.
+        Check that the reader maps a synthetic snapshot file and returns
+        arrays with the shape and values that were written"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        out_name = "physics_types_ddt2_snapshot"
+        out_source = os.path.join(_TMP_DIR, out_name + '.F90')
+        out_reader = os.path.join(_TMP_DIR, out_name + '.py')
+        snap_file = os.path.join(_TMP_DIR, "ddt2_snapshot.bin")
+        remove_files([out_source, out_reader, snap_file])
+        # Run test
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, snapshot=True)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        # Make sure each output file was created
+        amsg = "{} does not exist".format(out_source)
+        self.assertTrue(os.path.exists(out_source), msg=amsg)
+        amsg = "{} does not exist".format(out_reader)
+        self.assertTrue(os.path.exists(out_reader), msg=amsg)
+        with open(out_source, "r") as source:
+            self.assertIn("subroutine write_physics_types_ddt2_snapshot",
+                          source.read())
+        # End with
+        try:
+            import numpy as np # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise unittest.SkipTest("numpy is required to test the reader")
+        # End try
+        import importlib.util # pylint: disable=import-outside-toplevel
+        spec = importlib.util.spec_from_file_location(out_name, out_reader)
+        reader = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(reader)
+        # Write a synthetic snapshot file in native byte order
+        dim_sizes = {'horizontal_dimension' : 4,
+                     'vertical_layer_dimension' : 3}
+        type_map = {'r' : np.float64, 'i' : np.int32}
+        header = [b'CAMSNAP1', np.int32(1).tobytes(),
+                  np.int32(len(reader.FIELDS)).tobytes()]
+        data = list()
+        expected = dict()
+        for index, field in enumerate(reader.FIELDS):
+            std_name, _, tcode, _, dims = field
+            shape = tuple(dim_sizes[x] for x in dims)
+            fdata = np.arange(index, index + int(np.prod(shape)),
+                              dtype=type_map[tcode]).reshape(shape,
+                                                             order='F')
+            expected[std_name] = fdata
+            header.append(np.int32(len(std_name)).tobytes())
+            header.append(std_name.encode('ascii') + tcode.encode('ascii'))
+            header.append(np.array([fdata.itemsize, len(dims)],
+                                   dtype=np.int32).tobytes())
+            header.append(np.array(shape, dtype=np.int64).tobytes())
+            data.append(fdata.tobytes(order='F'))
+        # End for
+        with open(snap_file, 'wb') as sfile:
+            sfile.write(b''.join(header + data))
+        # End with
+        fields = reader.read_snapshot(snap_file)
+        self.assertEqual(list(fields.keys()),
+                         [x[0] for x in reader.FIELDS])
+        self.assertIn('eastward_wind', fields)
+        self.assertEqual(fields['eastward_wind'].shape, (4, 3))
+        for std_name, fdata in expected.items():
+            self.assertEqual(fields[std_name].dtype, fdata.dtype)
+            self.assertTrue(np.array_equal(fields[std_name], fdata),
+                            msg="Bad snapshot data for {}".format(std_name))
+        # End for
+
+    def test_c_bindings(self):
+        """Test that the C bindings option writes bind(C) accessors,
+        a C header, and a Python ctypes module.
+        Check that the bind(C) DDT is mirrored with the correct members"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        out_name = "physics_types_ddt2_c_binding"
+        out_source = os.path.join(_TMP_DIR, out_name + '.F90')
+        out_header = os.path.join(_TMP_DIR, out_name + '.h')
+        out_module = os.path.join(_TMP_DIR, out_name + '.py')
+        remove_files([out_source, out_header, out_module])
+        # Run test
+        retcode = gen_registry(filename, 'se', {'kind_phys' : 'r8'}, _TMP_DIR,
+                               2, loglevel=logging.ERROR,
+                               error_on_no_validate=True, c_bindings=True)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        # Make sure each output file was created
+        for out_file in [out_source, out_header, out_module]:
+            amsg = "{} does not exist".format(out_file)
+            self.assertTrue(os.path.exists(out_file), msg=amsg)
+        # End for
+        with open(out_source, "r") as source:
+            self.assertIn('bind(C, name="physics_types_ddt2_phys_state_wind_u")',
+                          source.read())
+        # End with
+        with open(out_header, "r") as header:
+            htext = header.read()
+        # End with
+        self.assertIn("  int ncol; /* horizontal_dimension */\n", htext)
+        self.assertIn("} physics_base;\n", htext)
+        self.assertIn("double *physics_types_ddt2_phys_state_latitude("
+                      "int64_t dims[1]);", htext)
+        try:
+            import numpy # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError:
+            raise unittest.SkipTest("numpy is required to import the module")
+        # End try
+        import ctypes # pylint: disable=import-outside-toplevel
+        import importlib.util # pylint: disable=import-outside-toplevel
+        spec = importlib.util.spec_from_file_location(out_name, out_module)
+        binding = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(binding)
+        self.assertEqual(binding.physics_base._fields_,
+                         [('ncol', ctypes.c_int), ('pver', ctypes.c_int)])
+        self.assertEqual(list(binding.FIELDS.keys()),
+                         ['latitude', 'longitude',
+                          'eastward_wind', 'northward_wind'])
+        self.assertEqual(binding.FIELDS['eastward_wind'][4],
+                         ('horizontal_dimension', 'vertical_layer_dimension'))
+
+    def test_c_bindings_kind_phys(self):
+        """Test that the C type of kind_phys fields comes from the
+        kind_phys config item and that C bindings for kind_phys fields
+        are refused when it is not set"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        out_name = "physics_types_ddt2_c_binding"
+        out_header = os.path.join(_TMP_DIR, out_name + '.h')
+        remove_files([out_header])
+        # Run test with a single precision kind_phys
+        retcode = gen_registry(filename, 'se', "kind_phys=r4", _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, c_bindings=True)
+        self.assertEqual(retcode, 0)
+        with open(out_header, "r") as header:
+            htext = header.read()
+        # End with
+        self.assertIn("float *physics_types_ddt2_phys_state_latitude("
+                      "int64_t dims[1]);", htext)
+        # Run test without kind_phys
+        with self.assertRaises(CCPPError) as context:
+            gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                         loglevel=logging.ERROR,
+                         error_on_no_validate=True, c_bindings=True)
+        # End with
+        self.assertIn("the kind_phys config item must be one of r4, r8",
+                      str(context.exception))
+        # The command line refuses --c-bindings without kind_phys
+        args = [filename, "--dycore", "se", "--c-bindings"]
+        pargs = parse_command_line(args + ["--config", "kind_phys=r8"],
+                                   "test")
+        self.assertTrue(pargs.c_bindings)
+        save_stderr = sys.stderr
+        try:
+            sys.stderr = open(os.devnull, "w")
+            with self.assertRaises(SystemExit):
+                parse_command_line(args + ["--config", "pcols=16"], "test")
+            # End with
+        finally:
+            sys.stderr.close()
+            sys.stderr = save_stderr
+        # End try
+
+    def test_fixed_dimensions(self):
+        """Test a registry with an allocatable variable and a config which
+        fixes the horizontal dimension.
+        Check that the variable is declared with a fixed shape and that
+        pointer variables are unchanged"""
+        # Setup test
+        infilename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_simple.xml")
+        filename = os.path.join(_TMP_DIR, "reg_fixed_dims.xml")
+        out_source_name = "physics_types_fixed_dims"
+        out_source = os.path.join(_TMP_DIR, out_source_name + '.F90')
+        out_meta = os.path.join(_TMP_DIR, out_source_name + '.meta')
+        remove_files([out_source, out_meta])
+        tree, root = read_xml_file(infilename)
+        # Change output filename and add an allocatable variable
+        for obj in root:
+            oname = obj.get('name')
+            if (obj.tag == 'file') and (oname == 'physics_types_simple'):
+                # Reset the filename
+                obj.set('name', out_source_name)
+                # Add a new allocatable variable
+                new_var = ET.SubElement(obj, "variable")
+                new_var.set("local_name", "u")
+                new_var.set("standard_name", "east_wind")
+                new_var.set("units", "m s-1")
+                new_var.set("type", "real")
+                new_var.set("kind", "kind_phys")
+                new_var.set("allocatable", "allocatable, target")
+                dims_elem = ET.SubElement(new_var, "dimensions")
+                dims_elem.text = 'horizontal_dimension'
+                break
+            # End if
+        # End for
+        tree.write(filename)
+        # Run test
+        retcode = gen_registry(filename, 'eul', "pcols=16", _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        with open(out_source, "r") as source:
+            stext = source.read()
+        # End with
+        self.assertIn("integer, private, parameter :: "
+                      "fixed_horizontal_dimension = 16", stext)
+        self.assertIn(":: u(fixed_horizontal_dimension)", stext)
+        self.assertIn(":: latitude(:) => NULL()", stext)
+        self.assertNotIn("allocate(u", stext)
+
+    def test_fixed_dimensions_ddt(self):
+        """Test a registry with allocatable DDT members and a config which
+        fixes the horizontal and vertical dimensions.
+        Check that the DDT members are declared with a fixed shape and
+        are not allocated"""
+        # Setup test
+        infilename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        filename = os.path.join(_TMP_DIR, "reg_fixed_dims_ddt.xml")
+        out_source_name = "physics_types_fixed_dims_ddt"
+        out_source = os.path.join(_TMP_DIR, out_source_name + '.F90')
+        out_meta = os.path.join(_TMP_DIR, out_source_name + '.meta')
+        remove_files([out_source, out_meta])
+        tree, root = read_xml_file(infilename)
+        # Change output filename and make the DDT members allocatable
+        for obj in root:
+            if obj.tag == 'file':
+                obj.set('name', out_source_name)
+                for var in obj.iter('variable'):
+                    if var.get('allocatable') == 'pointer':
+                        var.set('allocatable', 'allocatable')
+                    # End if
+                # End for
+            # End if
+        # End for
+        tree.write(filename)
+        # Run test
+        retcode = gen_registry(filename, 'se', "pcols=16,nlev=30", _TMP_DIR,
+                               2, loglevel=logging.ERROR,
+                               error_on_no_validate=True)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        with open(out_source, "r") as source:
+            stext = source.read()
+        # End with
+        self.assertIn("integer, private, parameter :: "
+                      "fixed_vertical_layer_dimension = 30", stext)
+        self.assertIn(":: u(fixed_horizontal_dimension, "
+                      "fixed_vertical_layer_dimension)", stext)
+        self.assertIn(":: latitude(fixed_horizontal_dimension)", stext)
+        self.assertNotIn("allocate(phys_state%latitude", stext)
+        self.assertNotIn("allocate(phys_state%wind%u", stext)
+
+    def test_metadata_sidecar(self):
+        """Test that the JSON metadata sidecar matches the metadata file
+        and is rejected once the metadata file changes"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_meta = os.path.join(_TMP_DIR, "physics_types_ddt.meta")
+        out_sidecar = out_meta + '.json'
+        remove_files([out_meta, out_sidecar])
+        # Run test
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        amsg = "{} does not exist".format(out_sidecar)
+        self.assertTrue(os.path.exists(out_sidecar), msg=amsg)
+        tables = load_metadata_sidecar(out_meta)
+        self.assertEqual([(x['name'], x['type']) for x in tables],
+                         [('physics_state', 'ddt'),
+                          ('physics_types_ddt', 'module')])
+        self.assertEqual([x['local_name'] for x in tables[0]['variables']],
+                         ['ncol', 'latitude'])
+        latitude = tables[0]['variables'][1]
+        self.assertEqual(latitude['standard_name'], 'latitude')
+        self.assertEqual(latitude['kind'], 'kind_phys')
+        self.assertEqual(latitude['dimensions'], ['horizontal_dimension'])
+        self.assertTrue(latitude['protected'])
+        # A modified metadata file must not use the sidecar
+        with open(out_meta, "a") as meta:
+            meta.write("\n")
+        # End with
+        self.assertIsNone(load_metadata_sidecar(out_meta))
+
+    def test_depfile(self):
+        """Test that the dependency file lists the registry and schema as
+        inputs of every generated file and the generated module order"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_name = "physics_types_ddt"
+        out_source = os.path.join(_TMP_DIR, out_name + '.F90')
+        out_meta = os.path.join(_TMP_DIR, out_name + '.meta')
+        out_snap = os.path.join(_TMP_DIR, out_name + '_snapshot.F90')
+        depfile = os.path.join(_TMP_DIR, out_name + '.d')
+        remove_files([depfile])
+        # Run test
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, snapshot=True,
+                               depfile=depfile)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        amsg = "{} does not exist".format(depfile)
+        self.assertTrue(os.path.exists(depfile), msg=amsg)
+        with open(depfile, "r") as deps:
+            rules = deps.read().split('\n\n')
+        # End with
+        targets, inputs = rules[0].split(': ', 1)
+        for out_file in [out_meta, out_meta + '.json', out_source, out_snap]:
+            self.assertIn(out_file, targets.split())
+        # End for
+        self.assertIn(os.path.abspath(filename), inputs)
+        self.assertIn("registry_v1_0.xsd", inputs)
+        self.assertIn("generate_registry_data.py", inputs)
+        mod_rule = "{name}.o {name}.mod: {src} ccpp_kinds.mod".format(
+            name=out_name, src=out_source)
+        self.assertTrue(rules[1].startswith(mod_rule), msg=rules[1])
+        snap_rule = "{name}_snapshot.o {name}_snapshot.mod: {src} {name}.mod"
+        self.assertTrue(rules[2].startswith(snap_rule.format(name=out_name,
+                                                             src=out_snap)),
+                        msg=rules[2])
+
+    def test_registry_cache(self):
+        """Test that gen_registry with a RegistryCache writes the same files
+        from the cache and regenerates when the registry changes"""
+        # Setup test
+        infilename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_simple.xml")
+        filename = os.path.join(_TMP_DIR, "reg_cache.xml")
+        out_source_name = "physics_types_simple"
+        in_source = os.path.join(_SAMPLE_FILES_DIR, out_source_name + '.F90')
+        in_meta = os.path.join(_SAMPLE_FILES_DIR, out_source_name + '.meta')
+        out_source = os.path.join(_TMP_DIR, out_source_name + '.F90')
+        out_meta = os.path.join(_TMP_DIR, out_source_name + '.meta')
+        tree, _ = read_xml_file(infilename)
+        tree.write(filename)
+        cache = RegistryCache()
+        # Run test
+        for run in range(2):
+            remove_files([out_source, out_meta])
+            retcode = gen_registry(filename, 'fv', {}, _TMP_DIR, 2,
+                                   loglevel=logging.ERROR,
+                                   error_on_no_validate=True, cache=cache)
+            self.assertEqual(retcode, 0)
+            amsg = "{} does not match {} (run {})".format(in_meta, out_meta,
+                                                         run)
+            self.assertTrue(filecmp.cmp(in_meta, out_meta, shallow=False),
+                            msg=amsg)
+            amsg = "{} does not match {} (run {})".format(in_source,
+                                                         out_source, run)
+            self.assertTrue(filecmp.cmp(in_source, out_source,
+                                        shallow=False), msg=amsg)
+        # End for
+        self.assertEqual(cache.stats['outputs'], 1)
+        self.assertEqual(cache.stats['hits'], 3)
+        # A changed registry must be parsed and generated again
+        tree, root = read_xml_file(infilename)
+        root[0].set('name', 'physics_types_cache')
+        tree.write(filename)
+        retcode = gen_registry(filename, 'fv', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, cache=cache)
+        self.assertEqual(retcode, 0)
+        self.assertTrue(os.path.exists(os.path.join(_TMP_DIR,
+                                                    "physics_types_cache.F90")))
+        self.assertEqual(cache.stats['outputs'], 2)
+        self.assertEqual(cache.stats['registries'], 2)
+
+    def test_validation_cache_dir(self):
+        """Test that validation results are only kept in a cache directory
+        when the registry was checked by xmllint"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_simple.xml")
+        work_dir = tempfile.mkdtemp()
+        cache_dir = os.path.join(work_dir, "validation_cache")
+        bin_dir = os.path.join(work_dir, "bin")
+        xmllint = os.path.join(bin_dir, "xmllint")
+        os.makedirs(bin_dir)
+        with open(xmllint, "w") as xfile:
+            xfile.write("#! /bin/sh\nexit 0\n")
+        # End with
+        os.chmod(xmllint, 0o755)
+        valid_files = os.path.join(cache_dir, "*.valid")
+        save_path = os.environ.get('PATH', '')
+        try:
+            # Run test without xmllint, the registry is not validated
+            os.environ['PATH'] = ''
+            retcode = gen_registry(filename, 'fv', {}, _TMP_DIR, 2,
+                                   loglevel=logging.ERROR,
+                                   cache=RegistryCache(cache_dir=cache_dir))
+            self.assertEqual(retcode, 0)
+            self.assertEqual(glob.glob(valid_files), [])
+            # Run test with xmllint
+            os.environ['PATH'] = bin_dir
+            retcode = gen_registry(filename, 'fv', {}, _TMP_DIR, 2,
+                                   loglevel=logging.ERROR,
+                                   cache=RegistryCache(cache_dir=cache_dir))
+            self.assertEqual(retcode, 0)
+            self.assertEqual(len(glob.glob(valid_files)), 1)
+        finally:
+            os.environ['PATH'] = save_path
+            shutil.rmtree(work_dir)
+        # End try
+
+    def test_registry_include(self):
+        """Test that a registry which includes a fragment generates the same
+        files as the equivalent single registry and that only a changed
+        fragment is read again"""
+        # Setup test
+        infilename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_include.xml")
+        in_fragment = os.path.join(_SAMPLE_FILES_DIR,
+                                   "reg_fragment_coords.xml")
+        filename = os.path.join(_TMP_DIR, "reg_include.xml")
+        fragment = os.path.join(_TMP_DIR, "reg_fragment_coords.xml")
+        out_name = "physics_types_ddt"
+        in_source = os.path.join(_SAMPLE_FILES_DIR, out_name + '_se.F90')
+        in_meta = os.path.join(_SAMPLE_FILES_DIR, out_name + '_se.meta')
+        out_source = os.path.join(_TMP_DIR, out_name + '.F90')
+        out_meta = os.path.join(_TMP_DIR, out_name + '.meta')
+        depfile = os.path.join(_TMP_DIR, "reg_include.d")
+        shutil.copyfile(infilename, filename)
+        shutil.copyfile(in_fragment, fragment)
+        remove_files([out_source, out_meta])
+        cache = RegistryCache()
+        # Run test
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, depfile=depfile,
+                               cache=cache)
+        # Check return code
+        self.assertEqual(retcode, 0)
+        # Make sure each output file matches the single registry output
+        amsg = "{} does not match {}".format(in_meta, out_meta)
+        self.assertTrue(filecmp.cmp(in_meta, out_meta, shallow=False),
+                        msg=amsg)
+        amsg = "{} does not match {}".format(in_source, out_source)
+        self.assertTrue(filecmp.cmp(in_source, out_source, shallow=False),
+                        msg=amsg)
+        with open(depfile, "r") as deps:
+            inputs = deps.read().split('\n\n')[0].split(': ', 1)[1]
+        # End with
+        self.assertIn(fragment, inputs)
+        self.assertEqual(cache.stats['registries'], 2)
+        # Only the changed fragment is read again
+        tree, root = read_xml_file(fragment)
+        root.find('variable/long_name').text = "Number of columns"
+        tree.write(fragment)
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, cache=cache)
+        self.assertEqual(retcode, 0)
+        self.assertEqual(cache.stats['registries'], 3)
+        self.assertEqual(cache.stats['outputs'], 2)
+        with open(out_meta, "r") as meta:
+            self.assertIn("long_name = Number of columns", meta.read())
+        # End with
+
+    def test_stream_registry(self):
+        """Test that streaming a registry (with an included fragment)
+        generates the same files as reading the complete registry"""
+        # Setup test
+        tests = [("reg_good_ddt2.xml", "physics_types_ddt2",
+                  "physics_types_ddt2"),
+                 ("reg_good_include.xml", "physics_types_ddt_se",
+                  "physics_types_ddt")]
+        for reg_name, in_name, out_name in tests:
+            filename = os.path.join(_SAMPLE_FILES_DIR, reg_name)
+            in_source = os.path.join(_SAMPLE_FILES_DIR, in_name + '.F90')
+            in_meta = os.path.join(_SAMPLE_FILES_DIR, in_name + '.meta')
+            out_source = os.path.join(_TMP_DIR, out_name + '.F90')
+            out_meta = os.path.join(_TMP_DIR, out_name + '.meta')
+            remove_files([out_source, out_meta])
+            # Run test
+            retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                                   loglevel=logging.ERROR,
+                                   error_on_no_validate=True, stream=True)
+            # Check return code
+            self.assertEqual(retcode, 0)
+            # For each output file, make sure it matches input file
+            amsg = "{} does not match {}".format(in_meta, out_meta)
+            self.assertTrue(filecmp.cmp(in_meta, out_meta,
+                                        shallow=False), msg=amsg)
+            amsg = "{} does not match {}".format(in_source, out_source)
+            self.assertTrue(filecmp.cmp(in_source, out_source,
+                                        shallow=False), msg=amsg)
+        # End for
+
+    def test_stream_invalid_fragment(self):
+        """Test that streaming a registry whose fragment does not validate
+        reports the validation error for the fragment (and does not
+        generate any files)"""
+        # Setup test
+        filename = os.path.join(_TMP_DIR, "reg_bad_include.xml")
+        frag_name = os.path.join(_TMP_DIR, "reg_fragment_coords.xml")
+        out_source = os.path.join(_TMP_DIR, "physics_types_bad_include.F90")
+        remove_files([out_source])
+        tree, root = read_xml_file(os.path.join(_SAMPLE_FILES_DIR,
+                                                "reg_good_include.xml"))
+        root[0].set('name', 'physics_types_bad_include')
+        tree.write(filename)
+        tree, root = read_xml_file(os.path.join(_SAMPLE_FILES_DIR,
+                                                "reg_fragment_coords.xml"))
+        # Remove the standard name for latitude
+        for var in root.findall('variable'):
+            if var.get('local_name') == 'latitude':
+                del var.attrib['standard_name']
+            # End if
+        # End for
+        tree.write(frag_name)
+        # Run test
+        with self.assertRaises(ValueError) as verr:
+            _ = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                             loglevel=logging.ERROR,
+                             error_on_no_validate=True, stream=True)
+        # Check exception message
+        emsg = "Invalid registry file, {}".format(frag_name)
+        self.assertEqual(emsg, str(verr.exception).split('\n')[0])
+        # Without error_on_no_validate, the error is logged instead
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.CRITICAL, stream=True)
+        self.assertEqual(retcode, 1)
+        self.assertFalse(os.path.exists(out_source))
+
+    def test_render_registry(self):
+        """Test that rendering a registry in memory returns the same files
+        as writing them to a directory, without writing anything"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        out_source = os.path.join(_TMP_DIR, 'physics_types_ddt2.F90')
+        remove_files([out_source])
+        # Run test
+        rendered = render_registry(filename, 'se', {}, 2,
+                                   loglevel=logging.ERROR,
+                                   error_on_no_validate=True, snapshot=True)
+        # Nothing should have been written
+        self.assertFalse(os.path.exists(out_source))
+        retcode = gen_registry(filename, 'se', {}, _TMP_DIR, 2,
+                               loglevel=logging.ERROR,
+                               error_on_no_validate=True, snapshot=True)
+        self.assertEqual(retcode, 0)
+        # Check that each rendered file matches the file on disk
+        self.assertEqual(list(rendered)[0:3],
+                         ['physics_types_ddt2.meta',
+                          'physics_types_ddt2.meta.json',
+                          'physics_types_ddt2.F90'])
+        for name, contents in rendered.items():
+            with open(os.path.join(_TMP_DIR, name), "r") as infile:
+                self.assertEqual(contents, infile.read(),
+                                 msg="{} does not match".format(name))
+            # End with
+        # End for
+        binary = render_registry(filename, 'se', {}, 2,
+                                 loglevel=logging.ERROR, binary=True)
+        self.assertEqual(binary['physics_types_ddt2.F90'],
+                         rendered['physics_types_ddt2.F90'].encode('utf-8'))
+
+    def test_field_catalog(self):
+        """Test that the generated field catalog hash table finds every
+        catalog field from its standard name"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt2.xml")
+        # Run test
+        rendered = render_registry(filename, 'se', {}, 2,
+                                   loglevel=logging.ERROR,
+                                   error_on_no_validate=True, catalog=True)
+        source = rendered['physics_types_ddt2_catalog.F90']
+        # Collect the standard names and the hash table
+        arrays = {}
+        name = None
+        for line in source.splitlines():
+            line = line.strip()
+            if line.endswith('= (/ &'):
+                name = line.split('::')[1].split('(')[0].strip()
+                arrays[name] = list()
+            elif name:
+                arrays[name].append(line.split(',')[0].split(' /)')[0])
+                if line.endswith(' /)'):
+                    name = None
+                # End if
+            # End if
+        # End for
+        stdnames = [x.strip("'").strip() for x in arrays['standard_names']]
+        table = [int(x) for x in arrays['hash_table']]
+        self.assertEqual(stdnames[0:2], ['latitude', 'longitude'])
+        self.assertIn('phys_state%wind%u', source)
+        # Look up each name as the Fortran catalog does
+        for index, stdname in enumerate(stdnames):
+            slot = catalog_hash(stdname.upper()) % len(table)
+            while table[slot] not in (0, index + 1):
+                slot = (slot + 1) % len(table)
+            # End while
+            self.assertEqual(table[slot], index + 1, msg=stdname)
+        # End for
+
     def test_bad_registry_version(self):
         """Test a registry with a bad version number.
         Check that it does not validate and does not generate any
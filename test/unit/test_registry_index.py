@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Contains unit tests for the CAM registry variable index
+#
+# Assumptions:
+#
+# Command line arguments: none
+#
+# Usage: python test_registry_index.py         # run the unit tests
+#-----------------------------------------------------------------------
+
+"""Test RegistryIndex in registry_index.py"""
+
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import logging
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+__REGISTRY_DIR = os.path.join(__CAM_ROOT, "src", "data")
+_SAMPLE_FILES_DIR = os.path.join(__TEST_DIR, "sample_files")
+
+if not os.path.exists(__REGISTRY_DIR):
+    raise ImportError("Cannot find registry directory")
+
+if not os.path.exists(_SAMPLE_FILES_DIR):
+    raise ImportError("Cannot find sample files directory")
+
+sys.path.append(__REGISTRY_DIR)
+
+# pylint: disable=wrong-import-position
+from registry_index import RegistryIndex
+# pylint: enable=wrong-import-position
+
+class RegistryIndexTest(unittest.TestCase):
+
+    """Tests for `RegistryIndex`."""
+
+    def setUp(self):
+        """Copy the sample registries to a temporary directory"""
+        self.tmp_dir = tempfile.mkdtemp()
+        for name in ("reg_good_ddt2.xml", "reg_good_include.xml",
+                     "reg_fragment_coords.xml"):
+            shutil.copy(os.path.join(_SAMPLE_FILES_DIR, name), self.tmp_dir)
+        # End for
+        self.logger = logging.getLogger("test_registry_index")
+        self.logger.setLevel(logging.ERROR)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_index_and_find(self):
+        """Test indexing registries, searching the index, and that only
+        changed registries are indexed again"""
+        # Setup test
+        db_path = os.path.join(self.tmp_dir, "index.db")
+        reg_ddt2 = os.path.join(self.tmp_dir, "reg_good_ddt2.xml")
+        reg_include = os.path.join(self.tmp_dir, "reg_good_include.xml")
+        fragment = os.path.join(self.tmp_dir, "reg_fragment_coords.xml")
+        # Run test
+        with RegistryIndex(db_path, self.logger) as index:
+            indexed = index.update([reg_ddt2, reg_include])
+            self.assertEqual(indexed, [reg_ddt2, reg_include])
+            # Members for every dycore are indexed with their dycore filter
+            matches = index.find(standard_name='LATITUDE',
+                                 module='physics_types_ddt')
+            self.assertEqual(len(matches), 1)
+            self.assertEqual(matches[0]['category'], 'ddt_member')
+            self.assertEqual(matches[0]['container'], 'physics_state')
+            self.assertEqual(matches[0]['dycores'], ['se'])
+            self.assertEqual(matches[0]['dimensions'],
+                             ['horizontal_dimension'])
+            self.assertEqual(matches[0]['ic_names'], ['lat'])
+            matches = index.find(standard_name='longitude',
+                                 module='physics_types_ddt')
+            self.assertEqual(matches[0]['dycores'], ['fv'])
+            matches = index.find(dimension='vertical_layer_dimension')
+            self.assertEqual(sorted([x['local_name'] for x in matches]),
+                             ['u', 'v'])
+            self.assertEqual(index.find(local_name='no_such_variable'), [])
+            # Nothing has changed
+            self.assertEqual(index.update([reg_ddt2, reg_include]), [])
+            # A changed fragment means its registry is indexed again
+            with open(fragment, "r") as infile:
+                contents = infile.read()
+            # End with
+            with open(fragment, "w") as outfile:
+                outfile.write(contents.replace('units="radians"',
+                                               'units="degrees_north"'))
+            # End with
+            self.assertEqual(index.update([reg_ddt2, reg_include]),
+                             [reg_include])
+            matches = index.find(standard_name='latitude',
+                                 module='physics_types_ddt')
+            self.assertEqual(matches[0]['units'], 'degrees_north')
+            index.remove(reg_include)
+            self.assertEqual(index.registries(), [reg_ddt2])
+            self.assertEqual(index.find(module='physics_types_ddt'), [])
+        # End with
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+#-----------------------------------------------------------------------
+# Description:  Contains unit tests for the CAM registry generation server
+#
+# Assumptions:
+#
+# Command line arguments: none
+#
+# Usage: python test_registry_server.py         # run the unit tests
+#-----------------------------------------------------------------------
+
+"""Test RegistryServer and generate in registry_server.py"""
+
+import sys
+import os
+import filecmp
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+import logging
+
+__TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+__CAM_ROOT = os.path.abspath(os.path.join(__TEST_DIR, os.pardir, os.pardir))
+__REGISTRY_DIR = os.path.join(__CAM_ROOT, "src", "data")
+_SAMPLE_FILES_DIR = os.path.join(__TEST_DIR, "sample_files")
+
+if not os.path.exists(__REGISTRY_DIR):
+    raise ImportError("Cannot find registry directory")
+
+if not os.path.exists(_SAMPLE_FILES_DIR):
+    raise ImportError("Cannot find sample files directory")
+
+sys.path.append(__REGISTRY_DIR)
+
+# pylint: disable=wrong-import-position
+if sys.version_info[0] >= 3:
+    from registry_server import RegistryServer, generate, _send_request
+# End if
+# pylint: enable=wrong-import-position
+
+@unittest.skipIf(sys.version_info[0] < 3,
+                 "The registry server requires Python 3")
+class RegistryServerTest(unittest.TestCase):
+
+    """Tests for `RegistryServer` and `generate`."""
+
+    def setUp(self):
+        """Create a temporary directory for the socket and output files"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, "registry.sock")
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_server_generate(self):
+        """Test that the server writes the same files as in-process
+        generation and answers a repeated request from its cache"""
+        # Setup test
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_name = "physics_types_ddt.F90"
+        logger = logging.getLogger("test_registry_server")
+        logger.setLevel(logging.ERROR)
+        server = RegistryServer(self.socket_path, logger)
+        thread = threading.Thread(target=server.serve)
+        thread.start()
+        try:
+            # Run test
+            for outdir in ('server1', 'server2'):
+                retcode = generate(socket_path=self.socket_path,
+                                   registry_file=filename, dycore='se',
+                                   config={},
+                                   outdir=os.path.join(self.tmp_dir, outdir),
+                                   indent=2, error_on_no_validate=True)
+                self.assertEqual(retcode, 0)
+            # End for
+            stats = _send_request({'command' : 'status'}, self.socket_path)
+            self.assertEqual(stats['stats']['outputs'], 1)
+            self.assertEqual(stats['stats']['hits'], 3)
+        finally:
+            _send_request({'command' : 'stop'}, self.socket_path)
+            thread.join()
+        # End try
+        self.assertFalse(os.path.exists(self.socket_path))
+        # Without a server, generate runs in this process
+        retcode = generate(socket_path=self.socket_path,
+                           registry_file=filename, dycore='se', config={},
+                           outdir=os.path.join(self.tmp_dir, 'local'),
+                           indent=2, loglevel=logging.ERROR,
+                           error_on_no_validate=True)
+        self.assertEqual(retcode, 0)
+        for outdir in ('server1', 'server2'):
+            self.assertTrue(filecmp.cmp(
+                os.path.join(self.tmp_dir, 'local', out_name),
+                os.path.join(self.tmp_dir, outdir, out_name), shallow=False))
+        # End for
+
+    def test_server_socket_mode(self):
+        """Test that only the server's user may connect to its socket"""
+        logger = logging.getLogger("test_registry_server")
+        server = RegistryServer(self.socket_path, logger)
+        try:
+            self.assertEqual(os.stat(self.socket_path).st_mode & 0o777,
+                             0o600)
+        finally:
+            server.server_close()
+        # End try
+
+    def test_slow_server(self):
+        """Test that generate stops a server which does not answer in time
+        and generates in this process once the server has stopped"""
+        # Setup test, a server which answers each request after <delay>
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_file = os.path.join(self.tmp_dir, 'local', "physics_types_ddt.F90")
+        commands = list()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        listener.listen(2)
+        def slow_server():
+            """Answer a generate request late and then a stop request"""
+            for delay in (1.5, 0.0):
+                conn, _ = listener.accept()
+                with conn:
+                    commands.append(conn.makefile('rb').read())
+                    time.sleep(delay)
+                    try:
+                        conn.sendall(b'{}')
+                    except OSError:
+                        pass # The client gave up on this request
+                    # End try
+                # End with
+            # End for
+        thread = threading.Thread(target=slow_server)
+        thread.start()
+        try:
+            # Run test
+            retcode = generate(socket_path=self.socket_path, timeout=1.0,
+                               registry_file=filename, dycore='se',
+                               config={},
+                               outdir=os.path.join(self.tmp_dir, 'local'),
+                               indent=2, loglevel=logging.ERROR,
+                               error_on_no_validate=True)
+        finally:
+            thread.join()
+            listener.close()
+        # End try
+        self.assertEqual(retcode, 0)
+        self.assertIn(b'"stop"', commands[1])
+        self.assertTrue(os.path.exists(out_file))
+
+    def test_hung_server(self):
+        """Test that generate refuses to generate in this process while
+        a server which does not answer may still be writing the files"""
+        # Setup test, a socket which is listening but never answers
+        filename = os.path.join(_SAMPLE_FILES_DIR, "reg_good_ddt.xml")
+        out_dir = os.path.join(self.tmp_dir, 'local')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hung:
+            hung.bind(self.socket_path)
+            hung.listen(2)
+            # Run test
+            with self.assertRaises(OSError) as context:
+                generate(socket_path=self.socket_path, timeout=0.5,
+                         registry_file=filename, dycore='se', config={},
+                         outdir=out_dir, indent=2, loglevel=logging.ERROR,
+                         error_on_no_validate=True)
+            # End with
+        # End with
+        self.assertIn("may still be writing", str(context.exception))
+        self.assertFalse(os.path.exists(out_dir))
+
+if __name__ == '__main__':
+    unittest.main()